@@ -0,0 +1,18 @@
+#region class definitions
+class Capacitor():
+    #region constructor
+    def __init__(self, C=1.0e-6, v=0.0, name='ab'):
+        """
+        Defines a capacitor to have a self.Capacitance, self.Voltage, self.Current and self.Name
+        :param C: capacitance in F (float)
+        :param v: voltage across the capacitor in V, the initial condition of a transient simulation (float)
+        :param name: name of capacitor by alphabetically ordered pair of node names
+        """
+        #region attributes
+        self.Capacitance = C
+        self.Voltage = v
+        self.Current = 0.0
+        self.Name = name
+        #endregion
+    #endregion
+#endregion
@@ -0,0 +1,324 @@
+#region imports
+import numpy as np
+#endregion
+
+#region function definitions
+def ElementNodes(name):
+    """
+    The two nodes an element connects, from its name: 'ad' -> ('a', 'd'), 'de_parallel' -> ('d', 'e').
+    :param name: the element name
+    :return: (first node, second node)
+    """
+    pair = name.split('_')[0]
+    return pair[0], pair[1]
+#endregion
+
+#region class definitions
+class CompiledCircuit():
+    #region constructor
+    def __init__(self, network, ground=None):
+        """
+        An array form of a ResistorNetwork for modified nodal analysis: node numbering, element incidence and
+        element values are built once.  The unknowns are the voltages of every node except the ground node,
+        followed by the currents of the voltage sources.  Element currents are positive from the first node of
+        the element name to the second (a to d for 'ad'), and a source named 'ab' makes node b Voltage higher
+        than node a, which is the convention of ResistorNetwork.txt.  Current sources only enter the right hand
+        side; the nodes of diodes and thermistors are numbered here, but those are solved by NonlinearCircuit.  The
+        compiled circuit is immutable (its arrays are read-only) and solutions live in CircuitState objects, so one
+        CompiledCircuit can be shared by threads or async tasks solving different scenarios at the same time.
+        :param network: a ResistorNetwork object
+        :param ground: name of the reference node (default: the first node alphabetically)
+        """
+        #region attributes
+        self.Network = network
+        elements = (network.Resistors + network.VSources + network.Capacitors + network.Inductors +
+                    network.ISources + network.Diodes + network.Thermistors)
+        self.NodeNames = tuple(sorted({n for e in elements for n in ElementNodes(e.Name)}))
+        self.Ground = ground if ground is not None else self.NodeNames[0]
+        # node index in the unknown vector, -1 for the ground node
+        self.Index = {}
+        k = 0
+        for n in self.NodeNames:
+            if n == self.Ground:
+                self.Index[n] = -1
+            else:
+                self.Index[n] = k
+                k += 1
+        self.nV = k  # number of node voltage unknowns
+        self.R = self._Arrays(network.Resistors, 'Resistance')
+        self.VS = self._Arrays(network.VSources, 'Voltage')
+        self.C = self._Arrays(network.Capacitors, 'Capacitance')
+        self.L = self._Arrays(network.Inductors, 'Inductance')
+        self.IS = self._Arrays(network.ISources, 'Current')
+        self.nUnknowns = self.nV + len(network.VSources)
+        self.Linear = not (network.Diodes or network.Thermistors)
+        self._Stamps = self._BuildStamps()
+        #endregion
+    #endregion
+
+    #region methods
+    def _Arrays(self, elements, attr):
+        """
+        :return: (first node indices, second node indices, element values, names)
+        """
+        a = np.array([self.Index[ElementNodes(e.Name)[0]] for e in elements], dtype=int)
+        b = np.array([self.Index[ElementNodes(e.Name)[1]] for e in elements], dtype=int)
+        values = np.array([getattr(e, attr) for e in elements], dtype=float)
+        for x in (a, b, values):
+            x.flags.writeable = False
+        return a, b, values, tuple(e.Name for e in elements)
+
+    def _BuildStamps(self):
+        """
+        The DC matrix without resistors (source and inductor stamps) and the map from resistor conductances to
+        the flattened matrix entries they add to, used by SolveDCBatch.
+        :return: (scipy.sparse csr_matrix, scipy.sparse csr_matrix)
+        """
+        from scipy.sparse import coo_matrix
+        a, b = self.R[0], self.R[1]
+        M0 = self.Matrix(a, b, np.zeros(len(a)), extraSources=(self.L[0], self.L[1])).tocsr()
+        n = M0.shape[0]
+        rows, cols, vals = [], [], []
+        for r, c, sgn in ((a, a, 1.0), (b, b, 1.0), (a, b, -1.0), (b, a, -1.0)):
+            ok = (r >= 0) & (c >= 0)
+            rows.append(r[ok] * n + c[ok])
+            cols.append(np.flatnonzero(ok))
+            vals.append(np.full(ok.sum(), sgn))
+        P = coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                       shape=(n * n, len(a))).tocsr()
+        return M0, P
+
+    def Incidence(self, a, b):
+        """
+        The (unknowns x elements) incidence matrix: +1 at the first node, -1 at the second, ground dropped.
+        :return: a scipy.sparse csr_matrix
+        """
+        from scipy.sparse import coo_matrix
+        cols = np.arange(len(a))
+        rows = np.concatenate((a[a >= 0], b[b >= 0]))
+        vals = np.concatenate((np.ones((a >= 0).sum()), -np.ones((b >= 0).sum())))
+        return coo_matrix((vals, (rows, np.concatenate((cols[a >= 0], cols[b >= 0])))),
+                          shape=(self.nUnknowns, len(a))).tocsr()
+
+    def Matrix(self, a, b, g, extraSources=None):
+        """
+        Assembles the MNA matrix for conductances g between nodes (a, b) plus the voltage sources.
+        :param a, b, g: node indices and conductances of every conductance stamp
+        :param extraSources: optional (a, b) node indices of additional zero volt sources (DC inductors)
+        :return: a scipy.sparse csc_matrix
+        """
+        from scipy.sparse import coo_matrix
+        sa, sb = self.VS[0], self.VS[1]
+        if extraSources is not None:
+            sa, sb = np.concatenate((sa, extraSources[0])), np.concatenate((sb, extraSources[1]))
+        n = self.nV + len(sa)
+        rows, cols, vals = [], [], []
+        for r, c, v in ((a, a, g), (b, b, g), (a, b, -g), (b, a, -g)):
+            ok = (r >= 0) & (c >= 0)
+            rows.append(r[ok])
+            cols.append(c[ok])
+            vals.append(v[ok])
+        k = self.nV + np.arange(len(sa))
+        # source k: x[b]-x[a]=V on row nV+k, and its current leaves node a and enters node b
+        for r, c, v in ((k, sa, -1.0), (k, sb, 1.0), (sa, k, 1.0), (sb, k, -1.0)):
+            r, c = np.broadcast_arrays(r, c)
+            ok = (r >= 0) & (c >= 0)
+            rows.append(r[ok])
+            cols.append(c[ok])
+            vals.append(np.full(ok.sum(), v))
+        M = coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+        return M.tocsc()
+
+    def Injection(self, currents=None, size=None):
+        """
+        The right hand side entries of the current sources: a source 'ab' takes its current out of node a and
+        puts it into node b.
+        :param currents: optional currents of the sources (default: their Current values)
+        :param size: length of the vector (default nUnknowns)
+        :return: array with the injections in the node rows and zeros elsewhere
+        """
+        a, b, I, _ = self.IS
+        I = I if currents is None else np.asarray(currents, dtype=float)
+        rhs = np.zeros(self.nUnknowns if size is None else size)
+        np.subtract.at(rhs, a[a >= 0], I[a >= 0])
+        np.add.at(rhs, b[b >= 0], I[b >= 0])
+        return rhs
+
+    def NodeVoltages(self, X):
+        """
+        Expands solutions to the voltage of every node (ground is zero).
+        :param X: (..., nUnknowns) array of solutions
+        :return: (..., number of nodes) array in the order of self.NodeNames
+        """
+        V = np.zeros(X.shape[:-1] + (len(self.NodeNames),))
+        for j, n in enumerate(self.NodeNames):
+            if self.Index[n] >= 0:
+                V[..., j] = X[..., self.Index[n]]
+        return V
+
+    def BranchVoltage(self, X, a, b):
+        """
+        :return: x[a]-x[b] for every element, with ground at zero volts
+        """
+        Xg = np.concatenate((X, np.zeros(X.shape[:-1] + (1,))), axis=-1)  # index -1 reads the appended zero
+        return Xg[..., a] - Xg[..., b]
+
+    def SolveDC(self, sourceVoltages=None, resistances=None):
+        """
+        DC operating point: capacitors are open circuits and inductors are short circuits.
+        :param sourceVoltages: optional voltages of the sources (default: their Voltage values)
+        :param resistances: optional resistor values (default: their Resistance values)
+        :return: (solution vector, inductor currents)
+        """
+        from scipy.sparse.linalg import spsolve
+        self._CheckLinear()
+        a, b, R, _ = self.R
+        R = R if resistances is None else np.asarray(resistances, dtype=float)
+        la, lb = self.L[0], self.L[1]
+        M = self.Matrix(a, b, 1.0/R, extraSources=(la, lb))
+        rhs = self.Injection(size=M.shape[0])
+        rhs[self.nV:self.nUnknowns] = self.VS[2] if sourceVoltages is None else sourceVoltages
+        x = np.atleast_1d(spsolve(M, rhs))
+        return x[:self.nUnknowns], x[self.nUnknowns:]
+
+    def SolveDCBatch(self, resistances, sourceVoltages):
+        """
+        DC operating points of B copies of the circuit that differ in their resistor and source values.  The
+        matrices are stacked dense arrays, the constant source stamps plus one matrix product for the resistor
+        stamps, and numpy solves them all in one call, which suits the small to mid-size circuits of a Monte
+        Carlo study.
+        :param resistances: (B, number of resistors) array
+        :param sourceVoltages: (B, number of sources) array
+        :return: ((B, nUnknowns) solutions, (B, number of inductors) inductor currents)
+        """
+        self._CheckLinear()
+        M0, P = self._Stamps
+        n = M0.shape[0]
+        G = 1.0 / np.atleast_2d(resistances)
+        M = (M0.toarray().ravel() + (P @ G.T).T).reshape(len(G), n, n)
+        rhs = np.tile(self.Injection(size=n), (len(G), 1))
+        rhs[:, self.nV:self.nUnknowns] = sourceVoltages
+        X = np.linalg.solve(M, rhs[..., None])[..., 0]
+        return X[:, :self.nUnknowns], X[:, self.nUnknowns:]
+
+    def _CheckLinear(self):
+        """
+        The linear solves would silently leave out diodes and thermistors.
+        """
+        if not self.Linear:
+            raise ValueError('the circuit has diodes or thermistors, solve it with NonlinearCircuit')
+
+    def Solve(self, sourceVoltages=None, resistances=None):
+        """
+        DC operating point of one scenario, without touching the element objects.
+        :param sourceVoltages: optional voltages of the sources (default: their Voltage values)
+        :param resistances: optional resistor values (default: their Resistance values)
+        :return: a CircuitState
+        """
+        X, IL = self.SolveDC(sourceVoltages, resistances)
+        return CircuitState(self, X, IL, self.R[2] if resistances is None else resistances)
+
+    def WriteBack(self, X, IL=None, resistances=None):
+        """
+        Copies a solution to the element objects of the network: Resistor.Current, Resistor.V,
+        VoltageSource.Current and Inductor.Current.
+        :param X: solution vector
+        :param IL: optional inductor currents
+        :param resistances: resistor values of the solution (default: the compiled values)
+        """
+        R = self.R[2] if resistances is None else np.asarray(resistances, dtype=float)
+        IR = self.BranchVoltage(X, self.R[0], self.R[1]) / R
+        for r, i in zip(self.Network.Resistors, IR):
+            r.Current = float(i)
+            r.DeltaV()
+        for s, i in zip(self.Network.VSources, X[self.nV:self.nUnknowns]):
+            s.Current = float(i)
+        if IL is not None:
+            for l, i in zip(self.Network.Inductors, IL):
+                l.Current = float(i)
+    #endregion
+
+
+class CircuitState():
+    #region constructor
+    def __init__(self, circuit, X, IL, resistances):
+        """
+        The result of one solve of a CompiledCircuit, kept apart from the shared compiled circuit.
+        :param circuit: the CompiledCircuit
+        :param X: solution vector (node voltages, then source currents)
+        :param IL: inductor currents
+        :param resistances: resistor values of the scenario
+        """
+        #region attributes
+        self.Circuit = circuit
+        self.X = X
+        self.IL = IL
+        self.Resistances = np.asarray(resistances, dtype=float)
+        #endregion
+    #endregion
+
+    #region methods
+    def NodeVoltages(self):
+        """
+        :return: voltage of every node in the order of Circuit.NodeNames
+        """
+        return self.Circuit.NodeVoltages(self.X)
+
+    def ResistorCurrents(self):
+        """
+        :return: resistor currents in the order of Circuit.R, positive from the first node of the name
+        """
+        cc = self.Circuit
+        return cc.BranchVoltage(self.X, cc.R[0], cc.R[1]) / self.Resistances
+
+    def SourceCurrents(self):
+        """
+        :return: currents of the voltage sources in the order of Circuit.VS
+        """
+        return self.X[self.Circuit.nV:]
+
+    def ResistorTable(self):
+        """
+        One record per resistor: Name, the two nodes, Resistance, Current and voltage drop DeltaV.
+        :return: structured numpy array
+        """
+        from result_io import toTable
+        cc = self.Circuit
+        I = self.ResistorCurrents()
+        names = np.array(cc.R[3])
+        return toTable({'Name': names, 'Node1': np.array([n[0] for n in names.tolist()]),
+                        'Node2': np.array([n[1] for n in names.tolist()]), 'Resistance': self.Resistances,
+                        'Current': I, 'DeltaV': I * self.Resistances})
+
+    def NodeTable(self):
+        """
+        One record per node: Name and Voltage (ground is zero).
+        :return: structured numpy array
+        """
+        from result_io import toTable
+        return toTable({'Name': np.array(self.Circuit.NodeNames), 'Voltage': self.NodeVoltages()})
+
+    def ResidualReport(self):
+        """
+        Verifies the solution in one table from one sparse product with the DC matrix: the current balance at
+        every node except ground (KCL), the voltage of every source and the zero voltage across every inductor.
+        :return: structured array, see result_io.residualTable
+        """
+        from result_io import residualTable
+        cc = self.Circuit
+        M = cc.Matrix(cc.R[0], cc.R[1], 1.0 / self.Resistances, extraSources=(cc.L[0], cc.L[1]))
+        IL = np.zeros(0) if self.IL is None else self.IL
+        r = M @ np.concatenate((self.X, IL)) - cc.Injection(size=M.shape[0])
+        r[cc.nV:cc.nUnknowns] -= cc.VS[2]
+        nodes = [n for n in cc.NodeNames if cc.Index[n] >= 0]
+        nodes.sort(key=cc.Index.get)
+        return residualTable([('KCL', nodes, r[:cc.nV]), ('source voltage', cc.VS[3], r[cc.nV:cc.nUnknowns]),
+                              ('inductor voltage', cc.L[3], r[cc.nUnknowns:])])
+
+    def WriteBack(self):
+        """
+        Copies this state to the element objects of the network (see CompiledCircuit.WriteBack).
+        """
+        self.Circuit.WriteBack(self.X, self.IL, self.Resistances)
+    #endregion
+#endregion
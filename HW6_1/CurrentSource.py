@@ -0,0 +1,17 @@
+#region class definitions
+class CurrentSource():
+    #region constructor
+    def __init__(self, I=1.0, name='ab'):
+        """
+        Define an ideal current source that drives self.Current from the first node of its name through the
+        source to the second node.
+        :param I: the current in amps
+        :param name: the name of current source
+        """
+        #region attributes
+        self.Current = I
+        self.Voltage = 0.0  # voltage of the first node relative to the second, set by a solution
+        self.Name = name
+        #endregion
+    #endregion
+#endregion
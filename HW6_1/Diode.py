@@ -0,0 +1,76 @@
+#region imports
+import numpy as np
+#endregion
+
+#region class definitions
+class Diode():
+    #region class attributes
+    Parameters = ('SaturationCurrent', 'Emission', 'Temperature')  # compiled into arrays by NonlinearCircuit
+    #endregion
+
+    #region constructor
+    def __init__(self, Is=1.0e-14, n=1.0, T=300.15, name='ab'):
+        """
+        Defines a junction diode obeying the Shockley equation i=Is*(exp(v/(n*Vt))-1), with its anode at the first
+        node of the name and its cathode at the second.
+        :param Is: saturation current in amps (float)
+        :param n: emission coefficient (float)
+        :param T: junction temperature in K (float)
+        :param name: name of diode by the pair of node names, anode first
+        """
+        #region attributes
+        self.SaturationCurrent = Is
+        self.Emission = n
+        self.Temperature = T
+        self.Current = 0.0
+        self.Voltage = 0.0
+        self.Name = name
+        #endregion
+    #endregion
+
+    #region methods
+    @staticmethod
+    def ThermalVoltage(p):
+        """
+        :param p: dict of parameter arrays (see Parameters)
+        :return: n*k*T/q in V for every diode
+        """
+        return p['Emission'] * 8.617333262e-5 * p['Temperature']
+
+    @staticmethod
+    def Stamps(v, p):
+        """
+        Currents and small signal conductances of many diodes at once.  The exponential is continued linearly
+        above 40 thermal voltages, so a wild Newton iterate cannot overflow.
+        :param v: anode to cathode voltages
+        :param p: dict of parameter arrays (see Parameters)
+        :return: (currents, conductances di/dv)
+        """
+        nVt = Diode.ThermalVoltage(p)
+        x = v / nVt
+        e = np.exp(np.minimum(x, 40.0))
+        i = p['SaturationCurrent'] * (e * (1.0 + np.maximum(x - 40.0, 0.0)) - 1.0)
+        g = p['SaturationCurrent'] * e / nVt
+        return i, g
+
+    @staticmethod
+    def Limit(v, vOld, p):
+        """
+        Limits the change of the junction voltages between Newton iterations (SPICE's pnjlim): above the critical
+        voltage, where the current grows fastest, a step is replaced by the step in current it asks for, taken on
+        a logarithmic scale.
+        :param v: junction voltages of the new iterate
+        :param vOld: junction voltages of the previous iterate
+        :param p: dict of parameter arrays (see Parameters)
+        :return: the limited junction voltages
+        """
+        nVt = Diode.ThermalVoltage(p)
+        vCrit = nVt * np.log(nVt / (np.sqrt(2.0) * p['SaturationCurrent']))
+        limit = (v > vCrit) & (np.abs(v - vOld) > 2.0 * nVt)
+        arg = 1.0 + (v - vOld) / nVt
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stepped = np.where(arg > 0, vOld + nVt * np.log(np.where(arg > 0, arg, 1.0)), vCrit)
+            started = nVt * np.log(v / nVt)
+        return np.where(limit, np.where(vOld > 0, stepped, started), v)
+    #endregion
+#endregion
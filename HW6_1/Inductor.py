@@ -0,0 +1,18 @@
+#region class definitions
+class Inductor():
+    #region constructor
+    def __init__(self, L=1.0e-3, i=0.0, name='ab'):
+        """
+        Defines an inductor to have a self.Inductance, self.Current, self.Voltage and self.Name
+        :param L: inductance in H (float)
+        :param i: current through the inductor in amps, the initial condition of a transient simulation (float)
+        :param name: name of inductor by alphabetically ordered pair of node names
+        """
+        #region attributes
+        self.Inductance = L
+        self.Current = i
+        self.Voltage = 0.0
+        self.Name = name
+        #endregion
+    #endregion
+#endregion
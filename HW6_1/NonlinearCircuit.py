@@ -0,0 +1,363 @@
+#region imports
+import os
+import sys
+import time
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledCircuit import CompiledCircuit, CircuitState, ElementNodes
+from Diode import Diode
+from Thermistor import Thermistor
+#endregion
+
+#region class definitions
+class NonlinearCircuit():
+    #region class attributes
+    # the nonlinear element types: (list of the ResistorNetwork, class).  A class supplies Parameters, the names
+    # of its attributes that are compiled into arrays, Stamps(v, p) -> (currents, conductances) and
+    # Limit(v, vOld, p) -> limited voltages, all for arrays of elements of that type.
+    ElementTypes = (('Diodes', Diode), ('Thermistors', Thermistor))
+    #endregion
+
+    #region constructor
+    def __init__(self, network, ground=None, gmin=1.0e-12):
+        """
+        DC operating points of networks with diodes, thermistors and current sources by Newton-Raphson on the
+        modified nodal equations of CompiledCircuit.  In every iteration each nonlinear element is replaced by its
+        linearization at its present voltage, a conductance g=di/dv in parallel with a current source i-g*v, so
+        an iteration is one sparse solve.  The sparsity pattern of the matrix is the same in every iteration:
+        it is built once here, with the slot of every element stamp in the CSC data array, and each iteration
+        only adds the element conductances to the constant linear part with one bincount.  Junction voltages are
+        limited between iterations (see Diode.Limit), which keeps the exponential from overshooting, so a
+        circuit typically converges in 5 to 30 factorizations even from a cold start, and in a few from the
+        solution of a nearby circuit.
+        :param network: a ResistorNetwork object
+        :param ground: name of the reference node (see CompiledCircuit)
+        :param gmin: conductance in S added across every nonlinear element, so that nodes behind reverse biased
+                     diodes keep a nonsingular matrix
+        """
+        #region attributes
+        self.Network = network
+        self.Circuit = CompiledCircuit(network, ground)
+        self.gmin = gmin
+        cc = self.Circuit
+        self.Groups = []  # (class, slice into the element arrays, parameter arrays, names) of every element type
+        a, b = [], []
+        for attr, cls in self.ElementTypes:
+            elements = getattr(network, attr)
+            a += [cc.Index[ElementNodes(e.Name)[0]] for e in elements]
+            b += [cc.Index[ElementNodes(e.Name)[1]] for e in elements]
+            params = {k: np.array([getattr(e, k) for e in elements], dtype=float) for k in cls.Parameters}
+            for x in params.values():
+                x.flags.writeable = False
+            self.Groups.append((cls, slice(len(a) - len(elements), len(a)), params, tuple(e.Name for e in elements)))
+        self.Ea = np.array(a, dtype=int)
+        self.Eb = np.array(b, dtype=int)
+        self.nE = len(a)
+        self._Pattern = self._BuildPattern()
+        for x in (self.Ea, self.Eb):
+            x.flags.writeable = False
+        #endregion
+    #endregion
+
+    #region methods
+    def _BuildPattern(self):
+        """
+        The fixed CSC structure of the Newton matrix: the entries of the linear matrix (resistors, voltage
+        sources and inductors as zero volt sources) and the four stamps of every nonlinear element.
+        :return: dict with indices, indptr, the linear part of the data array, and the data slot, element and
+                 sign of every nonlinear stamp
+        """
+        cc = self.Circuit
+        M = cc.Matrix(cc.R[0], cc.R[1], 1.0 / cc.R[2], extraSources=(cc.L[0], cc.L[1])).tocoo()
+        n = M.shape[0]
+        rows, cols, elem, sign = [M.row], [M.col], [], []
+        k = np.arange(self.nE)
+        for r, c, sgn in ((self.Ea, self.Ea, 1.0), (self.Eb, self.Eb, 1.0), (self.Ea, self.Eb, -1.0),
+                          (self.Eb, self.Ea, -1.0)):
+            ok = (r >= 0) & (c >= 0)
+            rows.append(r[ok])
+            cols.append(c[ok])
+            elem.append(k[ok])
+            sign.append(np.full(ok.sum(), sgn))
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        keys, slot = np.unique(cols.astype(np.int64) * n + rows, return_inverse=True)
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(keys // n, minlength=n))))
+        pattern = {'n': n, 'indices': (keys % n).astype(np.int32), 'indptr': indptr.astype(np.int32),
+                   'linear': np.bincount(slot[:M.nnz], M.data, len(keys)), 'slot': slot[M.nnz:],
+                   'elem': np.concatenate(elem), 'sign': np.concatenate(sign)}
+        for x in pattern.values():
+            if isinstance(x, np.ndarray):
+                x.flags.writeable = False
+        return pattern
+
+    def Jacobian(self, g):
+        """
+        The Newton matrix for element conductances g, on the fixed sparsity pattern.
+        :param g: conductance of every nonlinear element
+        :return: a scipy.sparse csc_matrix
+        """
+        from scipy.sparse import csc_matrix
+        P = self._Pattern
+        data = P['linear'] + np.bincount(P['slot'], P['sign'] * g[P['elem']], len(P['linear']))
+        return csc_matrix((data, P['indices'], P['indptr']), shape=(P['n'], P['n']))
+
+    def Stamps(self, v):
+        """
+        :param v: voltage across every nonlinear element, first node minus second
+        :return: (currents, conductances) of every nonlinear element from the Stamps of its type
+        """
+        i, g = np.empty(self.nE), np.empty(self.nE)
+        for cls, part, p, _ in self.Groups:
+            i[part], g[part] = cls.Stamps(v[part], p)
+        return i, g
+
+    def Limit(self, v, vOld):
+        """
+        :return: the element voltages v limited by the Limit of every element type, relative to vOld
+        """
+        out = np.empty(self.nE)
+        for cls, part, p, _ in self.Groups:
+            out[part] = cls.Limit(v[part], vOld[part], p)
+        return out
+
+    def _AddElementCurrents(self, rhs, i):
+        """
+        Subtracts element currents from the node rows of a right hand side (they leave the first node).
+        """
+        a, b = self.Ea, self.Eb
+        np.subtract.at(rhs, a[a >= 0], i[a >= 0])
+        np.add.at(rhs, b[b >= 0], i[b >= 0])
+
+    def RightHandSide(self, sourceVoltages=None, sourceCurrents=None):
+        """
+        :return: the constant right hand side of the Newton systems: current source injections, source voltages
+        """
+        cc = self.Circuit
+        rhs = cc.Injection(sourceCurrents, self._Pattern['n'])
+        rhs[cc.nV:cc.nUnknowns] = cc.VS[2] if sourceVoltages is None else sourceVoltages
+        return rhs
+
+    def Solve(self, sourceVoltages=None, sourceCurrents=None, x0=None, reltol=1e-9, vntol=1e-9, abstol=1e-15,
+              maxIter=100):
+        """
+        Newton-Raphson solve of the DC operating point.  It has converged when the last step changed no unknown by
+        more than reltol*|x|+vntol, no junction voltage was limited, and the element currents at the new voltages
+        agree with the linearization they were solved with to reltol*|i|+abstol.
+        :param sourceVoltages: optional voltages of the voltage sources (default: their Voltage values)
+        :param sourceCurrents: optional currents of the current sources (default: their Current values)
+        :param x0: optional starting solution, e.g. NonlinearState.Start() of a nearby circuit (default: zeros)
+        :param maxIter: maximum number of factorizations
+        :return: a NonlinearState (check its Converged)
+        """
+        from scipy.sparse.linalg import splu
+        cc = self.Circuit
+        n = self._Pattern['n']
+        rhs0 = self.RightHandSide(sourceVoltages, sourceCurrents)
+        x = np.zeros(n) if x0 is None else np.array(x0, dtype=float)
+        vE = cc.BranchVoltage(x, self.Ea, self.Eb)  # the voltages the elements are evaluated at
+        xClose, limited, iP, gP, vP = False, True, None, None, None
+        converged, factorizations = False, 0
+        while True:
+            i, g = self.Stamps(vE)
+            if (xClose or not self.nE) and not limited and np.all(np.abs(i - iP - gP * (vE - vP)) <=
+                                                 reltol * np.maximum(np.abs(i), np.abs(iP)) + abstol):
+                converged = True
+                break
+            if factorizations == maxIter:
+                break
+            rhs = rhs0.copy()
+            self._AddElementCurrents(rhs, i - g * vE)
+            xNew = splu(self.Jacobian(g + self.gmin)).solve(rhs)
+            factorizations += 1
+            vNew = cc.BranchVoltage(xNew, self.Ea, self.Eb)
+            vL = self.Limit(vNew, vE)
+            xClose = np.all(np.abs(xNew - x) <= reltol * np.maximum(np.abs(xNew), np.abs(x)) + vntol)
+            limited = np.any(vL != vNew)
+            iP, gP, vP = i, g, vE
+            x, vE = xNew, vL
+        return NonlinearState(self, x, i, converged, factorizations, sourceVoltages, sourceCurrents)
+
+    def Sweep(self, source, values, **kwargs):
+        """
+        DC sweep of one voltage or current source: each operating point starts from the previous one, so after
+        the first point a solve takes only a few factorizations.
+        :param source: name of a voltage source (cc.VS) or a current source (cc.IS)
+        :param values: the source values
+        :param kwargs: passed to Solve
+        :return: yields a NonlinearState for every value
+        """
+        cc = self.Circuit
+        if source in cc.VS[3]:
+            key, base, k = 'sourceVoltages', cc.VS[2], cc.VS[3].index(source)
+        elif source in cc.IS[3]:
+            key, base, k = 'sourceCurrents', cc.IS[2], cc.IS[3].index(source)
+        else:
+            raise ValueError("unknown source '{}'".format(source))
+        state = None
+        for value in values:
+            u = base.copy()
+            u[k] = value
+            state = self.Solve(x0=None if state is None else state.Start(), **{key: u}, **kwargs)
+            yield state
+    #endregion
+
+
+class NonlinearState(CircuitState):
+    #region constructor
+    def __init__(self, circuit, x, i, converged, factorizations, sourceVoltages=None, sourceCurrents=None):
+        """
+        The result of NonlinearCircuit.Solve.
+        :param circuit: the NonlinearCircuit
+        :param x: solution of the Newton system (node voltages, source currents, inductor currents)
+        :param i: current of every nonlinear element
+        :param converged: whether Newton's method converged
+        :param factorizations: number of sparse factorizations done
+        :param sourceVoltages, sourceCurrents: the source values of the solve (None for the element values)
+        """
+        cc = circuit.Circuit
+        super().__init__(cc, x[:cc.nUnknowns], x[cc.nUnknowns:], cc.R[2])
+        #region attributes
+        self.Nonlinear = circuit
+        self.ElementCurrents = i
+        self.ElementVoltages = cc.BranchVoltage(self.X, circuit.Ea, circuit.Eb)
+        self.Converged = bool(converged)
+        self.Factorizations = factorizations
+        self.SourceVoltages = cc.VS[2] if sourceVoltages is None else np.asarray(sourceVoltages, dtype=float)
+        self.SourceCurrentValues = cc.IS[2] if sourceCurrents is None else np.asarray(sourceCurrents, dtype=float)
+        #endregion
+    #endregion
+
+    #region methods
+    def Start(self):
+        """
+        :return: this solution as the starting point x0 of another solve
+        """
+        return np.concatenate((self.X, self.IL))
+
+    def ElementTable(self):
+        """
+        One record per nonlinear element: Name, Type, Voltage (first node minus second) and Current.
+        :return: structured numpy array
+        """
+        from result_io import toTable
+        nc = self.Nonlinear
+        names = [n for _, _, _, group in nc.Groups for n in group]
+        kinds = [cls.__name__ for cls, part, _, _ in nc.Groups for _ in range(part.stop - part.start)]
+        return toTable({'Name': np.array(names, dtype=str), 'Type': np.array(kinds, dtype=str),
+                        'Voltage': self.ElementVoltages, 'Current': self.ElementCurrents})
+
+    def ResidualReport(self):
+        """
+        Verifies the solution with the full nonlinear element currents (not their linearizations): the current
+        balance at every node except ground, the voltage of every source and the zero voltage across every
+        inductor.
+        :return: structured array, see result_io.residualTable
+        """
+        from result_io import residualTable
+        nc, cc = self.Nonlinear, self.Circuit
+        M = cc.Matrix(cc.R[0], cc.R[1], 1.0 / self.Resistances, extraSources=(cc.L[0], cc.L[1]))
+        r = -nc.RightHandSide(self.SourceVoltages, self.SourceCurrentValues)
+        nc._AddElementCurrents(r, -nc.Stamps(self.ElementVoltages)[0])
+        r += M @ self.Start()
+        nodes = sorted((n for n in cc.NodeNames if cc.Index[n] >= 0), key=cc.Index.get)
+        return residualTable([('KCL', nodes, r[:cc.nV]), ('source voltage', cc.VS[3], r[cc.nV:cc.nUnknowns]),
+                              ('inductor voltage', cc.L[3], r[cc.nUnknowns:])])
+
+    def WriteBack(self):
+        """
+        Copies this state to the element objects: see CompiledCircuit.WriteBack, plus the Current and Voltage of
+        every diode, thermistor and current source and the Temperature of every thermistor.
+        """
+        super().WriteBack()
+        nc, cc = self.Nonlinear, self.Circuit
+        for (attr, cls), (_, part, p, _) in zip(nc.ElementTypes, nc.Groups):
+            for e, i, v in zip(getattr(nc.Network, attr), self.ElementCurrents[part], self.ElementVoltages[part]):
+                e.Current, e.Voltage = float(i), float(v)
+            if cls is Thermistor:
+                for e, T in zip(nc.Network.Thermistors, Thermistor.Temperatures(self.ElementVoltages[part], p)[0]):
+                    e.Temperature = float(T)
+        for s, v in zip(nc.Network.ISources, cc.BranchVoltage(self.X, cc.IS[0], cc.IS[1])):
+            s.Voltage = float(v)
+    #endregion
+#endregion
+
+#region function definitions
+def DiodeGrid(n):
+    """
+    A test netlist: an n x n grid of 10 Ohm resistors fed from a 5 V source through 1 Ohm, with a diode or a
+    self-heated thermistor from every grid node to ground (alternately), and a 0.5 A current source into the
+    far corner.
+    :param n: nodes per side
+    :return: a ResistorNetwork object
+    """
+    from ResistorNetwork import ResistorNetwork
+    from TransientAnalysis import Netlist
+    node = lambda r, c: chr(0x4e00 + r * n + c)  # element names need one character per node
+    elements = [('Source', 'ab', 'Value', 5), ('Resistor', 'b' + node(0, 0), 'Resistance', 1),
+                ('CurrentSource', 'a' + node(n - 1, n - 1), 'Value', 0.5)]
+    for r in range(n):
+        for c in range(n):
+            if c + 1 < n:
+                elements.append(('Resistor', node(r, c) + node(r, c + 1), 'Resistance', 10))
+            if r + 1 < n:
+                elements.append(('Resistor', node(r, c) + node(r + 1, c), 'Resistance', 10))
+            if (r + c) % 2:
+                elements.append(('Diode', node(r, c) + 'a', 'SaturationCurrent', 1e-12))
+            else:
+                elements.append(('Thermistor', node(r, c) + 'a', 'ThermalResistance', 200))
+    Net = ResistorNetwork()
+    Net.BuildNetworkFromText(Netlist(*elements))
+    return Net
+
+
+def main():
+    """
+    Checks the engine against the analytic current of a diode in series with a resistor (Lambert W), a
+    thermistor without self-heating against the equivalent resistor and a self-heated thermistor against its
+    energy balance, then times a large diode and thermistor grid (DiodeGrid), cold and warm started.
+    :return: nothing, just prints to screen
+    """
+    from scipy.special import lambertw
+    from ResistorNetwork import ResistorNetwork
+    from TransientAnalysis import Netlist
+    Net = ResistorNetwork()
+    Net.BuildNetworkFromText(Netlist(('Source', 'ab', 'Value', 5), ('Resistor', 'bc', 'Resistance', 1000),
+                                     ('Diode', 'ca', 'SaturationCurrent', 1e-14)))
+    nc = NonlinearCircuit(Net)
+    state = nc.Solve()
+    nVt = Diode.ThermalVoltage({'Emission': 1.0, 'Temperature': 300.15})
+    Is, R, V = 1e-14, 1000.0, 5.0
+    exact = nVt / R * lambertw(Is * R / nVt * np.exp((V + Is * R) / nVt)).real - Is
+    print('diode and resistor: {} factorizations, error {:0.2e} A'.format(
+        state.Factorizations, abs(state.ElementCurrents[0] - exact)))
+    Net = ResistorNetwork()
+    Net.BuildNetworkFromText(Netlist(('Source', 'ab', 'Value', 10), ('Resistor', 'bc', 'Resistance', 1000),
+                                     ('Thermistor', 'ac', 'Resistance', 2000), ('CurrentSource', 'ac', 'Value', 1e-3)))
+    i = NonlinearCircuit(Net).Solve().ElementCurrents[0]
+    exact = -(10 / 1000 + 1e-3) / (1 / 1000 + 1 / 2000) / 2000  # the current source also feeds node c
+    print('thermistor without self-heating: error {:0.2e} A'.format(abs(i - exact)))
+    Net.Thermistors[0].ThermalResistance = 200.0
+    state = NonlinearCircuit(Net).Solve()
+    state.WriteBack()
+    th = Net.Thermistors[0]
+    print('self-heated thermistor: {:0.2f} K, energy balance error {:0.2e} K'.format(
+        th.Temperature, abs(th.Temperature - th.AmbientTemperature - 200.0 * th.Voltage * th.Current)))
+    Net = DiodeGrid(60)
+    t0 = time.perf_counter()
+    nc = NonlinearCircuit(Net)
+    t1 = time.perf_counter()
+    state = nc.Solve()
+    t2 = time.perf_counter()
+    warm = nc.Solve(sourceVoltages=[5.1], x0=state.Start())
+    t3 = time.perf_counter()
+    print('{} nodes, {} nonlinear elements: compile {:0.3f} s, cold solve {} factorizations in {:0.3f} s, '
+          'warm solve {} in {:0.3f} s, largest KCL residual {:0.1e} A'.format(
+              len(nc.Circuit.NodeNames), nc.nE, t1 - t0, state.Factorizations, t2 - t1, warm.Factorizations,
+              t3 - t2, warm.ResidualReport()['maxAbs'][0]))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -1,12 +1,23 @@
 #region imports
-from scipy.optimize import fsolve
+import sys
+import numpy as np
 from Resistor import Resistor
 from VoltageSource import VoltageSource
+from Capacitor import Capacitor
+from Inductor import Inductor
+from Diode import Diode
+from Thermistor import Thermistor
+from CurrentSource import CurrentSource
 from Loop import Loop
 #endregion
 
 #region class definitions
 class ResistorNetwork():
+    #region class attributes
+    CurrentNames = ('I1', 'I2', 'I3', 'I4')  # the unknown currents of GetKirchoffVals
+    Printed = 3  # how many of them AnalyzeCircuit prints
+    #endregion
+
     #region constructor
     def __init__(self):
         """
@@ -18,6 +29,11 @@ class ResistorNetwork():
         self.Loops = []  # initialize an empty list of loop objects in the network
         self.Resistors = []  # initialize an empty a list of resistor objects in the network
         self.VSources = []  # initialize an empty a list of source objects in the network
+        self.Capacitors = []  # capacitors and inductors are only used by transient simulations
+        self.Inductors = []
+        self.Diodes = []  # nonlinear elements and current sources are solved by NonlinearCircuit
+        self.Thermistors = []
+        self.ISources = []
         #endregion
     #endregion
 
@@ -29,7 +45,15 @@ class ResistorNetwork():
         :param filename: string for file to process
         :return: nothing
         """
-        FileTxt = open(filename,"r").read().split('\n')  # reads from file and then splits the string at the new line characters
+        self.BuildNetworkFromText(open(filename,"r").read())
+
+    def BuildNetworkFromText(self, text):
+        """
+        Populates the Loops, Resistors and Voltage Sources from the contents of a network file
+        :param text: string with the same format as ResistorNetwork.txt
+        :return: nothing
+        """
+        FileTxt = text.split('\n')  # splits the string at the new line characters
 
         LineNum = 0  # a counting variable to point to the line of text to be processed from FileTxt
         lineTxt = ""  # Variable to store the current line being processed
@@ -38,6 +62,11 @@ class ResistorNetwork():
         self.Resistors = []
         self.VSources = []
         self.Loops = []
+        self.Capacitors = []
+        self.Inductors = []
+        self.Diodes = []
+        self.Thermistors = []
+        self.ISources = []
 
         # Process each line in the file
         FileLength = len(FileTxt)
@@ -50,10 +79,22 @@ class ResistorNetwork():
                 pass  # skips comment lines
             elif "resistor" in lineTxt:
                 LineNum = self.MakeResistor(LineNum, FileTxt)
+            elif "currentsource" in lineTxt:
+                LineNum = self.MakeElement(LineNum, FileTxt, CurrentSource(), self.ISources, {'value': 'Current'})
+            elif "diode" in lineTxt:
+                LineNum = self.MakeElement(LineNum, FileTxt, Diode(), self.Diodes,
+                                           {k.lower(): k for k in Diode.Parameters})
+            elif "thermistor" in lineTxt:
+                LineNum = self.MakeElement(LineNum, FileTxt, Thermistor(), self.Thermistors,
+                                           {k.lower(): k for k in Thermistor.Parameters})
             elif "source" in lineTxt:
                 LineNum = self.MakeVSource(LineNum, FileTxt)
             elif "loop" in lineTxt:
                 LineNum = self.MakeLoop(LineNum, FileTxt)
+            elif "capacitor" in lineTxt:
+                LineNum = self.MakeCapacitor(LineNum, FileTxt)
+            elif "inductor" in lineTxt:
+                LineNum = self.MakeInductor(LineNum, FileTxt)
             else:
                 LineNum+=1  # Move to the next line if no relevant tag is found
             # Ensure LineNum increments to avoid infinite loop
@@ -118,6 +159,74 @@ class ResistorNetwork():
         return N
     # endregion
 
+    def MakeCapacitor(self, N, Txt):
+        """
+        Make a capacitor object from reading the text file
+        :param N: (int) Line number for current processing
+        :param Txt: [string] the lines of the text file
+        :return: the line number of the </Capacitor> tag
+        """
+        C = Capacitor()
+        N += 1
+        txt = Txt[N].lower().strip()
+        while "capacitor" not in txt:
+            if "name" in txt:
+                C.Name = txt.split('=')[1].strip()
+            if "capacitance" in txt:
+                C.Capacitance = float(txt.split('=')[1].strip())
+            if "voltage" in txt:
+                C.Voltage = float(txt.split('=')[1].strip())  # initial voltage
+            N += 1
+            txt = Txt[N].lower().strip()
+        self.Capacitors.append(C)
+        return N
+
+    def MakeInductor(self, N, Txt):
+        """
+        Make an inductor object from reading the text file
+        :param N: (int) Line number for current processing
+        :param Txt: [string] the lines of the text file
+        :return: the line number of the </Inductor> tag
+        """
+        L = Inductor()
+        N += 1
+        txt = Txt[N].lower().strip()
+        while "inductor" not in txt:
+            if "name" in txt:
+                L.Name = txt.split('=')[1].strip()
+            if "inductance" in txt:
+                L.Inductance = float(txt.split('=')[1].strip())
+            if "current" in txt:
+                L.Current = float(txt.split('=')[1].strip())  # initial current
+            N += 1
+            txt = Txt[N].lower().strip()
+        self.Inductors.append(L)
+        return N
+
+    def MakeElement(self, N, Txt, element, elements, keys):
+        """
+        Make any element whose block holds 'key = value' lines, e.g. a diode or a current source
+        :param N: (int) Line number for current processing
+        :param Txt: [string] the lines of the text file
+        :param element: a new element object with default values
+        :param elements: the list of the network that the element is appended to
+        :param keys: dict {lowercase key in the file: attribute of the element}, besides Name
+        :return: the line number of the closing tag
+        """
+        N += 1
+        txt = Txt[N].lower().strip()
+        while not txt.startswith('</'):
+            if '=' in txt:
+                key, value = (t.strip() for t in txt.split('=', 1))
+                if key == 'name':
+                    element.Name = value
+                elif key in keys:
+                    setattr(element, keys[key], float(value))
+            N += 1
+            txt = Txt[N].lower().strip()
+        elements.append(element)
+        return N
+
     def MakeLoop(self, N, Txt):
         """
         Make a Loop object from reading the text file
@@ -145,20 +254,80 @@ class ResistorNetwork():
         self.Loops.append(L)   # Append loop object to the list
         return N
 
-    def AnalyzeCircuit(self):
+    def AnalyzeCircuit(self, cache=None):
+        """
+        Use fsolve to find currents in the resistor network and print them.
+        :param cache: optional NetworkCache object holding previously solved networks
+        :return: the currents
         """
-        Use fsolve to find currents in the resistor network.
-        :return:
+        table = self.Solve(cache)
+        # print output to the screen in one write
+        sys.stdout.write(''.join('{} = {:.1f}\n'.format(n, i) for n, i in table[:self.Printed].tolist()))
+        return table['Current'].copy()
+
+    def Solve(self, cache=None):
         """
+        Finds the currents like AnalyzeCircuit, without printing anything.
+        :param cache: optional NetworkCache object holding previously solved networks
+        :return: structured array with the Name and Current of every unknown current
+        """
+        from result_io import toTable
         # need to set the currents to that Kirchoff's laws are satisfied
-        i0 = [0.1, 0.1, 0.1, 0.1]    #define an initial guess for the currents in the circuit
-        i = fsolve(self.GetKirchoffVals,i0)
-        # print output to the screen
-        print("I1 = {:.1f}".format(i[0]))
-        print("I2 = {:.1f}".format(i[1]))
-        print("I3 = {:.1f}".format(i[2]))
+        i0 = [0.1] * len(self.CurrentNames)  #define an initial guess for the currents in the circuit
+        i = self.SolveCurrents(i0, cache)
+        return toTable({'Name': list(self.CurrentNames), 'Current': np.asarray(i, dtype=float)})
+
+    def ResidualReport(self, i):
+        """
+        Verifies currents in one table: the voltage drop around every loop (KVL) and the node balances (KCL)
+        of GetKirchoffVals.
+        :param i: the currents
+        :return: structured array, see result_io.residualTable
+        """
+        from result_io import residualTable
+        r = np.asarray(self.GetKirchoffVals(i), dtype=float)
+        nL = len(self.Loops)
+        return residualTable([('KVL', [L.name for L in self.Loops], r[:nL]),
+                              ('KCL', ['equation {}'.format(k + 1) for k in range(len(r) - nL)], r[nL:])])
+
+    def SolveCurrents(self, i0, cache=None):
+        """
+        Solves GetKirchoffVals(i)=0 with fsolve.  With a cache, a network that was solved before is not solved
+        again, and a network that only differs in element values starts from the currents of its closest
+        solved neighbor.
+        :param i0: initial guess for the currents
+        :param cache: optional NetworkCache object
+        :return: the currents
+        """
+        from scipy.optimize import fsolve  # deferred so importing the network does not pay for scipy
+        problem = self.Problem(i0) if cache is not None else None
+        if problem is not None:
+            hit, warm = cache.lookup(problem)
+            if hit is not None:
+                self.GetKirchoffVals(hit['i'])  # set the resistor currents of the cached solution
+                return hit['i']
+            if warm is not None and len(warm['i']) == len(i0):
+                i0 = warm['i']
+        i = fsolve(self.GetKirchoffVals, i0)
+        if problem is not None:
+            cache.store(problem, i=i, residual=self.GetKirchoffVals(i))
         return i
 
+    def Problem(self, i0):
+        """
+        Describes the network and the solver settings for NetworkCache.  Resistors and sources are sorted by
+        name, so the order in the file does not matter; the loop node order does (it sets the signs).
+        :param i0: initial guess for the currents
+        :return: dict with 'topology', 'values' and 'settings'
+        """
+        return {'topology': {'network': type(self).__name__,
+                             'resistors': sorted(r.Name for r in self.Resistors),
+                             'sources': sorted([v.Name, getattr(v, 'Type', 'voltage')] for v in self.VSources),
+                             'loops': [[L.name, list(L.nodes)] for L in self.Loops]},
+                'values': {'resistors': {r.Name: float(r.Resistance) for r in self.Resistors},
+                           'sources': {v.Name: float(v.Voltage) for v in self.VSources}},
+                'settings': {'solver': 'fsolve', 'i0': [float(a) for a in i0]}}
+
     def GetKirchoffVals(self,i):
         """
         This function uses Kirchoff Voltage and Current laws to analyze this specific circuitw
@@ -240,18 +409,10 @@ class ResistorNetwork():
     #endregion
 
 class ResistorNetwork_2(ResistorNetwork):
-    def AnalyzeCircuit(self):
-        """
-        Overridden AnalyzeCircuit method for the second resistor network.
-        """
-        i0 = [0.1, 0.1, 0.1, 0.1, 0.1]  # Initial guess for five currents
-        i = fsolve(self.GetKirchoffVals, i0)
-        print("I1 = {:.1f}".format(i[0]))
-        print("I2 = {:.1f}".format(i[1]))
-        print("I3 = {:.1f}".format(i[2]))
-        print("I4 = {:.1f}".format(i[3]))
-        print("I5 = {:.1f}".format(i[4]))
-        return i
+    #region class attributes
+    CurrentNames = ('I1', 'I2', 'I3', 'I4', 'I5')  # five currents for the second resistor network
+    Printed = 5
+    #endregion
 
     def GetKirchoffVals(self, i):
         """
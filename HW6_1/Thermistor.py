@@ -0,0 +1,88 @@
+#region imports
+import numpy as np
+#endregion
+
+#region class definitions
+class Thermistor():
+    #region class attributes
+    Parameters = ('Resistance', 'Beta', 'ReferenceTemperature', 'ThermalResistance', 'AmbientTemperature')
+    #endregion
+
+    #region constructor
+    def __init__(self, R=10.0e3, B=3950.0, T0=298.15, Rth=0.0, Ta=298.15, name='ab'):
+        """
+        Defines an NTC thermistor, R(T)=R*exp(B*(1/T-1/T0)), heated by the power it dissipates: in steady state its
+        temperature is T=Ta+Rth*v**2/R(T).  With Rth=0 it is a resistor of R(Ta).
+        :param R: resistance in Ohm at the reference temperature (float)
+        :param B: beta constant in K (float)
+        :param T0: reference temperature in K (float)
+        :param Rth: thermal resistance to the surroundings in K/W (float)
+        :param Ta: ambient temperature in K (float)
+        :param name: name of thermistor by alphabetically ordered pair of node names
+        """
+        #region attributes
+        self.Resistance = R
+        self.Beta = B
+        self.ReferenceTemperature = T0
+        self.ThermalResistance = Rth
+        self.AmbientTemperature = Ta
+        self.Current = 0.0
+        self.Voltage = 0.0
+        self.Temperature = Ta
+        self.Name = name
+        #endregion
+    #endregion
+
+    #region methods
+    @staticmethod
+    def Temperatures(v, p, maxIter=60):
+        """
+        Steady state temperatures of many thermistors at voltages v: a root of F(T)=T-Ta-Rth*v**2/R(T) by Newton's
+        method from Ta, kept inside a bracket that shrinks by bisection.  F(Ta)<=0, and F>=0 at Ta+Rth*v**2/R(inf),
+        so the bracket always holds a root; where self-heating gives several, starting from Ta finds the cool one.
+        :param v: voltages across the thermistors
+        :param p: dict of parameter arrays (see Parameters)
+        :return: (temperatures in K, resistances at those temperatures)
+        """
+        R0, B, T0, Rth, Ta = (p[k] for k in Thermistor.Parameters)
+        heat = Rth * v**2
+        lo, hi = Ta.copy(), Ta + heat / (R0 * np.exp(-B / T0))
+        T = Ta.copy()
+        active = np.ones(len(T), bool)  # elements still iterating
+        for _ in range(maxIter):
+            R = R0 * np.exp(B * (1.0 / T - 1.0 / T0))
+            F = T - Ta - heat / R
+            lo, hi = np.where(F < 0, T, lo), np.where(F < 0, hi, T)
+            dF = 1.0 - heat * B / (R * T**2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                Tn = T - F / dF
+            Tn = np.where(~active, T, np.where((Tn >= lo) & (Tn <= hi), Tn, 0.5 * (lo + hi)))
+            active &= ~(np.abs(Tn - T) <= 1e-12 * T)
+            T = Tn
+            if not active.any():
+                break
+        return T, R0 * np.exp(B * (1.0 / T - 1.0 / T0))
+
+    @staticmethod
+    def Stamps(v, p):
+        """
+        Currents and conductances of many thermistors at once.  The conductance includes the change of the
+        temperature with the voltage, dT/dv=(2*Rth*v/R)/F'(T), from differentiating F(T(v), v)=0.
+        :param v: voltages across the thermistors
+        :param p: dict of parameter arrays (see Parameters)
+        :return: (currents, conductances di/dv)
+        """
+        T, R = Thermistor.Temperatures(v, p)
+        B, Rth = p['Beta'], p['ThermalResistance']
+        dF = 1.0 - Rth * v**2 * B / (R * T**2)
+        dTdv = 2.0 * Rth * v / R / np.where(np.abs(dF) > 1e-12, dF, 1e-12)
+        return v / R, 1.0 / R + v * B / (R * T**2) * dTdv
+
+    @staticmethod
+    def Limit(v, vOld, p):
+        """
+        Thermistor voltages are not limited: the current grows at most linearly, like v/R(inf).
+        """
+        return v
+    #endregion
+#endregion
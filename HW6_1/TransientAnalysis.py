@@ -0,0 +1,253 @@
+#region imports
+import json
+import os
+import time
+import numpy as np
+from CompiledCircuit import CompiledCircuit
+#endregion
+
+#region class definitions
+class TransientSimulation():
+    #region constructor
+    def __init__(self, network, dt, method='trapezoidal', waveforms=None, ground=None):
+        """
+        Fixed-step time-domain simulation of a network of resistors, voltage sources, capacitors and inductors.
+        Every capacitor and inductor is replaced by its companion model, a conductance G in parallel with a
+        history current source, so each step is one linear solve with the same matrix:
+            backward Euler   capacitor G=C/dt   inductor G=dt/L
+            trapezoidal      capacitor G=2C/dt  inductor G=dt/(2L)
+        The matrix is factorized once (the trapezoidal rule also factorizes a backward Euler matrix for its first
+        step, which starts it from the initial conditions without a consistent initial current) and each step is
+        a pair of triangular solves.  With at most ReducedLimit capacitors and inductors the solves are folded
+        into a small dense recurrence on the companion history currents, and the node voltages of a whole chunk
+        come from one multi-column triangular solve.
+        :param network: a ResistorNetwork object; Capacitor.Voltage and Inductor.Current are the initial conditions
+        :param dt: time step in s
+        :param method: 'trapezoidal' or 'euler' (backward Euler)
+        :param waveforms: dict {source name: f(t array) -> voltage array}; other sources keep their Voltage
+        :param ground: name of the reference node (see CompiledCircuit)
+        """
+        #region attributes
+        if method not in ('trapezoidal', 'euler'):
+            raise ValueError("method must be 'trapezoidal' or 'euler'")
+        self.Network = network
+        self.dt = dt
+        self.Method = method
+        self.Waveforms = dict(waveforms or {})
+        self.Circuit = CompiledCircuit(network, ground)
+        cc = self.Circuit
+        # the companion elements: capacitors followed by inductors
+        self.Ea = np.concatenate((cc.C[0], cc.L[0]))
+        self.Eb = np.concatenate((cc.C[1], cc.L[1]))
+        self.nC = len(cc.C[0])
+        self.Incidence = cc.Incidence(self.Ea, self.Eb)
+        self.IncidenceT = self.Incidence.T.tocsr()
+        self.ReducedLimit = 256
+        self.Steppers = {m: self._Stepper(m) for m in ({'euler', method})}
+        self.Time = 0.0
+        self.X = None  # solution of the last step
+        self.IE = np.concatenate((np.zeros(self.nC), [l.Current for l in network.Inductors]))
+        self.VE = np.concatenate(([c.Voltage for c in network.Capacitors], np.zeros(len(cc.L[0]))))
+        self.StepsDone = 0
+        self.ColumnNames = (['R:' + n for n in cc.R[3]] + ['V:' + n for n in cc.VS[3]] +
+                            ['C:' + n for n in cc.C[3]] + ['L:' + n for n in cc.L[3]])
+        #endregion
+    #endregion
+
+    #region methods
+    def _Stepper(self, method):
+        """
+        Factorizes the companion matrix of one integration method.
+        :return: (LU factorization, G, alpha, beta, Z, W) where the history current for the next step is
+                 alpha*G*v + beta*i from the element voltage v and current i of this step, and Z and W are the
+                 reduced step matrices (None for circuits with more than ReducedLimit companion elements)
+        """
+        from scipy.sparse.linalg import splu
+        cc = self.Circuit
+        k = 1.0 if method == 'euler' else 2.0
+        G = np.concatenate((k * cc.C[2] / self.dt, self.dt / (k * cc.L[2])))
+        # backward Euler: Ic=-G*v,  IL=i       trapezoidal: Ic=-(G*v+i),  IL=i+G*v
+        alpha = np.concatenate((-np.ones(self.nC), np.full(len(cc.L[0]), 0.0 if method == 'euler' else 1.0)))
+        beta = np.concatenate((np.full(self.nC, 0.0 if method == 'euler' else -1.0), np.ones(len(cc.L[0]))))
+        a = np.concatenate((cc.R[0], self.Ea))
+        b = np.concatenate((cc.R[1], self.Eb))
+        g = np.concatenate((1.0 / cc.R[2], G))
+        lu = splu(cc.Matrix(a, b, g))
+        Z = W = None
+        if 0 < len(G) <= self.ReducedLimit:
+            # with few companion elements each step reduces to a small dense recurrence on their history currents:
+            # x = A^-1 s - Z Ih and v = NT A^-1 s - W Ih with Z = A^-1 N and W = NT Z
+            Z = lu.solve(np.asfortranarray(self.Incidence.toarray()))
+            W = self.IncidenceT @ Z
+        return lu, G, alpha, beta, Z, W
+
+    def SourceVoltages(self, t):
+        """
+        :param t: array of times
+        :return: (number of sources, len(t)) array of source voltages
+        """
+        cc = self.Circuit
+        U = np.repeat(cc.VS[2][:, None], len(t), axis=1)
+        for k, name in enumerate(cc.VS[3]):
+            if name in self.Waveforms:
+                U[k] = self.Waveforms[name](t)
+        return U
+
+    def Chunks(self, nSteps, chunkSize=65536):
+        """
+        A generator that advances the simulation nSteps steps, chunkSize steps at a time.  The simulation can be
+        continued by calling Chunks again.  When it finishes, the final currents and voltages are written back to
+        the element objects.
+        :param nSteps: number of time steps
+        :param chunkSize: steps per chunk
+        :return: yields (t, node voltages, element currents) for each chunk: arrays of shape (n,),
+                 (n, number of nodes) in the order of Circuit.NodeNames and (n, number of elements) in the order
+                 of ColumnNames
+        """
+        cc = self.Circuit
+        nU, nS = cc.nUnknowns, len(cc.VS[0])
+        N, NT = self.Incidence, self.IncidenceT
+        lu, G, alpha, beta, Z, W = self.Steppers[self.Method]
+        aG = alpha * G
+        done = 0
+        while done < nSteps:
+            n = min(chunkSize, nSteps - done)
+            t = self.Time + self.dt * np.arange(1, n + 1)
+            # the source part of every right hand side of the chunk at once
+            S = np.repeat(cc.Injection()[:, None], n, axis=1)
+            S[cc.nV:] = self.SourceVoltages(t)
+            X = np.empty((n, nU))
+            IE = np.empty((n, len(self.Ea)))
+            VE = np.empty((n, len(self.Ea)))
+            iE, vE = self.IE, self.VE
+            k0 = 0
+            if self.StepsDone == 0 and self.Method != 'euler':
+                # start the trapezoidal rule with one backward Euler step
+                luE, GE, aE, bE = self.Steppers['euler'][:4]
+                Ih = aE * GE * vE + bE * iE
+                X[0] = luE.solve(S[:, 0] - N @ Ih)
+                vE = NT @ X[0]
+                iE = GE * vE + Ih
+                IE[0], VE[0] = iE, vE
+                k0 = 1
+            if Z is not None:
+                XS = lu.solve(np.asfortranarray(S[:, k0:]))
+                VS = (NT @ XS).T
+                IH = np.empty((n - k0, len(G)))
+                for k in range(n - k0):
+                    Ih = aG * vE + beta * iE
+                    vE = VS[k] - W @ Ih
+                    iE = G * vE + Ih
+                    IH[k], IE[k0 + k], VE[k0 + k] = Ih, iE, vE
+                X[k0:] = XS.T - IH @ Z.T
+            else:
+                for k in range(k0, n):
+                    Ih = aG * vE + beta * iE
+                    X[k] = lu.solve(S[:, k] - N @ Ih)
+                    vE = NT @ X[k]
+                    iE = G * vE + Ih
+                    IE[k], VE[k] = iE, vE
+            self.StepsDone += n
+            self.IE, self.VE, self.X = iE, vE, X[-1]
+            self.Time = t[-1]
+            done += n
+            IR = cc.BranchVoltage(X, cc.R[0], cc.R[1]) / cc.R[2]
+            yield t, cc.NodeVoltages(X), np.concatenate((IR, X[:, cc.nV:cc.nV + nS], IE), axis=1)
+        self.WriteBack()
+
+    def WriteBack(self):
+        """
+        Copies the state of the last step to the Resistor, VoltageSource, Capacitor and Inductor objects.
+        """
+        if self.X is None:
+            return
+        self.Circuit.WriteBack(self.X)
+        for c, v, i in zip(self.Network.Capacitors, self.VE[:self.nC], self.IE[:self.nC]):
+            c.Voltage, c.Current = float(v), float(i)
+        for l, v, i in zip(self.Network.Inductors, self.VE[self.nC:], self.IE[self.nC:]):
+            l.Voltage, l.Current = float(v), float(i)
+
+    def Run(self, nSteps, directory, chunkSize=65536):
+        """
+        Runs nSteps steps and streams them to .npy files in a directory (time.npy, voltages.npy, currents.npy,
+        written through memory maps one chunk at a time), with the column names in meta.json.
+        :param nSteps: number of time steps
+        :param directory: output folder (created if needed)
+        :param chunkSize: steps per chunk
+        :return: dict with the number of steps and the wall time
+        """
+        from numpy.lib.format import open_memmap
+        t0 = time.perf_counter()
+        os.makedirs(directory, exist_ok=True)
+        cc = self.Circuit
+        T = open_memmap(os.path.join(directory, 'time.npy'), 'w+', np.float64, (nSteps,))
+        V = open_memmap(os.path.join(directory, 'voltages.npy'), 'w+', np.float64, (nSteps, len(cc.NodeNames)))
+        I = open_memmap(os.path.join(directory, 'currents.npy'), 'w+', np.float64, (nSteps, len(self.ColumnNames)))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'nodes': cc.NodeNames, 'currents': self.ColumnNames, 'dt': self.dt, 'method': self.Method,
+                       'ground': cc.Ground}, f)
+        k = 0
+        for t, v, i in self.Chunks(nSteps, chunkSize):
+            T[k:k + len(t)], V[k:k + len(t)], I[k:k + len(t)] = t, v, i
+            k += len(t)
+        for a in (T, V, I):
+            a.flush()
+        return {'steps': nSteps, 'seconds': time.perf_counter() - t0}
+    #endregion
+#endregion
+
+#region function definitions
+def Netlist(*elements):
+    """
+    Writes elements in the format of ResistorNetwork.txt.
+    :param elements: tuples (tag, name, value key, value), e.g. ('Capacitor', 'ce', 'Capacitance', 1e-3)
+    :return: the netlist text
+    """
+    return ''.join('\n<{0}>\nName = {1}\n{2} = {3}\n</{0}>\n'.format(*e) for e in elements)
+
+
+def main():
+    """
+    Checks the engine against the analytic charging of an RC circuit and the ringing of a series RLC circuit,
+    then times a long run of the homework network with a capacitor and an inductor added.
+    :return: nothing, just prints to screen
+    """
+    import tempfile
+    from ResistorNetwork import ResistorNetwork
+    RC = ResistorNetwork()
+    RC.BuildNetworkFromText(Netlist(('Source', 'ab', 'Value', 10), ('Resistor', 'bc', 'Resistance', 1000),
+                                    ('Capacitor', 'ac', 'Capacitance', 1e-6)))
+    tau = 1000 * 1e-6
+    for method in ('euler', 'trapezoidal'):
+        sim = TransientSimulation(RC, dt=tau / 100, method=method)
+        t, v, i = next(sim.Chunks(500))
+        vc = v[:, sim.Circuit.NodeNames.index('c')]
+        exact = 10 * (1 - np.exp(-t / tau))
+        print('RC charging, {:<12s} max error {:0.2e} V'.format(method, np.max(np.abs(vc - exact))))
+    RLC = ResistorNetwork()
+    RLC.BuildNetworkFromText(Netlist(('Source', 'ab', 'Value', 1), ('Resistor', 'bc', 'Resistance', 10),
+                                     ('Inductor', 'cd', 'Inductance', 1e-3), ('Capacitor', 'ad', 'Capacitance', 1e-6)))
+    # underdamped step response of the capacitor voltage
+    w0, zeta = 1 / np.sqrt(1e-3 * 1e-6), 10 / 2 * np.sqrt(1e-6 / 1e-3)
+    wd = w0 * np.sqrt(1 - zeta**2)
+    for method in ('euler', 'trapezoidal'):
+        sim = TransientSimulation(RLC, dt=1e-7, method=method)
+        t, v, i = next(sim.Chunks(20000))
+        vc = v[:, sim.Circuit.NodeNames.index('d')]
+        exact = 1 - np.exp(-zeta * w0 * t) * (np.cos(wd * t) + zeta / np.sqrt(1 - zeta**2) * np.sin(wd * t))
+        print('RLC ringing, {:<12s} max error {:0.2e} V'.format(method, np.max(np.abs(vc - exact))))
+    Net = ResistorNetwork()
+    Net.BuildNetworkFromText(open("ResistorNetwork.txt").read() +
+                             Netlist(('Capacitor', 'ce', 'Capacitance', 1e-3), ('Inductor', 'bd', 'Inductance', 1e-2)))
+    sim = TransientSimulation(Net, dt=1e-5, waveforms={'ab': lambda t: 16 * np.sin(2 * np.pi * 60 * t)})
+    with tempfile.TemporaryDirectory() as d:
+        r = sim.Run(1000000, d)
+        print('{} steps of the homework network ({} nodes, {} elements) in {:0.2f} s, {:0.2f} us/step'.format(
+            r['steps'], len(sim.Circuit.NodeNames), len(sim.ColumnNames), r['seconds'],
+            1e6 * r['seconds'] / r['steps']))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
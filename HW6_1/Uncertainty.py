@@ -0,0 +1,140 @@
+#region imports
+import os
+import sys
+import time
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledCircuit import CompiledCircuit
+from montecarlo import Normal, Uniform, LogNormal, StreamingStats, runChunks
+#endregion
+
+#region class definitions
+class MonteCarloStudy():
+    #region constructor
+    def __init__(self, network, seed=0):
+        """
+        Propagates resistor tolerances and uncertain source voltages through a circuit to its DC currents and
+        node voltages.  Samples are drawn and solved in chunks (CompiledCircuit.SolveDCBatch solves a whole
+        batch in one call), chunks run in parallel worker processes, and only the StreamingStats are kept.
+        Chunk k draws from its own generator seeded with SeedSequence(seed, spawn_key=(k,)), so the streams are
+        independent and the result does not depend on the number of workers or the order chunks finish in.
+        :param network: a ResistorNetwork object
+        :param seed: root seed of the random streams
+        """
+        #region attributes
+        self.Network = network
+        self.Seed = seed
+        self.Circuit = CompiledCircuit(network)
+        cc = self.Circuit
+        self.Uncertain = []  # (attribute, indices, distribution)
+        self.Thresholds = []
+        self.Names = (['I ' + n for n in cc.R[3]] + ['I ' + n for n in cc.VS[3]] + ['I ' + n for n in cc.L[3]] +
+                      ['V ' + n for n in cc.NodeNames])
+        self.Nominal = {'Resistance': cc.R[2].copy(), 'Voltage': cc.VS[2].copy()}
+        self.Failed = 0
+        self.Seconds = 0.0
+        #endregion
+    #endregion
+
+    #region methods
+    def Vary(self, attribute, dist, names=None):
+        """
+        Makes an input uncertain.
+        :param attribute: 'Resistance' of resistors or 'Voltage' of sources
+        :param dist: a Normal, Uniform or LogNormal object
+        :param names: element names to vary (default: all resistors or all sources)
+        """
+        if attribute not in self.Nominal:
+            raise ValueError("unknown attribute '{}'".format(attribute))
+        allNames = self.Circuit.R[3] if attribute == 'Resistance' else self.Circuit.VS[3]
+        idx = np.arange(len(allNames)) if names is None else np.array([allNames.index(n) for n in names])
+        self.Uncertain.append((attribute, idx, dist))
+
+    def Threshold(self, column, op, limit):
+        """
+        Counts the probability that an output is above (op '>') or below (op '<') a limit.
+        :param column: output name, 'I ad' for an element current or 'V c' for a node voltage
+        """
+        if column not in self.Names:
+            raise ValueError("unknown output '{}'".format(column))
+        self.Thresholds.append((column, op, limit))
+
+    def Sample(self, rng, n):
+        """
+        :return: dict of (n, ...) arrays for 'Resistance' and 'Voltage'
+        """
+        values = {k: np.repeat(v[None, :], n, axis=0) for k, v in self.Nominal.items()}
+        for attribute, idx, dist in self.Uncertain:
+            values[attribute][:, idx] = dist.sample(rng, self.Nominal[attribute][idx], n)
+        return values
+
+    def SolveChunk(self, k, n, batchSize=1024):
+        """
+        Draws and solves chunk k of n samples.
+        :return: (outputs as an (n solved, columns) array, number of samples with a singular circuit)
+        """
+        cc = self.Circuit
+        rng = np.random.default_rng(np.random.SeedSequence(self.Seed, spawn_key=(k,)))
+        v = self.Sample(rng, n)
+        out, failed = [], 0
+        for b in range(0, n, batchSize):
+            R = v['Resistance'][b:b + batchSize]
+            try:
+                X, IL = cc.SolveDCBatch(R, v['Voltage'][b:b + batchSize])
+            except np.linalg.LinAlgError:
+                failed += len(R)
+                continue
+            IR = cc.BranchVoltage(X, cc.R[0], cc.R[1]) / R
+            out.append(np.concatenate((IR, X[:, cc.nV:], IL, cc.NodeVoltages(X)), axis=1))
+        return (np.concatenate(out) if out else np.zeros((0, len(self.Names)))), failed
+
+    def Run(self, nSamples, chunkSize=20000, workers=None, pilot=1000, progress=None):
+        """
+        Runs the study with montecarlo.runChunks: a pilot chunk solved here fixes the histogram ranges, the
+        remaining chunks are summarized in worker processes and merged as they finish.
+        :param nSamples: number of samples
+        :param chunkSize: samples per chunk
+        :param workers: number of processes (default: os.cpu_count(); 1 runs everything in this process)
+        :param pilot: samples of the pilot chunk
+        :param progress: optional function called with (samples done, StreamingStats) after every chunk
+        :return: the StreamingStats of all samples
+        """
+        t0 = time.perf_counter()
+        stats, (self.Failed,) = runChunks(self.SolveChunk, self.Names, self.Thresholds, nSamples, chunkSize,
+                                          workers, pilot, progress)
+        self.Seconds = time.perf_counter() - t0
+        return stats
+    #endregion
+#endregion
+
+#region function definitions
+def main():
+    """
+    Uncertainty of the homework circuit with 5% resistors and sources that are good to 2%.
+    :return: nothing, just prints to screen
+    """
+    from ResistorNetwork import ResistorNetwork
+    Net = ResistorNetwork()
+    Net.BuildNetworkFromFile("ResistorNetwork.txt")
+    study = MonteCarloStudy(Net, seed=1)
+    study.Vary('Resistance', Uniform(-0.05, 0.05))
+    study.Vary('Voltage', Normal(0.02))
+    study.Threshold('I cd', '>', 8.3)
+    study.Threshold('V e', '<', 35.0)
+    stats = study.Run(100000, workers=2)
+    s = stats.summary()
+    print('{} samples in {:0.2f} s ({:0.0f} solves/s), {} failed'.format(s['count'], study.Seconds,
+                                                                        s['count'] / study.Seconds, study.Failed))
+    print('{:>16s}{:>10s}{:>10s}{:>10s}{:>10s}{:>10s}'.format('output', 'mean', 'std', 'p5', 'p50', 'p95'))
+    for j, name in enumerate(s['names']):
+        print('{:>16s}{:>10.4f}{:>10.4f}{:>10.4f}{:>10.4f}{:>10.4f}'.format(name, s['mean'][j], s['std'][j],
+                                                                        s['p5'][j], s['p50'][j], s['p95'][j]))
+    for (c, op, limit), p in s['exceedance'].items():
+        print('P({} {} {:g}) = {:0.4f}'.format(c, op, limit, p))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,464 @@
+#region imports
+import math
+import numpy as np
+from kernels import colebrookU, loopHeadLoss
+#endregion
+
+#region function definitions
+def frictionFactors(Re, rr, u0=None, tol=1e-12, maxIter=50):
+    '''
+    Vectorized Darcy friction factor with the same regimes as Pipe.FrictionFactor: 64/Re for Re<=2000,
+    Colebrook for Re>=4000 and, in between, the linear blend that Pipe uses as the mean of its random draw.
+    Colebrook is solved with Newton's method on u=1/sqrt(f) for all pipes at once (see kernels.colebrookU).
+    :param Re: array of Reynolds numbers (>0)
+    :param rr: array of relative roughness
+    :param u0: optional starting values of u, e.g. from the previous solve
+    :return: (f, df/dRe, u) arrays (u is only updated for Re>2000)
+    '''
+    fCB=np.zeros(Re.shape)
+    dCB=np.zeros(Re.shape)
+    u=np.full(Re.shape, 1/(0.01**0.5)) if u0 is None else np.array(u0, dtype=float)
+    u[~(u>0)]=1/(0.01**0.5)  # same starting point as Pipe.colebrook where there is no usable previous value
+    turb=Re>2000  # Colebrook is only used for turbulent and transitional flow
+    if turb.any():
+        a=rr[turb]/3.7
+        b=2.51/Re[turb]
+        v=colebrookU(Re[turb], rr[turb], u[turb], tol, maxIter)
+        u[turb]=v
+        fCB[turb]=1/v**2
+        # implicit derivative of the Colebrook equation, as in Pipe.dHdQ
+        arg=a+b*v
+        dFdu=1.0+2.0*b/(arg*math.log(10))
+        dFdRe=-2.0*2.51*v/(Re[turb]**2*arg*math.log(10))
+        dCB[turb]=-2.0/v**3*(-dFdRe/dFdu)
+    fLam=64/Re
+    dLam=-64/Re**2
+    w=np.clip((Re-2000)/(4000-2000), 0.0, 1.0)
+    f=fLam+w*(fCB-fLam)
+    dfdRe=dLam+w*(dCB-dLam)+np.where((Re>2000)&(Re<4000), (fCB-fLam)/(4000-2000), 0.0)
+    return f, dfdRe, u
+#endregion
+
+#region class definitions
+class CompiledNetwork():
+    #region constructor
+    def __init__(self, network):
+        '''
+        An array form of a PipeNetwork for repeated solves: node-pipe incidence, per-pipe constants and the
+        sparsity pattern of the nodal head equations are built once.  Tank nodes (network.tanks) have a fixed
+        head; without tanks the first node is a datum at zero head, which is enough for balanced demands.
+        The compiled network is immutable (its arrays are read-only) and every solve keeps its flows, heads and
+        friction factor iterates in a NetworkState, so one CompiledNetwork can be shared by any number of threads
+        or async tasks solving different scenarios at the same time.
+        :param network: a PipeNetwork object whose nodes are built
+        '''
+        #region attributes
+        self.pipeNames=tuple(p.Name() for p in network.pipes)
+        self.nodeNames=tuple(n.name for n in network.nodes)
+        index={n: k for k, n in enumerate(self.nodeNames)}
+        self.start=np.array([index[p.startNode] for p in network.pipes])
+        self.end=np.array([index[p.endNode] for p in network.pipes])
+        self.length=np.array([p.length for p in network.pipes], dtype=float)
+        self.d=np.array([p.d for p in network.pipes], dtype=float)
+        self.rr=np.array([p.relrough for p in network.pipes], dtype=float)
+        self.A=np.pi/4.0*self.d**2
+        self.rho=np.array([p.rho for p in network.pipes], dtype=float)
+        self.mu=np.array([p.mu for p in network.pipes], dtype=float)
+        # the distinct fluids, so that a temperature field is evaluated with one call per fluid
+        self.fluids=tuple({id(p.fluid): p.fluid for p in network.pipes}.values())
+        fIndex={id(f): k for k, f in enumerate(self.fluids)}
+        self.fluidOf=np.array([fIndex[id(p.fluid)] for p in network.pipes], dtype=int)
+        tanks=getattr(network, 'tanks', [])
+        self.tankNames=tuple(t.node for t in tanks)
+        fixed=[index[t.node] for t in tanks] if tanks else [0]
+        self.fixed=np.array(fixed)
+        self.isFixed=np.zeros(len(self.nodeNames), bool)
+        self.isFixed[self.fixed]=True
+        self.junctions=np.flatnonzero(~self.isFixed)
+        jIndex=np.full(len(self.nodeNames), -1)
+        jIndex[self.junctions]=np.arange(len(self.junctions))
+        self.js=jIndex[self.start]  # junction index of each pipe end, -1 at a fixed head node
+        self.je=jIndex[self.end]
+        self.loopNames=tuple(l.name for l in network.loops)
+        self.loopPtr, self.loopPipe, self.loopSign=network.loopIncidence()
+        self._buildPattern()
+        for a in (self.start, self.end, self.length, self.d, self.rr, self.A, self.rho, self.mu, self.fluidOf,
+                  self.fixed, self.isFixed, self.junctions, self.js, self.je, self.indptr, self.indices, self.pos,
+                  self.pipeOf, self.sign, self.loopPtr, self.loopPipe, self.loopSign):
+            a.flags.writeable=False
+        #endregion
+    #endregion
+
+    #region methods
+    def _buildPattern(self):
+        '''
+        Compiles the sparsity pattern of the junction matrix A_J^T W A_J (W diagonal, one weight per pipe) and the
+        position in the CSC data array that every (pipe, entry) contribution adds to, so assembling the matrix
+        for new weights is a single bincount.
+        '''
+        from scipy.sparse import csc_matrix
+        nJ=len(self.junctions)
+        rows, cols, pipes, signs=[], [], [], []
+        for p, (a, b) in enumerate(zip(self.js, self.je)):
+            for r, c, sgn in ((a, a, 1.0), (b, b, 1.0), (a, b, -1.0), (b, a, -1.0)):
+                if r>=0 and c>=0:
+                    rows.append(r)
+                    cols.append(c)
+                    pipes.append(p)
+                    signs.append(sgn)
+        rows, cols=np.array(rows, dtype=int), np.array(cols, dtype=int)
+        M=csc_matrix((np.ones(len(rows)), (rows, cols)), shape=(nJ, nJ))
+        M.sum_duplicates()
+        M.sort_indices()
+        self.indptr, self.indices=M.indptr.copy(), M.indices.copy()
+        pos=np.empty(len(rows), dtype=int)
+        for k, (r, c) in enumerate(zip(rows, cols)):
+            lo, hi=self.indptr[c], self.indptr[c+1]
+            pos[k]=lo+np.searchsorted(self.indices[lo:hi], r)
+        self.pos, self.pipeOf, self.sign=pos, np.array(pipes, dtype=int), np.array(signs)
+        self.nnz=len(self.indices)
+
+    def matrix(self, w):
+        '''
+        Assembles A_J^T diag(w) A_J in the compiled pattern.
+        :param w: one weight per pipe
+        :return: a scipy.sparse csc_matrix
+        '''
+        from scipy.sparse import csc_matrix
+        data=np.bincount(self.pos, weights=w[self.pipeOf]*self.sign, minlength=self.nnz)
+        n=len(self.junctions)
+        return csc_matrix((data, self.indices, self.indptr), shape=(n, n))
+
+    def fluidProperties(self, T):
+        '''
+        Viscosity and density of every pipe for a temperature field, with one vectorized call per fluid (see
+        Fluid.properties).  Fluids without a temperature model keep their constant properties.
+        :param T: pipe temperatures in C: a scalar, (number of pipes,) or (B, number of pipes)
+        :return: (mu, rho) arrays with the shape of T broadcast to the pipes
+        '''
+        T=np.asarray(T, dtype=float)
+        T=np.broadcast_to(T, np.broadcast_shapes(T.shape, (len(self.pipeNames),)))
+        mu, rho=np.empty(T.shape), np.empty(T.shape)
+        for k, fluid in enumerate(self.fluids):
+            m=self.fluidOf==k
+            mu[..., m], rho[..., m]=fluid.properties(T[..., m])
+        return mu, rho
+
+    def reynolds(self, Q, props=None, d=None):
+        '''
+        Velocity and Reynolds number of all pipes in one array operation.
+        :param Q: pipe flows, (number of pipes,) or (B, number of pipes)
+        :param props: optional (mu, rho) arrays, e.g. from fluidProperties (default: the compiled properties)
+        :param d: optional diameters in m (default: the compiled diameters)
+        :return: (V, Re) arrays
+        '''
+        mu, rho=(self.mu, self.rho) if props is None else props
+        d=self.d if d is None else d
+        V=np.abs(Q)/(self.A if d is self.d else np.pi/4.0*d**2)
+        return V, rho*V*d/mu
+
+    def headLoss(self, Q, u=None, props=None):
+        '''
+        Signed head loss and its slope for every pipe (Darcy-Weisbach, as Pipe.frictionHeadLoss and Pipe.dHdQ).
+        :param Q: pipe flows
+        :param u: optional Colebrook iterates 1/sqrt(f) to start from (see frictionFactors)
+        :param props: optional (mu, rho) arrays for a temperature field (see fluidProperties)
+        :return: (h, dh/dQ, u) arrays, h in m of fluid
+        '''
+        g=9.81
+        mu, rho=(self.mu, self.rho) if props is None else props
+        V, Re=self.reynolds(Q, props)
+        flowing=Re>1e-12
+        ReSafe=np.where(flowing, Re, 1.0)
+        f, dfdRe, u=frictionFactors(ReSafe, self.rr, u)
+        h=np.sign(Q)*f*self.length*V**2/(2*g*self.d)
+        lam=64*mu*self.length/(2*g*rho*self.d**2*self.A)  # laminar limit of dh/dQ at Q=0
+        dhdq=np.where(flowing, self.length*V/(2*g*self.d*self.A)*(2*f+ReSafe*dfdRe), lam)
+        return h, dhdq, u
+
+    def loopHeadLoss(self, Q, u=None, props=None):
+        '''
+        Net head loss around every loop of the network (see kernels.loopHeadLoss).
+        :param Q: pipe flows
+        :param u: optional Colebrook iterates, e.g. NetworkState.u
+        :param props: optional (mu, rho) arrays for a temperature field
+        :return: array with one value per loop in m of fluid
+        '''
+        return loopHeadLoss(self.headLoss(Q, u, props)[0], self.loopPtr, self.loopPipe, self.loopSign)
+
+    def nodeInflow(self, Q, ext):
+        '''
+        Net flow into every node: pipe flows (+ into the node, as Pipe.getFlowIntoNode) plus the external flow.
+        :param Q: pipe flows
+        :param ext: external flow of every node (+ into the node)
+        :return: array with one value per node
+        '''
+        n=len(self.nodeNames)
+        return ext-np.bincount(self.start, Q, n)+np.bincount(self.end, Q, n)
+
+    def solve(self, ext, Hfixed=None, Q0=None, H0=None, tol=1e-10, maxIter=50, state=None, linearSolve=None,
+              T=None):
+        '''
+        Finds the pipe flows and node heads with Newton's method on the head loss and node balance equations
+        (the global gradient algorithm).  Each iteration solves the junction system A_J^T D^-1 A_J dH = rhs,
+        D=diag(dh/dQ), which is assembled in the compiled sparsity pattern.
+        :param ext: external flow of every node (+ into the node); ignored at fixed head nodes
+        :param Hfixed: heads of the fixed nodes (default zeros)
+        :param Q0: starting flows, e.g. the previous time step (default: the flows of state, else 1 m/s in
+                   every pipe)
+        :param H0: starting heads of all nodes (default: the heads of state, else the mean fixed head)
+        :param state: optional NetworkState that the solve starts from and stores its result in
+        :param linearSolve: optional function (w, rhs) -> dH of the junctions that replaces the sparse direct
+                            solve of the junction system, e.g. DomainDecomposition.junctionSolve
+        :param T: optional pipe temperatures in C (see fluidProperties); the fluid properties are evaluated once
+                  per solve, and kept in state for the following ones
+        :return: (Q, H, iterations, converged)
+        '''
+        from scipy.sparse.linalg import splu
+        if state is not None:
+            Q0=state.Q if Q0 is None else Q0
+            H0=state.H if H0 is None else H0
+            if T is not None:
+                state.setTemperature(T)
+            props=state.props
+        else:
+            props=None if T is None else self.fluidProperties(T)
+        u=None if state is None else state.u
+        Hf=np.zeros(len(self.fixed)) if Hfixed is None else np.asarray(Hfixed, dtype=float)
+        Q=self.A.copy() if Q0 is None else np.array(Q0, dtype=float)
+        H=np.full(len(self.nodeNames), Hf.mean()) if H0 is None else np.array(H0, dtype=float)
+        H[self.fixed]=Hf
+        extJ=np.asarray(ext, dtype=float)[self.junctions]
+        converged=False
+        for it in range(1, maxIter+1):
+            h, dhdq, u=self.headLoss(Q, u, props)
+            F1=h-(H[self.start]-H[self.end])
+            F2=-self.nodeInflow(Q, np.zeros(len(self.nodeNames)))[self.junctions]-extJ
+            w=1/dhdq
+            # A_J^T D^-1 F1 and the right hand side of the junction system
+            wF=w*F1
+            rhs=-F2+np.bincount(self.js[self.js>=0], wF[self.js>=0], len(extJ)) \
+                -np.bincount(self.je[self.je>=0], wF[self.je>=0], len(extJ))
+            if not len(extJ):
+                dHJ=np.zeros(0)
+            elif linearSolve is not None:
+                dHJ=linearSolve(w, rhs)
+            else:
+                dHJ=splu(self.matrix(w)).solve(rhs)
+            dH=np.zeros(len(self.nodeNames))
+            dH[self.junctions]=dHJ
+            dQ=w*((dH[self.start]-dH[self.end])-F1)
+            Q+=dQ
+            H+=dH
+            if np.sum(np.abs(dQ))<=tol*max(np.sum(np.abs(Q)), 1e-300):
+                converged=True
+                break
+        if state is not None:
+            state.Q, state.H, state.u, state.iterations, state.converged=Q, H, u, it, converged
+        return Q, H, it, converged
+
+    def solveBatch(self, ext, d=None, r=None, Hfixed=None, Q0=None, H0=None, tol=1e-10, maxIter=50, T=None):
+        '''
+        Solves B copies of the network that differ in their demands, diameters, roughness and temperatures in one
+        Newton iteration: the junction systems of the copies form a block diagonal matrix that is assembled in the
+        compiled pattern and factorized together, and the head losses of all copies are one vectorized call.
+        :param ext: (B, number of nodes) external flows (+ into the node)
+        :param d: optional (B, number of pipes) diameters in m (default: the compiled diameters)
+        :param r: optional (B, number of pipes) roughness in m (default: the compiled roughness)
+        :param Hfixed: heads of the fixed nodes, (number of fixed nodes,) or (B, number of fixed nodes)
+        :param Q0: optional starting flows, (number of pipes,) or (B, number of pipes)
+        :param H0: optional starting heads, (number of nodes,) or (B, number of nodes)
+        :param T: optional pipe temperatures in C, a scalar, (number of pipes,) or (B, number of pipes)
+        :return: (Q, H, iterations, converged) with Q (B, pipes), H (B, nodes) and converged (B,)
+        '''
+        from scipy.sparse import csc_matrix
+        from scipy.sparse.linalg import splu
+        ext=np.atleast_2d(np.asarray(ext, dtype=float))
+        B, nN, nP, nJ=len(ext), len(self.nodeNames), len(self.pipeNames), len(self.junctions)
+        d=np.broadcast_to(self.d if d is None else d, (B, nP))
+        r=np.broadcast_to(self.rr*self.d if r is None else r, (B, nP))
+        rr=r/d
+        A=np.pi/4.0*d**2
+        Hf=np.broadcast_to(np.zeros(len(self.fixed)) if Hfixed is None else Hfixed, (B, len(self.fixed)))
+        Q=A.copy() if Q0 is None else np.array(np.broadcast_to(Q0, (B, nP)), dtype=float)
+        H=np.repeat(Hf.mean(axis=1, keepdims=True), nN, axis=1) if H0 is None \
+            else np.array(np.broadcast_to(H0, (B, nN)), dtype=float)
+        H[:, self.fixed]=Hf
+        extJ=ext[:, self.junctions]
+        # block diagonal pattern: copy b uses rows and columns b*nJ ... (b+1)*nJ-1
+        offsets=np.arange(B)[:, None]
+        indptr=np.concatenate(((self.indptr[:-1]+self.nnz*offsets).ravel(), [B*self.nnz]))
+        indices=(self.indices+nJ*offsets).ravel()
+        pos=(self.pos+self.nnz*offsets).ravel()
+        sIdx=(self.start+nN*offsets).ravel()
+        eIdx=(self.end+nN*offsets).ravel()
+        sJ, eJ=self.js>=0, self.je>=0
+        jsIdx=(self.js[sJ]+nJ*offsets).ravel()
+        jeIdx=(self.je[eJ]+nJ*offsets).ravel()
+        g=9.81
+        props=None if T is None else self.fluidProperties(T)  # evaluated once for all of the iterations
+        mu, rho=(self.mu, self.rho) if props is None else props
+        lam=64*mu*self.length/(2*g*rho*d**2*A)
+        u=None
+        converged=np.zeros(B, bool)
+        for it in range(1, maxIter+1):
+            V, Re=self.reynolds(Q, props, d)
+            flowing=Re>1e-12
+            ReSafe=np.where(flowing, Re, 1.0)
+            f, dfdRe, u=frictionFactors(ReSafe.ravel(), rr.ravel(), u)
+            f, dfdRe=f.reshape(B, nP), dfdRe.reshape(B, nP)
+            h=np.sign(Q)*f*self.length*V**2/(2*g*d)
+            dhdq=np.where(flowing, self.length*V/(2*g*d*A)*(2*f+ReSafe*dfdRe), lam)
+            F1=h-(H[:, self.start]-H[:, self.end])
+            inflow=(np.bincount(eIdx, Q.ravel(), B*nN)-np.bincount(sIdx, Q.ravel(), B*nN)).reshape(B, nN)
+            F2=-inflow[:, self.junctions]-extJ
+            w=1/dhdq
+            wF=w*F1
+            rhs=-F2+(np.bincount(jsIdx, wF[:, sJ].ravel(), B*nJ)-np.bincount(jeIdx, wF[:, eJ].ravel(), B*nJ)).reshape(B, nJ)
+            dH=np.zeros((B, nN))
+            if nJ:
+                data=np.bincount(pos, weights=(w[:, self.pipeOf]*self.sign).ravel(), minlength=B*self.nnz)
+                M=csc_matrix((data, indices, indptr), shape=(B*nJ, B*nJ))
+                dH[:, self.junctions]=splu(M).solve(rhs.ravel()).reshape(B, nJ)
+            dQ=w*((dH[:, self.start]-dH[:, self.end])-F1)
+            Q+=dQ
+            H+=dH
+            converged=np.sum(np.abs(dQ), axis=1)<=tol*np.maximum(np.sum(np.abs(Q), axis=1), 1e-300)
+            if converged.all():
+                break
+        return Q, H, it, converged
+
+    def pipeTable(self, Q, u=None, props=None):
+        '''
+        One record per pipe, computed for all pipes at once: name, start and end node, flow rate, velocity,
+        Reynolds number, friction factor and signed head loss.
+        :param Q: pipe flows
+        :param u: optional Colebrook iterates, e.g. NetworkState.u
+        :param props: optional (mu, rho) arrays for a temperature field, e.g. NetworkState.props
+        :return: structured numpy array
+        '''
+        from result_io import toTable
+        h, _, u=self.headLoss(Q, u, props)
+        V, Re=self.reynolds(Q, props)
+        f, _, _=frictionFactors(np.where(Re>1e-12, Re, 1.0), self.rr, u)
+        names=np.array(self.nodeNames)
+        return toTable({'name': np.array(self.pipeNames), 'start': names[self.start], 'end': names[self.end],
+                        'Q': Q, 'velocity': V, 'Re': Re, 'frictionFactor': np.where(Re>1e-12, f, 0.0),
+                        'headLoss': h})
+
+    def nodeTable(self, Q, H, ext):
+        '''
+        One record per node: name, head, external flow and net flow into the node.
+        :param Q: pipe flows
+        :param H: node heads
+        :param ext: external flow of every node
+        :return: structured numpy array
+        '''
+        from result_io import toTable
+        ext=np.asarray(ext, dtype=float)
+        return toTable({'name': np.array(self.nodeNames), 'head': H, 'extFlow': ext,
+                        'netFlow': self.nodeInflow(Q, ext)})
+
+    def residualReport(self, Q, H, ext, Hfixed=None, u=None, props=None):
+        '''
+        Verifies a solution in one table with array operations only: mass conservation at the junctions (the
+        fixed head nodes supply whatever is needed), head loss against head difference along every pipe, the
+        net head loss around the loops of the network and, if given, the heads of the fixed nodes.
+        :param Q: pipe flows
+        :param H: node heads
+        :param ext: external flow of every node
+        :param Hfixed: optional heads of the fixed nodes
+        :param u: optional Colebrook iterates, e.g. NetworkState.u
+        :param props: optional (mu, rho) arrays for a temperature field, e.g. NetworkState.props
+        :return: structured array, see result_io.residualTable
+        '''
+        from result_io import residualTable
+        h, _, _=self.headLoss(Q, u, props)
+        checks=[('continuity', np.array(self.nodeNames)[self.junctions],
+                 self.nodeInflow(Q, np.asarray(ext, dtype=float))[self.junctions]),
+                ('pipe head loss', np.array(self.pipeNames), h-(H[self.start]-H[self.end]))]
+        if Hfixed is not None:
+            checks.append(('fixed head', np.array(self.nodeNames)[self.fixed], H[self.fixed]-np.asarray(Hfixed)))
+        if self.loopNames:
+            checks.append(('loop head loss', self.loopNames,
+                           loopHeadLoss(h, self.loopPtr, self.loopPipe, self.loopSign)))
+        return residualTable(checks)
+
+    def writeBack(self, network, Q):
+        '''
+        Copies solved flows back to the Pipe objects.
+        :param network: the PipeNetwork this was compiled from
+        :param Q: pipe flows
+        '''
+        for p, q in zip(network.pipes, Q):
+            p.Q=float(q)
+    #endregion
+
+
+class NetworkState():
+    #region constructor
+    def __init__(self, compiled, Q=None, H=None):
+        '''
+        The per-solve arrays of a CompiledNetwork: pipe flows, node heads and the Colebrook iterates that the
+        next solve starts from.  A state is cheap, so every thread, task or scenario keeps its own and shares the
+        compiled network.
+        :param compiled: the CompiledNetwork
+        :param Q: optional starting flows
+        :param H: optional starting heads
+        '''
+        #region attributes
+        self.compiled=compiled
+        self.Q=None if Q is None else np.array(Q, dtype=float)
+        self.H=None if H is None else np.array(H, dtype=float)
+        self.u=None
+        self.T=None  # optional pipe temperatures, and the fluid properties evaluated for them
+        self.props=None
+        self.iterations=0
+        self.converged=False
+        #endregion
+    #endregion
+
+    #region methods
+    def setTemperature(self, T):
+        '''
+        Sets the pipe temperatures of this state and evaluates the fluid properties for them, once, so every
+        solve and report of the state uses them without evaluating the fluid models again.
+        :param T: pipe temperatures in C (see CompiledNetwork.fluidProperties), or None for the compiled properties
+        '''
+        if T is None:
+            self.T, self.props=None, None
+            return
+        T=np.array(np.broadcast_to(np.asarray(T, dtype=float), (len(self.compiled.pipeNames),)))
+        if self.T is None or not np.array_equal(T, self.T):
+            self.T, self.props=T, self.compiled.fluidProperties(T)
+
+    def solve(self, ext, Hfixed=None, tol=1e-10, maxIter=50, T=None):
+        '''
+        Solves the compiled network from this state and keeps the result (see CompiledNetwork.solve).
+        :param T: optional new pipe temperatures (see setTemperature); default: those of the state
+        :return: (Q, H, iterations, converged)
+        '''
+        return self.compiled.solve(ext, Hfixed, tol=tol, maxIter=maxIter, state=self, T=T)
+
+    def results(self, ext):
+        '''
+        The solution of this state as structured arrays, ready for the bulk writers of result_io.
+        :param ext: external flow of every node
+        :return: dict with 'pipes' and 'nodes' (see CompiledNetwork.pipeTable and nodeTable)
+        '''
+        return {'pipes': self.compiled.pipeTable(self.Q, self.u, self.props),
+                'nodes': self.compiled.nodeTable(self.Q, self.H, ext)}
+
+    def residualReport(self, ext, Hfixed=None):
+        '''
+        Verifies the solution of this state (see CompiledNetwork.residualReport).
+        '''
+        return self.compiled.residualReport(self.Q, self.H, ext, Hfixed, self.u, self.props)
+
+    def writeBack(self, network):
+        '''
+        Copies the flows of this state to the Pipe objects of a network with the compiled topology.
+        '''
+        self.compiled.writeBack(network, self.Q)
+    #endregion
+#endregion
@@ -0,0 +1,361 @@
+#region imports
+import multiprocessing as mp
+import time
+import numpy as np
+#endregion
+
+#region function definitions
+def partition(compiled, nParts):
+    '''
+    Splits the junctions of a network into nParts balanced, connected-as-possible subdomains by recursive
+    bisection of the pipe graph: each piece is ordered breadth first from a pseudo-peripheral node and cut where
+    the requested share of its nodes is reached, which gives compact parts with short boundaries.
+    :param compiled: a CompiledNetwork
+    :param nParts: number of subdomains
+    :return: the subdomain of every junction (array in the junction order of compiled.junctions)
+    '''
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import breadth_first_order
+    nJ=len(compiled.junctions)
+    both=(compiled.js>=0)&(compiled.je>=0)
+    a, b=compiled.js[both], compiled.je[both]
+    adj=coo_matrix((np.ones(2*len(a)), (np.concatenate((a, b)), np.concatenate((b, a)))), shape=(nJ, nJ)).tocsr()
+    part=np.zeros(nJ, dtype=int)
+
+    def bfsOrder(sub):
+        n=sub.shape[0]
+        start=0
+        for _ in range(2):  # the last node reached from the last node reached is nearly peripheral
+            order=breadth_first_order(sub, start, directed=False, return_predecessors=False)
+            start=order[-1]
+        # pieces that are not connected to the start follow in their own breadth first orders
+        seen=np.zeros(n, bool)
+        seen[order]=True
+        orders=[order]
+        while not seen.all():
+            o=breadth_first_order(sub, np.flatnonzero(~seen)[0], directed=False, return_predecessors=False)
+            seen[o]=True
+            orders.append(o)
+        return np.concatenate(orders)
+
+    def bisect(nodes, k, first):
+        if k==1 or len(nodes)<2:
+            part[nodes]=first
+            return
+        order=nodes[bfsOrder(adj[nodes][:, nodes])]
+        k1=k//2
+        cut=int(round(len(nodes)*k1/k))
+        bisect(order[:cut], k1, first)
+        bisect(order[cut:], k-k1, first+k1)
+
+    bisect(np.arange(nJ), max(1, nParts), 0)
+    return part
+
+
+def _stamps(js, je, pipes, rowOk):
+    '''
+    The entries of A_J^T diag(w) A_J contributed by some pipes, restricted to rows where rowOk is True.
+    :return: (rows, cols, pipe of each entry, sign of each entry) in junction numbering
+    '''
+    rows, cols, pipeOf, sign=[], [], [], []
+    a, b=js[pipes], je[pipes]
+    for r, c, sgn in ((a, a, 1.0), (b, b, 1.0), (a, b, -1.0), (b, a, -1.0)):
+        ok=(r>=0)&(c>=0)
+        ok[ok]=rowOk[r[ok]]
+        rows.append(r[ok])
+        cols.append(c[ok])
+        pipeOf.append(pipes[ok])
+        sign.append(np.full(ok.sum(), sgn))
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(pipeOf), np.concatenate(sign)
+
+
+def _subdomainWorker(conn, shmName, layout, spec):
+    '''
+    The loop of one subdomain process, driven by short commands from DomainDecomposition:
+      ('factor', condense)
+                 assembles and factorizes the interior matrix M_II, solves z=M_II^-1 r_I and writes the reduced
+                 right hand side M_GI z; if condense it also forms Y=M_II^-1 M_IG and writes its Schur
+                 complement block M_GI Y
+      'apply'    writes M_GI M_II^-1 M_IG x for the interface vector x (one product of the 'cg' method)
+      'interior' reads the interface solution dH_G and writes the interior solution dH_I = z - M_II^-1 M_IG dH_G
+    The CPU seconds each command took go to its slot of the busy array.  Replies True or the exception.
+    '''
+    from multiprocessing import shared_memory
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.linalg import splu
+    shm=shared_memory.SharedMemory(name=shmName)  # the parent unlinks it
+    arrays={k: np.ndarray(shape, np.float64, shm.buf, offset) for k, (offset, shape) in layout.items()}
+    w, rhs, dH, xG, busy=arrays['w'], arrays['rhs'], arrays['dH'], arrays['xG'], arrays['busy']
+    I, G, gPos=spec['I'], spec['G'], spec['gPos']
+    nI, nG=len(I), len(G)
+    g=arrays['g'][spec['off']:spec['off']+nG]
+    y=arrays['y'][spec['off']:spec['off']+nG]
+    S=arrays['schur'][spec['offS']:spec['offS']+nG*nG]
+    lu=MIG=Y=z=None
+    try:
+        while True:
+            cmd=conn.recv()
+            if cmd=='stop':
+                break
+            t0=time.process_time()  # CPU seconds, so workers sharing a core do not count each other
+            try:
+                if cmd[0]=='factor':
+                    MIG=coo_matrix((w[spec['pIG']]*spec['sIG'], (spec['rIG'], spec['cIG'])), shape=(nI, nG)).tocsr()
+                    if nI:
+                        MII=coo_matrix((w[spec['pII']]*spec['sII'], (spec['rII'], spec['cII'])),
+                                       shape=(nI, nI)).tocsc()
+                        lu=splu(MII)
+                        z=lu.solve(rhs[I])
+                    else:
+                        z=np.zeros(0)  # every junction of this subdomain is on the interface
+                    g[:]=MIG.T@z
+                    Y=None
+                    if cmd[1]:
+                        Y=lu.solve(MIG.toarray()) if nI and nG else np.zeros((nI, nG))
+                        S[:]=(MIG.T@Y).ravel()
+                elif cmd=='apply':
+                    y[:]=MIG.T@lu.solve(MIG@xG[gPos]) if nI and nG else 0.0
+                elif cmd=='interior':
+                    dG=dH[G]
+                    if Y is not None:
+                        dH[I]=z-Y@dG
+                    elif nI:
+                        dH[I]=z-(lu.solve(MIG@dG) if nG else 0.0)
+                busy[spec['index']]=time.process_time()-t0
+                conn.send(True)
+            except Exception as e:
+                conn.send(e)
+    finally:
+        del w, rhs, dH, xG, busy, g, y, S, arrays
+        shm.close()
+#endregion
+
+#region class definitions
+class DomainDecomposition():
+    #region constructor
+    def __init__(self, compiled, workers=4, method='schur', cgTol=1e-12, cgMaxIter=200, cgRefresh=20):
+        '''
+        A parallel replacement for the sparse direct solve of the junction system in CompiledNetwork.solve.  The
+        junctions are partitioned into one subdomain per worker process; the junctions at the ends of pipes that
+        cross subdomains form the interface G, so the interiors I_p of different subdomains are not coupled.
+        Every Newton iteration the workers factorize their interiors in parallel, the interface heads are found
+        from the Schur complement system
+            S dH_G = (M_GG - sum_p M_GIp M_IpIp^-1 M_IpG) dH_G = r_G - sum_p M_GIp M_IpIp^-1 r_Ip
+        and the workers then recover their interior heads.  With method 'schur' the workers condense their
+        interiors onto the interface every iteration (one solve per interface junction they touch) and S is
+        factorized here.  With method 'cg' S is only formed on the first solve and whenever the interface
+        iteration slows down: in between, S dH_G = g is solved by conjugate gradients preconditioned with the
+        last factorized S, and each product with S costs one pair of triangular solves per subdomain.  Newton
+        steps and consecutive time steps change S little, so a few iterations replace most condensations.
+        Pipe weights, right hand sides, heads and the Schur blocks are exchanged through one
+        shared memory block; only short commands go through pipes.
+        Use it as a context manager (or call close) so the worker processes and shared memory are released.
+        :param compiled: a CompiledNetwork
+        :param workers: number of subdomains and worker processes
+        :param method: 'schur' or 'cg'
+        :param cgTol: relative residual at which the interface iteration stops
+        :param cgMaxIter: iteration limit of the interface iteration
+        :param cgRefresh: the next solve forms S again after an interface iteration needed more iterations
+        '''
+        from multiprocessing import shared_memory
+        #region attributes
+        if method not in ('cg', 'schur'):
+            raise ValueError("method must be 'cg' or 'schur'")
+        self.compiled=compiled
+        self.workers=max(1, workers)
+        self.method=method
+        self.cgTol=cgTol
+        self.cgMaxIter=cgMaxIter
+        self.cgRefresh=cgRefresh
+        self._precondition=None  # solves with the last factorized S
+        C=compiled
+        nJ, nP=len(C.junctions), len(C.pipeNames)
+        self.part=partition(C, self.workers)
+        # interface: one end of every pipe between two subdomains (the end in the higher numbered subdomain)
+        both=(C.js>=0)&(C.je>=0)
+        cut=both&(self.part[np.maximum(C.js, 0)]!=self.part[np.maximum(C.je, 0)])
+        self.isInterface=np.zeros(nJ, bool)
+        hi=np.where(self.part[C.js[cut]]>self.part[C.je[cut]], C.js[cut], C.je[cut])
+        self.isInterface[hi]=True
+        self.interface=np.flatnonzero(self.isInterface)
+        nG=len(self.interface)
+        gIndex=np.full(nJ, -1)
+        gIndex[self.interface]=np.arange(nG)
+        # this process keeps the interface block M_GG
+        r, c, pp, sg=_stamps(C.js, C.je, np.arange(nP), self.isInterface)
+        keep=gIndex[c]>=0
+        self.rGG, self.cGG, self.pGG, self.sGG=gIndex[r[keep]], gIndex[c[keep]], pp[keep], sg[keep]
+        specs, off, offS=[], 0, 0
+        gPos, flatS=[], []
+        for p in range(self.workers):
+            inside=(self.part==p)&~self.isInterface
+            I=np.flatnonzero(inside)
+            lIndex=np.full(nJ, -1)
+            lIndex[I]=np.arange(len(I))
+            pipes=np.flatnonzero(((C.js>=0)&inside[np.maximum(C.js, 0)])|((C.je>=0)&inside[np.maximum(C.je, 0)]))
+            r, c, pp, sg=_stamps(C.js, C.je, pipes, inside)
+            inner=lIndex[c]>=0
+            G=np.unique(c[~inner])  # interface junctions next to this interior
+            gLocal=np.full(nJ, -1)
+            gLocal[G]=np.arange(len(G))
+            specs.append({'index': p, 'I': I, 'G': G, 'gPos': gIndex[G], 'off': off, 'offS': offS,
+                          'rII': lIndex[r[inner]], 'cII': lIndex[c[inner]], 'pII': pp[inner], 'sII': sg[inner],
+                          'rIG': lIndex[r[~inner]], 'cIG': gLocal[c[~inner]], 'pIG': pp[~inner], 'sIG': sg[~inner]})
+            gPos.append(gIndex[G])
+            off+=len(G)
+            flatS.append((gIndex[G][:, None]*nG+gIndex[G][None, :]).ravel())
+            offS+=len(G)**2
+        self.specs=specs
+        self.gPos=np.concatenate(gPos)  # interface position of every worker slot entry
+        self.flatS=np.concatenate(flatS) if flatS else np.zeros(0, int)
+        layout, size={}, 0
+        for k, n in (('w', nP), ('rhs', nJ), ('dH', nJ), ('xG', nG), ('g', off), ('y', off), ('schur', offS),
+                     ('busy', self.workers)):
+            layout[k]=(size, (n,))
+            size+=8*n
+        self.shm=shared_memory.SharedMemory(create=True, size=max(size, 8))
+        self.arrays={k: np.ndarray(shape, np.float64, self.shm.buf, o) for k, (o, shape) in layout.items()}
+        # wall time spent waiting for the workers and the part of it the slowest worker was busy, so
+        # wall-waiting+slowest estimates the time with one free core per worker
+        self.waiting=0.0
+        self.slowest=0.0
+        self.cgIterations=0
+        self.condensations=0
+        self.conns, self.procs=[], []
+        for spec in specs:
+            parent, child=mp.Pipe()
+            proc=mp.Process(target=_subdomainWorker, args=(child, self.shm.name, layout, spec), daemon=True)
+            proc.start()
+            self.conns.append(parent)
+            self.procs.append(proc)
+        #endregion
+    #endregion
+
+    #region methods
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _broadcast(self, cmd):
+        '''
+        Sends a command to every worker and waits for all the replies.  Every reply is read before a worker
+        error is raised, so no answer is left in a pipe to be taken for the reply to the next command.
+        '''
+        t0=time.perf_counter()
+        for conn in self.conns:
+            conn.send(cmd)
+        errors=[r for r in (conn.recv() for conn in self.conns) if r is not True]
+        if errors:
+            raise errors[0]
+        self.waiting+=time.perf_counter()-t0
+        self.slowest+=self.arrays['busy'].max()
+
+    def _gather(self, slot):
+        '''
+        Sums the per-worker interface vectors of a slot ('g' or 'y') into one interface vector.
+        '''
+        return np.bincount(self.gPos, self.arrays[slot], len(self.interface))
+
+    def junctionSolve(self, w, rhs):
+        '''
+        Solves A_J^T diag(w) A_J dH = rhs by the Schur complement method (see the constructor).
+        :param w: one weight per pipe
+        :param rhs: one value per junction
+        :return: dH of every junction
+        '''
+        from scipy.sparse import coo_matrix
+        a=self.arrays
+        a['w'][:]=w
+        a['rhs'][:]=rhs
+        nG=len(self.interface)
+        condense=nG>0 and (self.method=='schur' or self._precondition is None)
+        self._broadcast(('factor', condense))
+        if nG:
+            MGG=coo_matrix((w[self.pGG]*self.sGG, (self.rGG, self.cGG)), shape=(nG, nG)).tocsr()
+            g=rhs[self.interface]-self._gather('g')
+            if condense:
+                self._precondition=self._factorSchur(MGG)
+                self.condensations+=1
+                a['dH'][self.interface]=self._precondition(g)
+            else:
+                a['dH'][self.interface]=self._cgSolve(MGG, g)
+        self._broadcast('interior')
+        return a['dH'].copy()
+
+    def _factorSchur(self, MGG):
+        '''
+        Assembles S from M_GG and the condensed blocks of the workers and factorizes it (Cholesky, S is
+        symmetric positive definite; sparse LU for interfaces too big for a dense matrix).
+        :return: a function solving S x = b
+        '''
+        nG=MGG.shape[0]
+        if nG<=4000:
+            from scipy.linalg import cho_factor, cho_solve
+            S=MGG.toarray()-np.bincount(self.flatS, self.arrays['schur'], nG*nG).reshape(nG, nG)
+            factor=cho_factor(S)
+            return lambda b: cho_solve(factor, b)
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.linalg import splu
+        S=MGG-coo_matrix((self.arrays['schur'], (self.flatS//nG, self.flatS%nG)), shape=(nG, nG)).tocsr()
+        return splu(S.tocsc()).solve
+
+    def _cgSolve(self, MGG, g):
+        '''
+        Conjugate gradients on S x = g preconditioned with the last factorized S, with the products by S
+        computed by the workers.  Starts from the solution of the old S, which is often close already.
+        '''
+        def applyS(x):
+            self.arrays['xG'][:]=x
+            self._broadcast('apply')
+            return MGG@x-self._gather('y')
+        M=self._precondition
+        x=M(g)
+        r=g-applyS(x)
+        zr=M(r)
+        p=zr.copy()
+        rz=r@zr
+        stop=self.cgTol*np.linalg.norm(g)
+        k=0
+        while k<self.cgMaxIter and np.linalg.norm(r)>stop:
+            Sp=applyS(p)
+            alpha=rz/(p@Sp)
+            x+=alpha*p
+            r-=alpha*Sp
+            zr=M(r)
+            rzNew=r@zr
+            p=zr+rzNew/rz*p
+            rz=rzNew
+            k+=1
+        self.cgIterations+=k
+        if k>self.cgRefresh:
+            self._precondition=None  # S has drifted, form it again on the next solve
+        return x
+
+    def solve(self, ext, Hfixed=None, Q0=None, H0=None, tol=1e-10, maxIter=50, state=None, T=None):
+        '''
+        CompiledNetwork.solve with the junction systems solved by the subdomain workers.
+        :return: (Q, H, iterations, converged)
+        '''
+        return self.compiled.solve(ext, Hfixed, Q0, H0, tol, maxIter, state, linearSolve=self.junctionSolve, T=T)
+
+    def close(self):
+        '''
+        Stops the worker processes and releases the shared memory.
+        '''
+        if self.shm is None:
+            return
+        for conn in self.conns:
+            try:
+                conn.send('stop')
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self.procs:
+            proc.join(5)
+        self.arrays=None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm=None
+    #endregion
+#endregion
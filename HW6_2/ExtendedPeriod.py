@@ -0,0 +1,201 @@
+#region imports
+import json
+import os
+import sys
+import time
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledNetwork import CompiledNetwork, NetworkState
+#endregion
+
+#region class definitions
+class DemandPattern():
+    #region constructor
+    def __init__(self, Multipliers=(1.0,), Step=3600):
+        '''
+        A repeating pattern of demand multipliers, e.g. 24 hourly values for a daily cycle.
+        :param Multipliers: list of multipliers of the base demand
+        :param Step: seconds each multiplier lasts
+        '''
+        #region attributes
+        self.multipliers=np.asarray(Multipliers, dtype=float)
+        self.step=Step
+        #endregion
+    #endregion
+
+    #region methods
+    def multiplier(self, t):
+        '''
+        :param t: time in s from the start of the simulation
+        :return: the demand multiplier at time t
+        '''
+        return self.multipliers[int(t//self.step)%len(self.multipliers)]
+    #endregion
+
+
+class SimulationWriter():
+    #region constructor
+    def __init__(self, directory, compiled, nSteps):
+        '''
+        Streams time steps to .npy files in a directory (times, flows, heads and tank levels, one row per step)
+        through memory maps, so a long simulation never holds its results in memory.  meta.json names the
+        columns.
+        :param directory: output folder (created if needed)
+        :param compiled: the CompiledNetwork being simulated
+        :param nSteps: number of steps that will be written
+        '''
+        from numpy.lib.format import open_memmap
+        #region attributes
+        os.makedirs(directory, exist_ok=True)
+        self.directory=directory
+        self.times=open_memmap(os.path.join(directory, 'times.npy'), 'w+', np.float64, (nSteps,))
+        self.flows=open_memmap(os.path.join(directory, 'flows.npy'), 'w+', np.float64,
+                               (nSteps, len(compiled.pipeNames)))
+        self.heads=open_memmap(os.path.join(directory, 'heads.npy'), 'w+', np.float64,
+                               (nSteps, len(compiled.nodeNames)))
+        self.levels=open_memmap(os.path.join(directory, 'levels.npy'), 'w+', np.float64,
+                                (nSteps, len(compiled.tankNames)))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'pipes': compiled.pipeNames, 'nodes': compiled.nodeNames, 'tanks': compiled.tankNames}, f)
+        #endregion
+    #endregion
+
+    #region methods
+    def write(self, k, t, Q, H, levels):
+        self.times[k]=t
+        self.flows[k]=Q
+        self.heads[k]=H
+        self.levels[k]=levels
+
+    def close(self):
+        for a in (self.times, self.flows, self.heads, self.levels):
+            a.flush()
+    #endregion
+
+
+class ExtendedPeriodSimulation():
+    #region constructor
+    def __init__(self, network, duration=24*3600, timeStep=3600, patterns=None):
+        '''
+        Steps a pipe network through time.  At each step the node demands follow their patterns, the tanks fix
+        the heads of their nodes, the network is solved starting from the flows of the previous step, and then the
+        tank levels change with their net inflow over the step.
+        :param network: a PipeNetwork object with its nodes built; Node.extFlow holds the base demands
+        :param duration: simulated time in s
+        :param timeStep: hydraulic time step in s
+        :param patterns: dict {node name: DemandPattern}; nodes without a pattern keep their base demand
+        '''
+        #region attributes
+        self.network=network
+        self.duration=duration
+        self.timeStep=timeStep
+        self.patterns=dict(patterns or {})
+        self.compiled=CompiledNetwork(network)
+        self.base=np.array([n.extFlow for n in network.nodes], dtype=float)
+        names=self.compiled.nodeNames
+        # nodes grouped by pattern so a step's demands are one multiply per pattern
+        self._groups=[(pat, np.array([names.index(n) for n, p in self.patterns.items() if p is pat]))
+                      for pat in {id(p): p for p in self.patterns.values()}.values()]
+        self.tanks=list(network.tanks)
+        self.tankNodes=np.array([names.index(t.node) for t in self.tanks], dtype=int)
+        self.nSteps=int(round(duration/timeStep))+1
+        self.iterations=0
+        self.unconverged=0
+        self.overflows=0
+        #endregion
+    #endregion
+
+    #region methods
+    def demands(self, t):
+        '''
+        :param t: time in s
+        :return: external flow of every node at time t
+        '''
+        ext=self.base.copy()
+        for pat, idx in self._groups:
+            ext[idx]*=pat.multiplier(t)
+        return ext
+
+    def steps(self):
+        '''
+        A generator of the time steps.  When it finishes, the final flows, demands and tank levels are written
+        back to the network objects.
+        :return: yields (t, pipe flows, node heads, tank levels) for every step
+        '''
+        C=self.compiled
+        levels=np.array([t.level for t in self.tanks], dtype=float)
+        elev=np.array([t.elevation for t in self.tanks], dtype=float)
+        area=np.array([np.inf if t.area is None else t.area for t in self.tanks], dtype=float)
+        lo=np.array([t.minLevel for t in self.tanks], dtype=float)
+        hi=np.array([t.maxLevel for t in self.tanks], dtype=float)
+        state=NetworkState(C)  # each step starts from the flows, heads and friction factors of the last one
+        ext=None
+        for k in range(self.nSteps):
+            t=k*self.timeStep
+            ext=self.demands(t)
+            Hfixed=elev+levels if len(self.tanks) else None
+            Q, H, it, ok=state.solve(ext, Hfixed)
+            self.iterations+=it
+            self.unconverged+=not ok
+            yield t, Q, H, levels.copy()
+            # tank levels change with the net inflow over the step (reservoirs have an infinite area)
+            inflow=C.nodeInflow(Q, ext)[self.tankNodes]
+            levels=levels+inflow*self.timeStep/area
+            self.overflows+=int(np.sum((levels<lo)|(levels>hi)))
+            levels=np.clip(levels, lo, hi)
+        state.writeBack(self.network)
+        for n, q in zip(self.network.nodes, ext):
+            n.extFlow=float(q)
+        for tank, level in zip(self.tanks, levels):
+            tank.level=float(level)
+
+    def run(self, directory):
+        '''
+        Runs the whole simulation, streaming every step to disk (see SimulationWriter).
+        :param directory: output folder
+        :return: dict with the number of steps, Newton iterations, unconverged steps, tank overflows and wall time
+        '''
+        t0=time.perf_counter()
+        writer=SimulationWriter(directory, self.compiled, self.nSteps)
+        for k, (t, Q, H, levels) in enumerate(self.steps()):
+            writer.write(k, t, Q, H, levels)
+        writer.close()
+        return {'steps': self.nSteps, 'iterations': self.iterations, 'unconverged': self.unconverged,
+                'overflows': self.overflows, 'seconds': time.perf_counter()-t0}
+    #endregion
+#endregion
+
+#region function definitions
+def main():
+    '''
+    A 24 hour run of the HW6_2 network fed by a reservoir at node a, with a storage tank at node h and a daily
+    demand pattern at nodes d and f.
+    :return: nothing, just prints to screen
+    '''
+    import tempfile
+    from HW6_2 import buildExampleNetwork
+    from Tank import Tank
+    PN=buildExampleNetwork(units='m3/s', loops=False, demands=('d', 'f'))
+    PN.tanks.append(Tank('a', Area=None, Level=10, Elevation=40))  # reservoir
+    PN.tanks.append(Tank('h', Area=100, Level=3, Elevation=46, MaxLevel=6))
+    daily=DemandPattern([0.5, 0.4, 0.4, 0.4, 0.5, 0.7, 1.1, 1.5, 1.4, 1.2, 1.1, 1.0,
+                         1.0, 1.0, 1.0, 1.1, 1.2, 1.4, 1.6, 1.5, 1.2, 0.9, 0.7, 0.6])
+    sim=ExtendedPeriodSimulation(PN, duration=24*3600, timeStep=900, patterns={'d': daily, 'f': daily})
+    print('{:>6s}{:>12s}{:>12s}{:>12s}{:>10s}'.format('hour', 'Q a-b', 'Q e-h', 'Q g-h', 'level h'))
+    pipes=[sim.compiled.pipeNames.index(n) for n in ('a-b', 'e-h', 'g-h')]
+    for t, Q, H, levels in sim.steps():
+        if t%(3*3600)==0:
+            print('{:>6.0f}{:>12.4f}{:>12.4f}{:>12.4f}{:>10.3f}'.format(t/3600, *Q[pipes], levels[1]))
+    print('{} steps, {:0.1f} Newton iterations per step'.format(sim.nSteps, sim.iterations/sim.nSteps))
+    with tempfile.TemporaryDirectory() as d:
+        sim=ExtendedPeriodSimulation(PN, duration=7*24*3600, timeStep=300, patterns={'d': daily, 'f': daily})
+        r=sim.run(d)
+        print('7 days at 5 min: {steps} steps in {seconds:0.2f} s, {iterations} iterations, '
+              '{unconverged} unconverged'.format(**r))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -1,16 +1,123 @@
+#region imports
+import numpy as np
+#endregion
+
 #region class definitions
+class FluidModel():
+    #region constructor
+    def __init__(self, T, mu, rho, name=''):
+        '''
+        Temperature dependent properties of a liquid from a table.  The table is prepared once: viscosity is
+        interpolated in log(mu), since it falls roughly exponentially with temperature, and density linearly.
+        Evaluating the model is then two np.interp calls for any array of temperatures.
+        :param T: table temperatures in C
+        :param mu: dynamic viscosity at T in Pa*s
+        :param rho: density at T in kg/m^3
+        :param name: a convenient identifier
+        '''
+        #region attributes
+        order=np.argsort(T)
+        self.T=np.asarray(T, dtype=float)[order]
+        self.logMu=np.log(np.asarray(mu, dtype=float)[order])
+        self.rho=np.asarray(rho, dtype=float)[order]
+        self.name=name
+        for a in (self.T, self.logMu, self.rho):
+            a.flags.writeable=False
+        #endregion
+    #endregion
+
+    #region methods
+    @classmethod
+    def fromCorrelation(cls, mu, rho, Tmin, Tmax, n=64, name=''):
+        '''
+        Tabulates correlations mu(T) and rho(T) once, so they are evaluated like a table afterwards.
+        :param mu: function of an array of temperatures in C giving the viscosity in Pa*s
+        :param rho: function of an array of temperatures in C giving the density in kg/m^3
+        :param Tmin: lowest temperature of the table in C
+        :param Tmax: highest temperature of the table in C
+        :param n: number of table points
+        :return: a FluidModel object
+        '''
+        T=np.linspace(Tmin, Tmax, n)
+        return cls(T, mu(T), rho(T), name)
+
+    def properties(self, T):
+        '''
+        Viscosity and density at any number of temperatures.
+        :param T: temperature in C (scalar or array)
+        :return: (mu in Pa*s, rho in kg/m^3) with the shape of T
+        '''
+        T=np.asarray(T, dtype=float)
+        if T.size and not (self.T[0]<=T.min() and T.max()<=self.T[-1]):
+            raise ValueError('temperatures {:0.1f} to {:0.1f} C are outside of the {} table ({:0.1f} to {:0.1f} C)'
+                             .format(T.min(), T.max(), self.name or 'fluid', self.T[0], self.T[-1]))
+        return np.exp(np.interp(T, self.T, self.logMu)), np.interp(T, self.T, self.rho)
+    #endregion
+
+
 class Fluid():
     #region constructor
-    def __init__(self, mu=0.00089, rho=1000):
+    def __init__(self, mu=0.00089, rho=1000, model=None, T=None):
         '''
         default properties are for water
         :param mu: dynamic viscosity in Pa*s -> (kg*m/s^2)*(s/m^2) -> kg/(m*s)
         :param rho: density in kg/m^3
+        :param model: optional FluidModel; mu and rho are then taken from it at temperature T
+        :param T: temperature in C for the model (default 20 C)
         '''
         #region attributes
-        self.mu= 0.00025 # m $JES MISSING CODE$  # simply make a copy of the value in the argument as a class property
-        self.rho= 1000 # N*s/m^2 $JES MISSING CODE$  # simply make a copy of the value in the argument as a class property
-        self.nu= 0.00089 #JES MISSING CODE$ # calculate the kinematic viscosity in units of m^2/s
+        self.model=model
+        self.T=T
+        if model is not None:
+            mu, rho=(float(v) for v in model.properties(20.0 if T is None else T))
+        self.mu=mu  # simply make a copy of the value in the argument as a class property
+        self.rho=rho  # simply make a copy of the value in the argument as a class property
+        self.nu=mu/rho  # calculate the kinematic viscosity in units of m^2/s
         #endregion
     #endregion
-#endregion
\ No newline at end of file
+
+    #region methods
+    def properties(self, T=None):
+        '''
+        Viscosity and density at an array of temperatures, e.g. one per pipe.  Without a model (or without
+        temperatures) the constant properties of this fluid are used everywhere.
+        :param T: temperatures in C, or None
+        :return: (mu, rho) arrays with the shape of T (floats for T=None)
+        '''
+        if T is None:
+            return self.mu, self.rho
+        if self.model is None:
+            shape=np.shape(T)
+            return np.full(shape, float(self.mu)), np.full(shape, float(self.rho))
+        return self.model.properties(T)
+
+    def atTemperature(self, T):
+        '''
+        The same fluid at another temperature.
+        :param T: temperature in C
+        :return: a new Fluid object
+        '''
+        if self.model is None:
+            return Fluid(self.mu, self.rho)
+        return Fluid(model=self.model, T=T)
+    #endregion
+#endregion
+
+#region globals
+# properties of water at atmospheric pressure
+WATER=FluidModel(T=[0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100],
+                 mu=[1.792e-3, 1.306e-3, 1.002e-3, 7.975e-4, 6.529e-4, 5.468e-4, 4.665e-4, 4.042e-4, 3.544e-4,
+                     3.147e-4, 2.818e-4],
+                 rho=[999.84, 999.70, 998.21, 995.65, 992.22, 988.04, 983.20, 977.76, 971.79, 965.31, 958.36],
+                 name='water')
+# ethylene glycol and water mixes (percent glycol by volume), approximate values from published tables
+GLYCOL30=FluidModel(T=[-10, 0, 20, 40, 60, 80, 100],
+                    mu=[5.2e-3, 3.4e-3, 2.0e-3, 1.3e-3, 0.90e-3, 0.68e-3, 0.53e-3],
+                    rho=[1053, 1049, 1041, 1032, 1021, 1008, 994],
+                    name='30% ethylene glycol')
+GLYCOL50=FluidModel(T=[-30, -20, -10, 0, 20, 40, 60, 80, 100],
+                    mu=[38.0e-3, 19.0e-3, 11.0e-3, 7.1e-3, 3.7e-3, 2.2e-3, 1.4e-3, 1.0e-3, 0.7e-3],
+                    rho=[1094, 1091, 1087, 1082, 1073, 1063, 1050, 1037, 1022],
+                    name='50% ethylene glycol')
+MODELS={'water': WATER, 'glycol30': GLYCOL30, 'glycol50': GLYCOL50}  # by name, e.g. for requests to the service
+#endregion
@@ -1,4 +1,8 @@
 # region imports
+import os
+import sys
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
 from Fluid import Fluid
 from Pipe import Pipe
 from Loop import Loop
@@ -6,6 +10,39 @@ from PipeNetwork import PipeNetwork
 # endregion
 
 # region function definitions
+# the pipe network of the homework: pipes as (start, end, length in m, diameter in mm) with one roughness, the
+# external flows in L/s and the loops
+EXAMPLE_PIPES = (('a','b',250,300), ('a','c',100,200), ('b','e',100,200), ('c','d',125,200), ('c','f',100,150),
+                 ('d','e',125,200), ('d','g',100,150), ('e','h',100,150), ('f','g',125,250), ('g','h',125,250))
+EXAMPLE_ROUGHNESS = 0.00025  # in meters
+EXAMPLE_FLOWS = {'a': 60, 'd': -30, 'f': -15, 'h': -15}
+EXAMPLE_LOOPS = (('A', ('a-b', 'b-e', 'd-e', 'c-d', 'a-c')), ('B', ('c-d', 'd-g', 'f-g', 'c-f')),
+                 ('C', ('d-e', 'e-h', 'g-h', 'd-g')))
+
+def buildExampleNetwork(units='L/s', fluid=None, loops=True, demands=None, D=None):
+    '''
+    Builds the pipe network of the homework, which main() solves and the other HW6_2 examples start from.
+    :param units: units of the external flows, 'L/s' as in main() or 'm3/s' as in CompiledNetwork and the
+                  studies built on it
+    :param fluid: a Fluid object (default: water)
+    :param loops: add the loops A, B and C (fsolve in findFlowRates needs them, CompiledNetwork does not)
+    :param demands: names of the nodes whose external flow is set (default: all of EXAMPLE_FLOWS)
+    :param D: pipe diameters in mm in the order of EXAMPLE_PIPES (default: the homework's)
+    :return: a PipeNetwork object with its pipes, nodes and loops
+    '''
+    scale={'L/s': 1.0, 'm3/s': 0.001}[units]
+    fluid=fluid if fluid is not None else Fluid()
+    PN=PipeNetwork(fluid=fluid)
+    for (s, e, L, d), diameter in zip(EXAMPLE_PIPES, D if D is not None else [p[3] for p in EXAMPLE_PIPES]):
+        PN.pipes.append(Pipe(s, e, L, diameter, EXAMPLE_ROUGHNESS, fluid))
+    PN.buildNodes()
+    for name in (demands if demands is not None else EXAMPLE_FLOWS):
+        PN.getNode(name).extFlow=EXAMPLE_FLOWS[name]*scale
+    if loops:
+        for name, pipes in EXAMPLE_LOOPS:
+            PN.loops.append(Loop(name, [PN.getPipe(p) for p in pipes]))
+    return PN
+
 def main():
     '''
     This program analyzes flows in a given pipe network based on the following:
@@ -21,36 +58,8 @@ def main():
     Step 4: check results against expected properties of zero head loss around a loop and mass conservation at nodes.
     :return:
     '''
-    #instantiate a Fluid object to define the working fluid as water
-    water= Fluid()#$JES MISSING CODE$  #
-    roughness = 0.00025  # in meters
-
-    #instantiate a new PipeNetwork object
-    PN= PipeNetwork()#$JES MISSING CODE$  #
-    #add Pipe objects to the pipe network (see constructor for Pipe class)
-    PN.pipes.append(Pipe('a','b',250, 300, roughness, water))
-    PN.pipes.append(Pipe('a','c',100, 200, roughness, water))
-    PN.pipes.append(Pipe('b','e',100, 200, roughness, water))
-    PN.pipes.append(Pipe('c','d',125, 200, roughness, water))
-    PN.pipes.append(Pipe('c','f',100, 150, roughness, water))
-    PN.pipes.append(Pipe('d','e',125, 200, roughness, water))
-    PN.pipes.append(Pipe('d','g',100, 150, roughness, water))
-    PN.pipes.append(Pipe('e','h',100, 150, roughness, water))
-    PN.pipes.append(Pipe('f','g',125, 250, roughness, water))
-    PN.pipes.append(Pipe('g','h',125, 250, roughness, water))
-    #add Node objects to the pipe network by calling buildNodes method of PN object
-    PN.buildNodes()
-
-    #update the external flow of certain nodes
-    PN.getNode('a').extFlow=60
-    PN.getNode('d').extFlow=-30
-    PN.getNode('f').extFlow=-15
-    PN.getNode('h').extFlow=-15
-
-    #add Loop objects to the pipe network
-    PN.loops.append(Loop('A',[PN.getPipe('a-b'), PN.getPipe('b-e'),PN.getPipe('d-e'), PN.getPipe('c-d'), PN.getPipe('a-c')]))
-    PN.loops.append(Loop('B',[PN.getPipe('c-d'), PN.getPipe('d-g'),PN.getPipe('f-g'), PN.getPipe('c-f')]))
-    PN.loops.append(Loop('C',[PN.getPipe('d-e'), PN.getPipe('e-h'),PN.getPipe('g-h'), PN.getPipe('d-g')]))
+    #build the pipe network of the homework: water in pipes of 0.00025 m roughness, flows in L/s
+    PN=buildExampleNetwork()
 
     #call the findFlowRates method of the PN (a PipeNetwork object)
     PN.findFlowRates()
@@ -29,5 +29,17 @@ class Loop():
             deltaP+=phl
             startNode=p.endNode if startNode!=p.endNode else p.startNode #move to the next node
         return deltaP
+
+    def traversal(self):
+        '''
+        The direction in which the loop traverses each of its pipes, in the same walk as getLoopHeadLoss.
+        :return: a list with +1 (along the positive direction of the pipe) or -1 for every pipe
+        '''
+        signs=[]
+        startNode=self.pipes[0].startNode
+        for p in self.pipes:
+            signs.append(1 if startNode==p.startNode else -1)
+            startNode=p.endNode if startNode!=p.endNode else p.startNode
+        return signs
     #endregion
 #endregion
\ No newline at end of file
@@ -1,14 +1,36 @@
 #region imports
 import math
-import numpy as np
 import random as rnd
-from scipy.optimize import fsolve
 from Fluid import Fluid
 #endregion
+
+#region function definitions
+def colebrook(Re, rr, tol=1e-12, maxIter=50):
+    '''
+    Solves the Colebrook equation for the Darcy friction factor with Newton's method on u=1/sqrt(f).
+    This replaces a call to scipy's fsolve so that the pipe model does not need scipy at all.
+    :param Re: the Reynolds number (turbulent, so Re>0)
+    :param rr: the relative roughness of the pipe
+    :return: the Darcy friction factor
+    '''
+    a=rr/3.7
+    b=2.51/Re
+    u=1/(0.01**0.5)  # same starting point as the old fsolve call, f=0.01
+    for _ in range(maxIter):
+        arg=a+b*u
+        F=u+2.0*math.log10(arg)  # residual of the Colebrook equation in terms of u
+        dF=1.0+2.0*b/(arg*math.log(10))
+        du=F/dF
+        u-=du
+        if abs(du)<tol*abs(u):
+            break
+    return 1/u**2
+#endregion
+
 # region class definitions
 class Pipe():
     #region constructor
-    def __init__(self, Start='A', End='B',L=100, D=200, r=0.00025, fluid=Fluid()):
+    def __init__(self, Start='A', End='B',L=100, D=200, r=0.00025, fluid=None, T=None):
         '''
         Defines a generic pipe with orientation from lowest letter to highest, alphabetically.
         :param Start: the start node (string)
@@ -16,86 +38,254 @@ class Pipe():
         :param L: the pipe length in m (float)
         :param D: the pipe diameter in mm (float)
         :param r: the pipe roughness in m  (float)
-        :param fluid:  a Fluid object (typically water)
+        :param fluid:  a Fluid object (typically water); default: a new Fluid() for this pipe
+        :param T: optional temperature of the fluid in the pipe in C (see Fluid.properties)
         '''
         #region attributes
+        # cache of derived hydraulics (velocity, Re, friction factor, head loss, dh/dQ).  It is cleared whenever
+        # Q, the geometry or the fluid changes, so repeated evaluations at the same state reuse the work.
+        self._cache={}
+        self._fluidKey=None
+        self._props=None  # fluid properties at the pipe temperature
         # from arguments given in constructor
         self.startNode=min(Start,End) #makes sure to use the lowest letter for startNode
         self.endNode=max(Start,End) #makes sure to use the highest letter for the endNode
         self.length=L
         self.r=r
-        self.fluid=fluid #the fluid in the pipe
+        self.fluid=fluid if fluid is not None else Fluid() #the fluid in the pipe
+        self.T=T
 
-        # other calculated properties
+        # other calculated properties (relative roughness and area are derived from d and r, see properties)
         self.d=D/1000.0 #diameter in m
-        self.relrough = self.r/self.d #calculate relative roughness for easy use later
-        self.A=math.pi/4.0*self.d**2 #calculate pipe cross sectional area for easy use later
         self.Q=10 #working in units of L/s, just an initial guess
         self.vel=self.V()  #calculate the initial velocity of the fluid
         self.reynolds=self.Re() #calculate the initial reynolds number
         #endregion
     #endregion
 
+    #region properties
+    # setting any of these marks the cached hydraulics as dirty
+    @property
+    def Q(self):
+        return self._Q
+
+    @Q.setter
+    def Q(self, value):
+        self._Q=value
+        self._cache.clear()
+
+    @property
+    def length(self):
+        return self._length
+
+    @length.setter
+    def length(self, value):
+        self._length=value
+        self._cache.clear()
+
+    @property
+    def d(self):
+        return self._d
+
+    @d.setter
+    def d(self, value):
+        self._d=value
+        self._cache.clear()
+
+    @property
+    def r(self):
+        return self._r
+
+    @r.setter
+    def r(self, value):
+        self._r=value
+        self._cache.clear()
+
+    @property
+    def fluid(self):
+        return self._fluid
+
+    @fluid.setter
+    def fluid(self, value):
+        self._fluid=value
+        self._props=None
+        self._cache.clear()
+
+    @property
+    def T(self):
+        return self._T
+
+    @T.setter
+    def T(self, value):
+        self.setTemperature(value)
+
+    @property
+    def mu(self):
+        return self.properties()[0] #viscosity at the pipe temperature
+
+    @property
+    def rho(self):
+        return self.properties()[1] #density at the pipe temperature
+
+    @property
+    def relrough(self):
+        return self.r/self.d #relative roughness
+
+    @property
+    def A(self):
+        return math.pi/4.0*self.d**2 #pipe cross sectional area
+    #endregion
+
     #region methods
+    def _cached(self):
+        '''
+        Returns the cache of derived values, clearing it first if the fluid properties were changed in place.
+        :return: the cache dictionary
+        '''
+        key=(self._fluid.rho, self._fluid.mu)
+        if key!=self._fluidKey:
+            self._fluidKey=key
+            self._cache.clear()
+        return self._cache
+
+    def setTemperature(self, T, mu=None, rho=None):
+        '''
+        Sets the temperature of the fluid in the pipe.
+        :param T: temperature in C, or None to use the properties of the fluid object
+        :param mu: optional viscosity at T, when it was already evaluated for many pipes at once
+        :param rho: optional density at T
+        '''
+        self._T=T
+        self._props=None if T is None or mu is None else (float(mu), float(rho))
+        self._cache.clear()
+
+    def properties(self):
+        '''
+        Viscosity and density of the fluid at the pipe temperature.  They are evaluated once per temperature;
+        without a temperature they are those of the fluid object, so changing it in place is seen at once.
+        :return: (mu, rho)
+        '''
+        if self._T is None:
+            return self._fluid.mu, self._fluid.rho
+        if self._props is None:
+            self._props=tuple(float(v) for v in self._fluid.properties(self._T))
+        return self._props
+
     def V(self):
         '''
         Calculate average velocity in the pipe for volumetric flow self.Q
         :return:the average velocity in m/s
         '''
-        self.vel= self.Q / self.A #$JES MISSING CODE$  # the average velocity is Q/A (be mindful of units)
+        c=self._cached()
+        if 'vel' not in c:
+            c['vel']= self.Q / self.A #$JES MISSING CODE$  # the average velocity is Q/A (be mindful of units)
+        self.vel=c['vel']
         return self.vel
 
     def Re(self):
         '''
-        Calculate the reynolds number under current conditions.
+        Calculate the reynolds number under current conditions.  The magnitude of the velocity is used, so
+        reversed flow has the same Reynolds number (and friction factor) as forward flow.
         :return:
         '''
-        self.reynolds= (self.fluid.rho * self.V() * self.d) / self.fluid.mu #$JES MISSING CODE$ # Re=rho*V*d/mu, be sure to use V() so velocity is updated.
+        c=self._cached()
+        if 'Re' not in c:
+            mu, rho=self.properties()
+            c['Re']= (rho * abs(self.V()) * self.d) / mu #$JES MISSING CODE$ # Re=rho*V*d/mu, be sure to use V() so velocity is updated.
+        self.reynolds=c['Re']
         return self.reynolds
 
-    def FrictionFactor(self):
+    def FrictionFactor(self, colebrookF=None):
         """
         This function calculates the friction factor for a pipe based on the
-        notion of laminar, turbulent and transitional flow.
+        notion of laminar, turbulent and transitional flow.  The result is cached, so for transitional
+        flow the random draw is made once per flow rate rather than once per call.
+        :param colebrookF: optional solution of the Colebrook equation at the present Reynolds number, when it
+                           was solved for many pipes at once (see PipeNetwork.frictionFactors)
         :return: the (Darcy) friction factor
         """
+        c=self._cached()
+        if 'ff' in c:
+            return c['ff']
         # update the Reynolds number and make a local variable Re
         Re=self.Re()
         rr=self.relrough
         # to be used for turbulent flow
         def CB():
-            # note:  in numpy log is for natural log.  log10 is log base 10.
-            cb = lambda f: 1 / (f ** 0.5) + 2.0 * np.log10(rr / 3.7 + 2.51 / (Re * f ** 0.5))
-            result = fsolve(cb, (0.01))
-            val = cb(result[0])
-            return result[0]
+            return colebrook(Re, rr) if colebrookF is None else colebrookF
         # to be used for laminar flow
         def lam():
             return 64 / Re
 
         if Re >= 4000:  # true for turbulent flow
-            return CB()
-        if Re <= 2000:  # true for laminar flow
-            return lam()
-
-        # transition flow is ambiguous, so use normal variate weighted by Re
-        CBff = CB()
-        Lamff = lam()
-        # I assume laminar is more accurate when just above 2000 and CB more accurate when just below Re 4000.
-        # I will weight the mean appropriately using a linear interpolation.
-        mean = Lamff+((Re-2000)/(4000-2000))*(CBff - Lamff)
-        sig = 0.2 * mean
-        # Now, use normalvariate to put some randomness in the choice
-        return rnd.normalvariate(mean, sig)
+            c['ff']=CB()
+        elif Re <= 2000:  # true for laminar flow
+            c['ff']=lam()
+        else:
+            # transition flow is ambiguous, so use normal variate weighted by Re
+            CBff = CB()
+            Lamff = lam()
+            # I assume laminar is more accurate when just above 2000 and CB more accurate when just below Re 4000.
+            # I will weight the mean appropriately using a linear interpolation.
+            mean = Lamff+((Re-2000)/(4000-2000))*(CBff - Lamff)
+            sig = 0.2 * mean
+            # Now, use normalvariate to put some randomness in the choice
+            c['ff']=rnd.normalvariate(mean, sig)
+        return c['ff']
 
     def frictionHeadLoss(self):  # calculate headloss through a section of pipe in m of fluid
         '''
         Use the Darcy-Weisbach equation to find the head loss through a section of pipe.
         '''
+        c=self._cached()
+        if 'hl' not in c:
+            if self.Q == 0:
+                c['hl']=0.0  # no flow, no loss (and no Reynolds number to divide by)
+            else:
+                g = 9.81  # m/s^2
+                ff = self.FrictionFactor()
+                c['hl'] =(ff * self.length * self.V() ** 2)/(self.d * 2 * g) # calculate the head loss in m of water
+        return c['hl']
+
+    def dHdQ(self):
+        '''
+        Calculates the derivative of the head loss with respect to the flow rate, d(hl)/dQ.  Since the head loss
+        is odd in Q this is also the slope of the signed head loss for either flow direction.  For transitional
+        flow the slope of the mean friction factor is used.
+        :return: dh/dQ in m of fluid per unit of Q
+        '''
+        c=self._cached()
+        if 'dhdq' in c:
+            return c['dhdq']
         g = 9.81  # m/s^2
-        ff = self.FrictionFactor()
-        hl =(ff * self.length * self.V() ** 2)/(self.d * 2 * g) # calculate the head loss in m of water
-        return hl
+        Re=self.Re()
+        if Re == 0:
+            # laminar limit, hl = 64*mu*L*V/(2*g*rho*d^2) is linear in Q
+            mu, rho=self.properties()
+            c['dhdq']=64*mu*self.length/(2*g*rho*self.d**2*self.A)
+            return c['dhdq']
+        rr=self.relrough
+        V=abs(self.V())
+        def dCB():
+            # implicit differentiation of the Colebrook equation written in u=1/sqrt(f)
+            f=colebrook(Re, rr)
+            u=1/f**0.5
+            arg=rr/3.7+2.51*u/Re
+            dFdu=1.0+2.0*(2.51/Re)/(arg*math.log(10))
+            dFdRe=-2.0*2.51*u/(Re**2*arg*math.log(10))
+            return f, -2.0/u**3*(-dFdRe/dFdu)
+        if Re >= 4000:
+            f, dfdRe=dCB()
+        elif Re <= 2000:
+            f, dfdRe=64/Re, -64/Re**2
+        else:
+            fCB, dCBdRe=dCB()
+            w=(Re-2000)/(4000-2000)
+            f=64/Re+w*(fCB-64/Re)
+            dfdRe=-64/Re**2+w*(dCBdRe+64/Re**2)+(fCB-64/Re)/(4000-2000)
+        # hl = f*L*V^2/(2*g*d) with V=|Q|/A and Re proportional to |Q|
+        c['dhdq']=self.length*V/(2*g*self.d*self.A)*(2*f+Re*dfdRe)
+        return c['dhdq']
 
     def getFlowHeadLoss(self, s):
         '''
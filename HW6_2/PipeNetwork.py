@@ -0,0 +1,321 @@
+#region imports
+import sys
+import numpy as np
+from Fluid import Fluid
+from Node import Node
+from kernels import colebrookU, loopHeadLoss
+#endregion
+
+#region class definitions
+class PipeNetwork():
+    #region constructor
+    def __init__(self, Pipes=None, Loops=None, Nodes=None, fluid=None, Tanks=None):
+        '''
+        The pipe network is built from pipe, node, loop objects.
+        :param Pipes: a list of pipe objects
+        :param Loops: a list of loop objects
+        :param Nodes: a list of node objects
+        :param fluid: a fluid object
+        :param Tanks: a list of tank objects (only used by time-stepped simulations, see ExtendedPeriod)
+        '''
+        #region attributes
+        self.loops=Loops if Loops is not None else []
+        self.nodes=Nodes if Nodes is not None else []
+        self.Fluid=fluid if fluid is not None else Fluid()
+        self.pipes=Pipes if Pipes is not None else []
+        self.tanks=Tanks if Tanks is not None else []
+        #endregion
+    #endregion
+
+    #region methods
+    def findFlowRates(self, cache=None):
+        '''
+        A method to analyze the pipe network and find the flow rates in each pipe
+        given the constraints of: i) no net flow into a node and ii) no net pressure drops in the loops.
+        :param cache: optional NetworkCache object.  A network solved before is not solved again, and one that
+        only differs in pipe sizes, fluid or external flows starts from the flows of its closest solved neighbor.
+        :return: a list of flow rates in the pipes
+        '''
+        from scipy.optimize import fsolve  # deferred so importing the network does not pay for scipy
+        #see how many nodes and loops there are, this is how many equation results I will return
+        N=len(self.nodes)+len(self.loops)
+        # build an initial guess for flow rates in the pipes.
+        # note that I only have 10 pipes, but need 11 variables because of the degrees of freedom of fsolve.
+        Q0=np.full(N,10)
+        incidence=self.loopIncidence(withUsed=True)  # the loops do not change during the solve
+        def fn(q):
+            '''
+            This is used as a callback for fsolve.  The mass continuity equations at the nodes and the loop equations
+            are functions of the flow rates in the pipes.  Hence, fsolve will search for the roots of these equations
+            by varying the flow rates in each pipe.
+            :param q: an array of flowrates in the pipes + 1 extra value b/c of node b
+            :return: L an array containing flow rates at the nodes and  pressure losses for the loops
+            '''
+            #update the flow rate in each pipe object
+            for i in range(len(self.pipes)):
+                self.pipes[i].Q=q[i]
+            #calculate the net flow rate for each node object
+            L=self.getNodeFlowRates()
+            #calculate the net head loss for each loop object and add it to the L list
+            L+=self.getLoopHeadLosses(incidence)
+            return L
+        problem=self.problem(Q0) if cache is not None else None
+        if problem is not None:
+            hit, warm=cache.lookup(problem)
+            if hit is not None:
+                fn(hit['q'])  # set the pipe flows of the cached solution
+                return hit['q']
+            if warm is not None and len(warm['q'])==N:
+                Q0=warm['q']
+        #using fsolve to find the flow rates
+        FR=fsolve(fn,Q0)
+        if problem is not None:
+            cache.store(problem, q=FR, flows=np.array([p.Q for p in self.pipes]), residual=np.array(fn(FR)))
+        return FR
+
+    def solve(self, cache=None):
+        '''
+        Finds the flow rates like findFlowRates, without printing anything.
+        :param cache: optional NetworkCache object (see findFlowRates)
+        :return: dict of structured arrays, see results
+        '''
+        self.findFlowRates(cache)
+        return self.results()
+
+    def results(self):
+        '''
+        The current solution as structured arrays, ready for the bulk writers of result_io.
+        :return: dict with 'pipes' (pipeTable), 'nodes' (nodeTable) and 'loops' (loopTable)
+        '''
+        return {'pipes': self.pipeTable(), 'nodes': self.nodeTable(), 'loops': self.loopTable()}
+
+    def pipeTable(self):
+        '''
+        One record per pipe: name, start and end node, flow rate Q and friction head loss (m of fluid).
+        :return: structured numpy array
+        '''
+        from result_io import toTable
+        return toTable({'name': [p.Name() for p in self.pipes], 'start': [p.startNode for p in self.pipes],
+                        'end': [p.endNode for p in self.pipes], 'Q': np.array([p.Q for p in self.pipes], dtype=float),
+                        'headLoss': np.array([p.frictionHeadLoss() for p in self.pipes], dtype=float)})
+
+    def nodeTable(self):
+        '''
+        One record per node: name, external flow and net flow into the node (the continuity residual).
+        :return: structured numpy array
+        '''
+        from result_io import toTable
+        return toTable({'name': [n.name for n in self.nodes],
+                        'extFlow': np.array([n.extFlow for n in self.nodes], dtype=float),
+                        'netFlow': np.array(self.getNodeFlowRates(), dtype=float)})
+
+    def loopTable(self):
+        '''
+        One record per loop: name and net head loss around the loop (the energy residual).
+        :return: structured numpy array
+        '''
+        from result_io import toTable
+        return toTable({'name': [l.name for l in self.loops],
+                        'headLoss': np.array(self.getLoopHeadLosses(), dtype=float)})
+
+    def residualReport(self):
+        '''
+        Verifies the solution in one table: mass conservation at the nodes and zero head loss around the loops.
+        :return: structured array, see result_io.residualTable
+        '''
+        from result_io import residualTable
+        nodes, loops=self.nodeTable(), self.loopTable()
+        return residualTable([('continuity', nodes['name'], nodes['netFlow']),
+                              ('loop head loss', loops['name'], loops['headLoss'])])
+
+    def problem(self, Q0):
+        '''
+        Describes the network and the solver settings for NetworkCache.
+        :param Q0: the initial guess of findFlowRates
+        :return: dict with 'topology', 'values' and 'settings'
+        '''
+        return {'topology': {'pipes': [p.Name() for p in self.pipes],
+                             'nodes': [n.name for n in self.nodes],
+                             'loops': [[l.name, [p.Name() for p in l.pipes]] for l in self.loops]},
+                'values': {'pipes': [[float(p.length), float(p.d), float(p.r), float(p.mu), float(p.rho)]
+                                     for p in self.pipes],
+                           'extFlows': [float(n.extFlow) for n in self.nodes]},
+                'settings': {'solver': 'fsolve', 'Q0': [float(q) for q in Q0]}}
+
+    def setTemperatures(self, T):
+        '''
+        Sets a temperature field over the pipes.  The fluid properties are evaluated once here, with one
+        vectorized call per fluid, rather than pipe by pipe during the solve.
+        :param T: one temperature in C for every pipe, a single temperature for all of them, or None to go back
+                  to the properties of the fluid objects
+        :return: nothing
+        '''
+        if T is None:
+            for p in self.pipes:
+                p.setTemperature(None)
+            return
+        T=np.broadcast_to(np.asarray(T, dtype=float), (len(self.pipes),))
+        groups={}
+        for k, p in enumerate(self.pipes):
+            groups.setdefault(id(p.fluid), (p.fluid, []))[1].append(k)
+        for fluid, rows in groups.values():
+            mu, rho=fluid.properties(T[rows])
+            for k, m, r in zip(rows, mu, rho):
+                self.pipes[k].setTemperature(float(T[k]), m, r)
+
+    def getNodeFlowRates(self):
+        '''
+        Calculates the net flow rate into each node.
+        :return: a list of net flow rates in L/s
+        '''
+        qNet=[n.getNetFlowRate() for n in self.nodes]
+        return qNet
+
+    def getLoopHeadLosses(self, incidence=None):
+        '''
+        Calculates the net head loss around each loop, as Loop.getLoopHeadLoss does, with one kernels.loopHeadLoss
+        call for all of the loops.
+        :param incidence: optional loopIncidence(withUsed=True), for callers that evaluate the same loops many
+                          times (default: built here)
+        :return: a list of loop head losses in m of fluid
+        '''
+        ptr, pipes, signs, used=incidence if incidence is not None else self.loopIncidence(withUsed=True)
+        self.frictionFactors(used)
+        h=np.zeros(len(self.pipes))
+        for k in used:
+            h[k]=self.pipes[k].getFlowHeadLoss(self.pipes[k].startNode)
+        return loopHeadLoss(h, ptr, pipes, signs).tolist()
+
+    def frictionFactors(self, index=None, minBatch=40):
+        '''
+        Solves the Colebrook equation of the pipes that are not laminar with one kernels.colebrookU call and
+        hands the results to Pipe.FrictionFactor, instead of one scalar Newton loop per pipe.  With fewer than
+        minBatch such pipes nothing is done, since the scalar loops are faster there (about 3 us a pipe against
+        about 120 us for one array call).
+        :param index: optional indices of the pipes (default: all)
+        :param minBatch: smallest number of pipes solved as one batch
+        :return: nothing, the friction factors are cached by the pipes
+        '''
+        pipes=self.pipes if index is None else [self.pipes[k] for k in index]
+        Re=np.array([p.Re() for p in pipes], dtype=float)
+        turbulent=np.flatnonzero(Re>2000)
+        if len(turbulent)<minBatch:
+            return
+        rr=np.array([pipes[k].relrough for k in turbulent], dtype=float)
+        for k, f in zip(turbulent.tolist(), (1/colebrookU(Re[turbulent], rr)**2).tolist()):
+            pipes[k].FrictionFactor(f)
+
+    def loopIncidence(self, withUsed=False):
+        '''
+        The loops in the array form of kernels.loopHeadLoss: loop k traverses pipes[ptr[k]:ptr[k+1]] in the
+        directions signs[ptr[k]:ptr[k+1]] (see Loop.traversal).
+        :param withUsed: also return the list of pipes in any loop, in the order the loops reach them
+        :return: (ptr, pipe indices, signs) arrays, and that list if withUsed
+        '''
+        index={id(p): k for k, p in enumerate(self.pipes)}
+        ptr=np.zeros(len(self.loops)+1, dtype=int)
+        pipes, signs=[], []
+        for k, l in enumerate(self.loops):
+            pipes+=[index[id(p)] for p in l.pipes]
+            signs+=l.traversal()
+            ptr[k+1]=len(pipes)
+        if withUsed:
+            return ptr, np.array(pipes, dtype=int), np.array(signs, dtype=float), list(dict.fromkeys(pipes))
+        return ptr, np.array(pipes, dtype=int), np.array(signs, dtype=float)
+
+    def getPipe(self, name):
+        '''
+        Returns a pipe object by its name
+        :param name: the pipe name, e.g. 'a-b'
+        :return: the pipe object or None
+        '''
+        for p in self.pipes:
+            if name == p.Name():
+                return p
+        return None
+
+    def getNodePipes(self, node):
+        '''
+        Returns a list of pipe objects that are connected to the node object
+        :param node: the name of the node
+        :return: a list of pipes
+        '''
+        l=[]
+        for p in self.pipes:
+            if p.oContainsNode(node):
+                l.append(p)
+        return l
+
+    def nodeBuilt(self, node):
+        '''
+        Determines if I have already constructed this node object (by name)
+        :param node: the name of the node
+        :return: True or False
+        '''
+        for n in self.nodes:
+            if n.name==node:
+                return True
+        return False
+
+    def getNode(self, name):
+        '''
+        Returns one of the node objects by name
+        :param name: the name of the node
+        :return: the node object or None
+        '''
+        for n in self.nodes:
+            if n.name==name:
+                return n
+        return None
+
+    def getTank(self, node):
+        '''
+        Returns the tank object connected to a node
+        :param node: the name of the node
+        :return: the tank object or None
+        '''
+        for t in self.tanks:
+            if t.node==node:
+                return t
+        return None
+
+    def buildNodes(self):
+        '''
+        Automatically create the node objects by looking at the pipe ends.  The pipes of every node are
+        gathered in one pass (the same lists getNodePipes returns), so large networks build in linear time.
+        :return: nothing
+        '''
+        pipesAt={}
+        for p in self.pipes:
+            for name in {p.startNode, p.endNode}:
+                pipesAt.setdefault(name, []).append(p)
+        built={n.name for n in self.nodes}
+        for p in self.pipes:
+            for name in (p.startNode, p.endNode):
+                if name not in built:
+                    #instantiate a node object and append it to the list of nodes
+                    built.add(name)
+                    self.nodes.append(Node(name, pipesAt[name]))
+
+    def printTable(self, table, fmt, fields):
+        '''
+        Prints one formatted line per record of a table with a single write.
+        :param table: structured array
+        :param fmt: format string of one line
+        :param fields: the fields that fill the format
+        '''
+        sys.stdout.write(''.join(fmt.format(*row)+'\n' for row in zip(*(table[k].tolist() for k in fields))))
+
+    def printPipeFlowRates(self):
+        self.printTable(self.pipeTable(), 'The flow in segment {} is {:0.2f} m^3/s', ('name', 'Q'))
+
+    def printNetNodeFlows(self):
+        self.printTable(self.nodeTable(), 'net flow into node {} is {:0.2f}', ('name', 'netFlow'))
+
+    def printLoopHeadLoss(self):
+        self.printTable(self.loopTable(), 'head loss for loop {} is {:0.2f}', ('name', 'headLoss'))
+
+    def printPipeHeadLosses(self):
+        self.printTable(self.pipeTable(), 'head loss in pipe {} is {:0.2f} m of fluid', ('name', 'headLoss'))
+    #endregion
+#endregion
@@ -0,0 +1,327 @@
+#region imports
+import os
+import sys
+import time
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledNetwork import CompiledNetwork
+#endregion
+
+#region class definitions
+class PipeCatalogue():
+    #region constructor
+    def __init__(self, D, cost, name=''):
+        '''
+        The commercial pipe sizes a design can choose from.
+        :param D: nominal diameters in mm (as Pipe takes them)
+        :param cost: installed cost per metre of each diameter
+        :param name: a convenient identifier
+        '''
+        #region attributes
+        order=np.argsort(D)
+        self.D=np.asarray(D, dtype=float)[order]
+        self.d=self.D/1000.0  # in m, as CompiledNetwork uses them
+        self.cost=np.asarray(cost, dtype=float)[order]
+        self.name=name
+        for a in (self.D, self.d, self.cost):
+            a.flags.writeable=False
+        #endregion
+    #endregion
+
+    #region methods
+    def nearest(self, d):
+        '''
+        :param d: diameters in m
+        :return: index of the nearest catalogue size of each
+        '''
+        d=np.asarray(d, dtype=float)
+        k=np.clip(np.searchsorted(self.d, d), 1, len(self.d)-1)
+        return np.where(np.abs(self.d[k-1]-d)<=np.abs(self.d[k]-d), k-1, k)
+    #endregion
+
+
+class PipeSizing():
+    #region constructor
+    def __init__(self, network, catalogue, minPressure=None, maxVelocity=None, elevation=None, Hfixed=None,
+                 pipes=None, T=None):
+        '''
+        Least cost pipe diameters from a catalogue, subject to a minimum pressure head at every node and a
+        maximum velocity in every pipe.  The network is compiled once and a design is just an array of catalogue
+        indices: every candidate is solved by CompiledNetwork.solveBatch with its diameter array, warm started
+        from the flows and heads of the design it was derived from, many candidates per batch and batches in
+        parallel worker processes.  No Pipe object is rebuilt and fsolve is never called; apply() writes the
+        final diameters to the Pipe objects in place.
+        :param network: a PipeNetwork object with its nodes built; node extFlow are the design demands (m^3/s)
+        :param catalogue: a PipeCatalogue object
+        :param minPressure: minimum pressure head in m of fluid at the nodes that are not fixed heads, or None
+        :param maxVelocity: maximum velocity in m/s in the sized pipes, or None
+        :param elevation: optional dict {node name: elevation in m} (default 0); pressure head is head-elevation
+        :param Hfixed: heads of the fixed nodes (default: the tank heads, or zero at the datum node)
+        :param pipes: names of the pipes to size (default: all); the others keep their diameter
+        :param T: optional pipe temperatures in C (see CompiledNetwork.fluidProperties)
+        '''
+        #region attributes
+        self.network=network
+        self.catalogue=catalogue
+        self.compiled=CompiledNetwork(network)
+        C=self.compiled
+        self.ext=np.array([n.extFlow for n in network.nodes], dtype=float)
+        tanks=getattr(network, 'tanks', [])
+        if Hfixed is None:
+            Hfixed=[t.head() for t in tanks] if tanks else [0.0]
+        self.Hfixed=np.asarray(Hfixed, dtype=float)
+        self.minPressure=minPressure
+        self.maxVelocity=maxVelocity
+        z=np.array([(elevation or {}).get(n, 0.0) for n in C.nodeNames])
+        self.zFree=z[~C.isFixed]
+        self.sized=np.arange(len(C.pipeNames)) if pipes is None else np.array([C.pipeNames.index(p) for p in pipes])
+        self.r=C.rr*C.d  # absolute roughness stays with the pipe when its diameter changes
+        self.T=T
+        self.solves=0  # candidate designs solved, their Newton iterations and the time spent solving
+        self.iterations=0
+        self.seconds=0.0
+        self.history=[]  # (cost, design) of every accepted move
+        #endregion
+    #endregion
+
+    #region methods
+    def diameters(self, designs):
+        '''
+        :param designs: (B, number of sized pipes) catalogue indices
+        :return: (B, number of pipes) diameters in m
+        '''
+        designs=np.atleast_2d(designs)
+        d=np.repeat(self.compiled.d[None, :], len(designs), axis=0)
+        d[:, self.sized]=self.catalogue.d[designs]
+        return d
+
+    def cost(self, designs):
+        '''
+        :param designs: (B, number of sized pipes) catalogue indices
+        :return: (B,) cost of the sized pipes
+        '''
+        return self.catalogue.cost[np.atleast_2d(designs)]@self.compiled.length[self.sized]
+
+    def solve(self, designs, Q0=None, H0=None, batchSize=64):
+        '''
+        Solves candidate designs, batchSize at a time.
+        :param designs: (B, number of sized pipes) catalogue indices
+        :param Q0, H0: optional starting flows and heads for every candidate, e.g. those of the current design
+        :return: (Q, H, converged, Newton iterations of the batches)
+        '''
+        designs=np.atleast_2d(designs)
+        d=self.diameters(designs)
+        Q, H, ok, iterations=[], [], [], 0
+        for b in range(0, len(d), batchSize):
+            s=slice(b, b+batchSize)
+            q, h, it, c=self.compiled.solveBatch(np.broadcast_to(self.ext, (len(d[s]), len(self.ext))), d[s],
+                                                 self.r, self.Hfixed, Q0, H0, T=self.T)
+            Q.append(q)
+            H.append(h)
+            ok.append(c)
+            iterations+=it
+        return np.concatenate(Q), np.concatenate(H), np.concatenate(ok), iterations
+
+    def margins(self, designs, Q, H):
+        '''
+        How far solved designs are from their constraints (negative where one is violated).
+        :return: ((B,) smallest pressure head margin in m, (B,) smallest velocity margin in m/s), inf without
+                 the constraint
+        '''
+        C=self.compiled
+        B=len(Q)
+        p=np.full(B, np.inf)
+        if self.minPressure is not None and len(self.zFree):
+            p=np.min(H[:, ~C.isFixed]-self.zFree-self.minPressure, axis=1)
+        v=np.full(B, np.inf)
+        if self.maxVelocity is not None:
+            V=np.abs(Q[:, self.sized])/(np.pi/4.0*self.catalogue.d[np.atleast_2d(designs)]**2)
+            v=self.maxVelocity-np.max(V, axis=1)
+        return p, v
+
+    def evaluate(self, designs, start=None, pool=None, workers=1):
+        '''
+        Solves candidate designs and checks them against the constraints.
+        :param designs: (B, number of sized pipes) catalogue indices
+        :param start: optional (Q, H) to warm start every candidate from
+        :param pool: optional concurrent.futures executor whose workers were started with _initWorker
+        :param workers: number of parts the candidates are split into for the pool
+        :return: dict of (B,) arrays: cost, feasible, pressure and velocity margins; and Q, H of the candidates
+        '''
+        designs=np.atleast_2d(designs)
+        Q0, H0=(None, None) if start is None else start
+        t0=time.perf_counter()
+        if pool is None or len(designs)<2*workers:
+            Q, H, ok, it=self.solve(designs, Q0, H0)
+        else:
+            parts=[p for p in np.array_split(designs, workers) if len(p)]
+            out=list(pool.map(_workerSolve, parts, [Q0]*len(parts), [H0]*len(parts)))
+            Q, H, ok=(np.concatenate([o[k] for o in out]) for k in range(3))
+            it=sum(o[3] for o in out)
+        self.seconds+=time.perf_counter()-t0
+        self.solves+=len(designs)
+        self.iterations+=it
+        p, v=self.margins(designs, Q, H)
+        return {'cost': self.cost(designs), 'feasible': ok&(p>=-1e-9)&(v>=-1e-9), 'pressure': p, 'velocity': v,
+                'Q': Q, 'H': H}
+
+    def optimize(self, start=None, workers=None, exchange=True, maxRounds=1000):
+        '''
+        A greedy search for the least cost feasible design.  From the start design (default: every sized pipe at
+        the largest size) it repeatedly evaluates every one-size reduction, all in one parallel batch, and ranks
+        the feasible ones by the cost they save per metre of pressure margin they use up.  The best 2, 4, 8, ...
+        of them are then tried together, in one more batch, and the largest group that is still feasible is
+        accepted (or else the best single reduction), so a large network does not take one round per pipe.  When
+        no reduction is feasible, exchange moves (one pipe one size up, another one size down, for a net saving)
+        are tried one at a time, and any accepted exchange restarts the reductions.
+        :param start: optional (number of sized pipes,) catalogue indices to start from; it must be feasible
+        :param workers: number of processes (default: os.cpu_count(); 1 evaluates in this process)
+        :param exchange: also try exchange moves
+        :param maxRounds: maximum number of accepted moves
+        :return: dict with design (catalogue indices), D (mm of the sized pipes), cost, feasible, the Q and H of
+                 the design, and solves, seconds and solvesPerSecond of the search
+        '''
+        import os
+        nS, nC=len(self.sized), len(self.catalogue.d)
+        design=np.full(nS, nC-1) if start is None else np.array(start, dtype=int)
+        workers=workers or os.cpu_count() or 1
+        pool=None
+        if workers>1:
+            from concurrent.futures import ProcessPoolExecutor
+            pool=ProcessPoolExecutor(workers, initializer=_initWorker, initargs=(self,))
+        try:
+            best=self.evaluate(design)
+            if not best['feasible'][0]:
+                return self._result(design, best)
+            self.history.append((best['cost'][0], design.copy()))
+            for _ in range(maxRounds):
+                moved=False
+                for kind in ('reduce', 'exchange') if exchange else ('reduce',):
+                    candidates, saving=self._moves(design, kind)
+                    if not len(candidates):
+                        continue
+                    res=self.evaluate(candidates, (best['Q'][0], best['H'][0]), pool, workers)
+                    ok=np.flatnonzero(res['feasible']&(saving>0))
+                    if not len(ok):
+                        continue
+                    used=np.maximum(best['pressure'][0]-res['pressure'][ok], 1e-9)
+                    used=np.where(np.isfinite(used), used, 1e-9)
+                    ok=ok[np.argsort(-saving[ok]/used, kind='stable')]
+                    k=ok[0]
+                    base, design, best=design, candidates[k], {key: v[k:k+1] for key, v in res.items()}
+                    if kind=='reduce' and len(ok)>1:
+                        # the best 2, 4, 8, ... reductions together (each changes another pipe), in one batch
+                        sizes=2**np.arange(1, int(np.log2(len(ok)))+1)
+                        if sizes[-1]<len(ok):
+                            sizes=np.append(sizes, len(ok))
+                        down=self._changed(candidates[ok], base)
+                        combined=np.array([base-np.isin(np.arange(nS), down[:n]) for n in sizes])
+                        both=self.evaluate(combined, (best['Q'][0], best['H'][0]), pool, workers)
+                        good=np.flatnonzero(both['feasible'])
+                        if len(good):
+                            k=good[-1]  # the most reductions that are still feasible together
+                            design, best=combined[k], {key: v[k:k+1] for key, v in both.items()}
+                    self.history.append((best['cost'][0], design.copy()))
+                    moved=True
+                    break
+                if not moved:
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return self._result(design, best)
+
+    def _moves(self, design, kind):
+        '''
+        The neighbours of a design.
+        :param kind: 'reduce' (one pipe one size down) or 'exchange' (one pipe up, another down, saving cost)
+        :return: ((n, number of sized pipes) candidate designs, (n,) cost savings)
+        '''
+        L=self.compiled.length[self.sized]
+        c=self.catalogue.cost
+        nC=len(c)
+        down=np.flatnonzero(design>0)
+        if kind=='reduce':
+            cand=np.repeat(design[None, :], len(down), axis=0)
+            cand[np.arange(len(down)), down]-=1
+            return cand, L[down]*(c[design[down]]-c[design[down]-1])
+        up=np.flatnonzero(design<nC-1)
+        i, j=np.meshgrid(up, down, indexing='ij')
+        i, j=i.ravel(), j.ravel()
+        keep=i!=j
+        i, j=i[keep], j[keep]
+        saving=L[j]*(c[design[j]]-c[design[j]-1])-L[i]*(c[design[i]+1]-c[design[i]])
+        keep=saving>1e-9
+        i, j, saving=i[keep], j[keep], saving[keep]
+        cand=np.repeat(design[None, :], len(i), axis=0)
+        rows=np.arange(len(i))
+        cand[rows, i]+=1
+        cand[rows, j]-=1
+        return cand, saving
+
+    def _changed(self, candidates, design):
+        '''
+        :return: the sized pipe that each one-pipe candidate changes relative to design
+        '''
+        return np.argmax(candidates!=design[None, :], axis=1)
+
+    def _result(self, design, res):
+        return {'design': design, 'D': self.catalogue.D[design], 'cost': float(res['cost'][0]),
+                'feasible': bool(res['feasible'][0]), 'pressure': float(res['pressure'][0]),
+                'velocity': float(res['velocity'][0]), 'Q': res['Q'][0], 'H': res['H'][0],
+                'solves': self.solves, 'seconds': self.seconds,
+                'solvesPerSecond': self.solves/self.seconds if self.seconds>0 else 0.0}
+
+    def apply(self, design, network=None):
+        '''
+        Sets the diameters of a design on the Pipe objects, in place.
+        :param design: (number of sized pipes,) catalogue indices
+        :param network: the PipeNetwork (default: the one being sized)
+        '''
+        network=network or self.network
+        for k, i in zip(self.sized, design):
+            network.pipes[k].d=float(self.catalogue.d[i])
+    #endregion
+#endregion
+
+#region function definitions
+_worker={}
+
+
+def _initWorker(sizing):
+    _worker['sizing']=sizing
+
+
+def _workerSolve(designs, Q0, H0):
+    return _worker['sizing'].solve(designs, Q0, H0)
+
+
+def main():
+    '''
+    Sizes the pipes of the HW6_2 network (demands in m^3/s, supplied at node a with a 40 m head) for at least 20 m
+    of pressure head at every node and at most 2.5 m/s in every pipe.
+    :return: nothing, just prints to screen
+    '''
+    from HW6_2 import buildExampleNetwork
+    PN=buildExampleNetwork(units='m3/s', loops=False)
+    catalogue=PipeCatalogue([100, 150, 200, 250, 300, 350, 400], [95, 120, 150, 185, 225, 270, 320], 'ductile iron')
+    sizing=PipeSizing(PN, catalogue, minPressure=20.0, maxVelocity=2.5, Hfixed=[40.0])
+    homework=catalogue.nearest(sizing.compiled.d)
+    res=sizing.evaluate(homework)
+    print('homework diameters: cost {:0.0f}, feasible {}, pressure margin {:0.2f} m'.format(
+        res['cost'][0], res['feasible'][0], res['pressure'][0]))
+    best=sizing.optimize(workers=2)
+    print('optimized: cost {:0.0f}, feasible {}, pressure margin {:0.2f} m, velocity margin {:0.2f} m/s'.format(
+        best['cost'], best['feasible'], best['pressure'], best['velocity']))
+    print('{} candidate designs in {:0.3f} s ({:0.0f} solves/s), {} moves'.format(
+        best['solves'], best['seconds'], best['solvesPerSecond'], len(sizing.history)-1))
+    for name, D, q in zip(sizing.compiled.pipeNames, best['D'], best['Q']):
+        print('{:>5s} {:5.0f} mm {:8.4f} m^3/s'.format(name, D, q))
+    sizing.apply(best['design'])
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,32 @@
+#region class definitions
+class Tank():
+    #region constructor
+    def __init__(self, Node='a', Area=None, Level=0.0, Elevation=0.0, MinLevel=0.0, MaxLevel=float('inf')):
+        '''
+        A storage tank (or reservoir) at a node of a pipe network.  Its water surface fixes the head of the node
+        during a time step, and the net inflow changes the level between steps.
+        :param Node: name of the node the tank is connected to
+        :param Area: cross-sectional area in m^2, None for a reservoir whose level never changes
+        :param Level: water level above the tank bottom in m
+        :param Elevation: elevation of the tank bottom in m
+        :param MinLevel: the tank is empty at this level in m
+        :param MaxLevel: the tank overflows above this level in m
+        '''
+        #region attributes
+        self.node=Node
+        self.area=Area
+        self.level=Level
+        self.elevation=Elevation
+        self.minLevel=MinLevel
+        self.maxLevel=MaxLevel
+        #endregion
+    #endregion
+
+    #region methods
+    def head(self):
+        '''
+        The hydraulic head of the water surface in m of fluid.
+        '''
+        return self.elevation+self.level
+    #endregion
+#endregion
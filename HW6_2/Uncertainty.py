@@ -0,0 +1,138 @@
+#region imports
+import os
+import sys
+import time
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledNetwork import CompiledNetwork
+from montecarlo import Normal, Uniform, LogNormal, StreamingStats, runChunks
+#endregion
+
+#region class definitions
+class MonteCarloStudy():
+    #region constructor
+    def __init__(self, network, seed=0):
+        '''
+        Propagates uncertain pipe diameters, roughness and node demands through a pipe network.  Samples are
+        drawn and solved in chunks (CompiledNetwork.solveBatch solves a whole batch as one Newton iteration),
+        chunks run in parallel worker processes, and only the StreamingStats of flows and heads are kept.
+        Chunk k draws from its own generator seeded with SeedSequence(seed, spawn_key=(k,)), so the streams are
+        independent and the result does not depend on the number of workers or the order chunks finish in.
+        :param network: a PipeNetwork object with its nodes built; tanks fix heads as in ExtendedPeriod
+        :param seed: root seed of the random streams
+        '''
+        #region attributes
+        self.network=network
+        self.seed=seed
+        self.compiled=CompiledNetwork(network)
+        self.uncertain=[]  # (attribute, indices, distribution)
+        self.thresholds=[]
+        self.names=['Q '+p for p in self.compiled.pipeNames]+['H '+n for n in self.compiled.nodeNames]
+        C=self.compiled
+        self.nominal={'d': C.d.copy(), 'r': C.rr*C.d, 'extFlow': np.array([n.extFlow for n in network.nodes], float)}
+        tanks=getattr(network, 'tanks', [])
+        self.Hfixed=np.array([t.head() for t in tanks]) if tanks else None
+        self.Q0, self.H0, _, _=C.solve(self.nominal['extFlow'], self.Hfixed)
+        self.failed=0
+        self.iterations=0
+        #endregion
+    #endregion
+
+    #region methods
+    def vary(self, attribute, dist, names=None):
+        '''
+        Makes an input uncertain.
+        :param attribute: 'd' or 'r' of pipes, or 'extFlow' of nodes
+        :param dist: a Normal, Uniform or LogNormal object
+        :param names: pipe names ('a-b') or node names to vary (default: all)
+        '''
+        allNames=self.compiled.nodeNames if attribute=='extFlow' else self.compiled.pipeNames
+        if attribute not in self.nominal:
+            raise ValueError("unknown attribute '{}'".format(attribute))
+        idx=np.arange(len(allNames)) if names is None else np.array([allNames.index(n) for n in names])
+        self.uncertain.append((attribute, idx, dist))
+
+    def threshold(self, column, op, limit):
+        '''
+        Counts the probability that an output is above (op '>') or below (op '<') a limit.
+        :param column: output name, 'Q a-b' for a pipe flow or 'H d' for a node head
+        '''
+        if column not in self.names:
+            raise ValueError("unknown output '{}'".format(column))
+        self.thresholds.append((column, op, limit))
+
+    def sample(self, rng, n):
+        '''
+        :return: dict of (n, ...) arrays for 'd', 'r' and 'extFlow'
+        '''
+        values={k: np.repeat(v[None, :], n, axis=0) for k, v in self.nominal.items()}
+        for attribute, idx, dist in self.uncertain:
+            values[attribute][:, idx]=dist.sample(rng, self.nominal[attribute][idx], n)
+        return values
+
+    def solveChunk(self, k, n, batchSize=128):
+        '''
+        Draws and solves chunk k of n samples.
+        :return: (flows and heads as an (n solved, columns) array, number of unconverged samples, Newton iterations)
+        '''
+        rng=np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(k,)))
+        v=self.sample(rng, n)
+        out, failed, iterations=[], 0, 0
+        for b in range(0, n, batchSize):
+            s=slice(b, b+batchSize)
+            Q, H, it, ok=self.compiled.solveBatch(v['extFlow'][s], v['d'][s], v['r'][s], self.Hfixed, self.Q0, self.H0)
+            out.append(np.concatenate((Q, H), axis=1)[ok])
+            failed+=int(np.sum(~ok))
+            iterations+=it
+        return np.concatenate(out), failed, iterations
+
+    def run(self, nSamples, chunkSize=1000, workers=None, pilot=500, progress=None):
+        '''
+        Runs the study with montecarlo.runChunks: a pilot chunk solved here fixes the histogram ranges, the
+        remaining chunks are summarized in worker processes and merged as they finish.
+        :param nSamples: number of samples
+        :param chunkSize: samples per chunk
+        :param workers: number of processes (default: os.cpu_count(); 1 runs everything in this process)
+        :param pilot: samples of the pilot chunk
+        :param progress: optional function called with (samples done, StreamingStats) after every chunk
+        :return: the StreamingStats of all samples
+        '''
+        t0=time.perf_counter()
+        stats, (self.failed, self.iterations)=runChunks(self.solveChunk, self.names, self.thresholds, nSamples,
+                                                         chunkSize, workers, pilot, progress)
+        self.seconds=time.perf_counter()-t0
+        return stats
+    #endregion
+#endregion
+
+#region function definitions
+def main():
+    '''
+    Uncertainty of the HW6_2 network: 10% demand spread, 5% diameter tolerance and a log-normal roughness.
+    :return: nothing, just prints to screen
+    '''
+    from HW6_2 import buildExampleNetwork
+    PN=buildExampleNetwork(units='m3/s', loops=False)
+    study=MonteCarloStudy(PN, seed=1)
+    study.vary('extFlow', Normal(0.10), ['d', 'f', 'h'])
+    study.vary('d', Uniform(-0.05, 0.05))
+    study.vary('r', LogNormal(0.5))  # node a is the datum of the heads and supplies whatever is demanded
+    study.threshold('H h', '<', -1.1)
+    study.threshold('Q g-h', '<', 0.001)
+    stats=study.run(20000, workers=2)
+    s=stats.summary()
+    print('{} samples in {:0.2f} s ({:0.0f} solves/s), {} unconverged'.format(
+        s['count'], study.seconds, s['count']/study.seconds, study.failed))
+    print('{:>8s}{:>11s}{:>11s}{:>11s}{:>11s}{:>11s}'.format('output', 'mean', 'std', 'p5', 'p50', 'p95'))
+    for j, name in enumerate(s['names']):
+        print('{:>8s}{:>11.5f}{:>11.5f}{:>11.5f}{:>11.5f}{:>11.5f}'.format(name, s['mean'][j], s['std'][j],
+                                                                      s['p5'][j], s['p50'][j], s['p95'][j]))
+    for (c, op, limit), p in s['exceedance'].items():
+        print('P({} {} {:g}) = {:0.4f}'.format(c, op, limit, p))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
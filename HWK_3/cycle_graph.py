@@ -0,0 +1,500 @@
+# region imports
+import os
+import sys
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from steam import steam
+from steam_tables import getBackend
+
+
+# endregion
+
+# region class definitions
+class StateSpec():
+    """
+    How a component defines one state: its pressure and one more property.  The property value (and an
+    optional enthalpy override) can be functions of states that are resolved earlier.
+    """
+
+    def __init__(self, p, kind, value=None, depends=(), hValue=None):
+        '''
+        Constructor for StateSpec
+        :param p: pressure in kPa, or the name of another state whose pressure is used
+        :param kind: 'T', 'x', 'h' or 's', the second property given (the same choices as steam())
+        :param value: the value of that property, or a function f(states) returning it
+        :param depends: names of the states the functions need
+        :param hValue: optional function f(states) that overrides the enthalpy after the lookup (pump exit)
+        '''
+        self.p = p
+        self.kind = kind
+        self.value = value
+        self.depends = tuple(depends)
+        self.hValue = hValue
+
+
+class CycleState():
+    """
+    A resolved thermodynamic state of the cycle graph.
+    """
+
+    def __init__(self, name, p):
+        self.name = name
+        self.p = p  # kPa
+        self.T = self.x = self.v = self.h = self.s = self.hf = None
+        self.region = None
+        self.m = None  # mass flow relative to the reference stream
+
+    def steam(self):
+        '''
+        Makes a steam object with the properties of this state (no further table lookups).
+        :return: a steam object
+        '''
+        st = steam(self.p, name=self.name)
+        st.T, st.x, st.v, st.h, st.s, st.region, st.hf = self.T, self.x, self.v, self.h, self.s, self.region, self.hf
+        return st
+
+
+class Component():
+    """
+    Base class of the cycle components.  Components name the states they connect; a component defines the
+    states it sends out (specs), adds its mass and energy balances (balances) and reports work and heat.
+    """
+    work = 0.0  # kJ/kg of reference flow, positive for work out of the cycle
+    heat = 0.0  # kJ/kg of reference flow, positive for heat into the cycle
+
+    def specs(self):
+        return {}
+
+    def balances(self, S):
+        '''
+        Linear equations in the stream mass flows, each as ({state name: coefficient}, right hand side).
+        :param S: dict of resolved states
+        '''
+        return []
+
+    def energy(self, S):
+        '''
+        Sets self.work and self.heat from the resolved states and mass flows.
+        :param S: dict of resolved states
+        '''
+        pass
+
+
+class Boiler(Component):
+    """
+    Heats the feed at constant pressure to a given temperature, or to saturated vapor if T is None.
+    """
+
+    def __init__(self, inlet, outlet, T=None, p=None):
+        self.inlet, self.outlet, self.T, self.p = inlet, outlet, T, p
+
+    def specs(self):
+        p = self.p if self.p is not None else self.inlet
+        if self.T is None:
+            return {self.outlet: StateSpec(p, 'x', 1.0)}
+        return {self.outlet: StateSpec(p, 'T', self.T)}
+
+    def balances(self, S):
+        return [({self.outlet: 1.0, self.inlet: -1.0}, 0.0)]
+
+    def energy(self, S):
+        self.heat = S[self.inlet].m * (S[self.outlet].h - S[self.inlet].h)
+
+
+class Reheater(Boiler):
+    """
+    Reheats partly expanded steam at constant pressure.
+    """
+    pass
+
+
+class Turbine(Component):
+    """
+    Expands steam from the inlet to the outlet pressure, optionally with bleed streams taken off at
+    intermediate pressures.  With eta < 1 the exit enthalpies follow from the isentropic efficiency.
+    """
+
+    def __init__(self, inlet, outlet, p, bleeds=None, eta=1.0):
+        '''
+        :param inlet: inlet state name
+        :param outlet: outlet state name
+        :param p: outlet pressure in kPa
+        :param bleeds: optional dict {state name: bleed pressure in kPa}
+        :param eta: isentropic efficiency
+        '''
+        self.inlet, self.outlet, self.p, self.eta = inlet, outlet, p, eta
+        self.exits = dict(bleeds or {})
+        self.exits[outlet] = p
+
+    def specs(self):
+        specs = {}
+        i = self.inlet
+        for name, p in self.exits.items():
+            if self.eta == 1.0:
+                specs[name] = StateSpec(p, 's', lambda S: S[i].s, (i,))
+            else:
+                ideal = '_' + name + '_isentropic'
+                specs[ideal] = StateSpec(p, 's', lambda S: S[i].s, (i,))
+                specs[name] = StateSpec(p, 'h', lambda S, ideal=ideal: S[i].h - self.eta * (S[i].h - S[ideal].h),
+                                        (i, ideal))
+        return specs
+
+    def balances(self, S):
+        eq = {name: 1.0 for name in self.exits}
+        eq[self.inlet] = -1.0
+        return [(eq, 0.0)]
+
+    def energy(self, S):
+        self.work = sum(S[n].m * (S[self.inlet].h - S[n].h) for n in self.exits)
+
+
+class Pump(Component):
+    """
+    Raises the pressure of liquid; the exit enthalpy is h_in + v_in*(p_out - p_in).
+    """
+
+    def __init__(self, inlet, outlet, p):
+        self.inlet, self.outlet, self.p = inlet, outlet, p
+
+    def specs(self):
+        i = self.inlet
+        return {self.outlet: StateSpec(self.p, 's', lambda S: S[i].s, (i,),
+                                       hValue=lambda S: S[i].h + S[i].v * (self.p - S[i].p))}
+
+    def balances(self, S):
+        return [({self.outlet: 1.0, self.inlet: -1.0}, 0.0)]
+
+    def energy(self, S):
+        self.work = -S[self.inlet].m * (S[self.outlet].h - S[self.inlet].h)
+
+
+class Condenser(Component):
+    """
+    Condenses every inlet stream to saturated liquid at the pressure of the first inlet.
+    """
+
+    def __init__(self, inlets, outlet):
+        self.inlets = [inlets] if isinstance(inlets, str) else list(inlets)
+        self.outlet = outlet
+
+    def specs(self):
+        return {self.outlet: StateSpec(self.inlets[0], 'x', 0.0)}
+
+    def balances(self, S):
+        eq = {n: -1.0 for n in self.inlets}
+        eq[self.outlet] = 1.0
+        return [(eq, 0.0)]
+
+    def energy(self, S):
+        self.heat = -sum(S[n].m * (S[n].h - S[self.outlet].h) for n in self.inlets)
+
+
+class Throttle(Component):
+    """
+    Isenthalpic expansion, e.g. to cascade a heater drain back to a lower pressure.
+    """
+
+    def __init__(self, inlet, outlet, p):
+        self.inlet, self.outlet, self.p = inlet, outlet, p
+
+    def specs(self):
+        i = self.inlet
+        return {self.outlet: StateSpec(self.p, 'h', lambda S: S[i].h, (i,))}
+
+    def balances(self, S):
+        return [({self.outlet: 1.0, self.inlet: -1.0}, 0.0)]
+
+
+class OpenFeedwaterHeater(Component):
+    """
+    Mixes bleed steam with the feedwater; the mixture leaves as saturated liquid at the heater pressure.
+    The energy balance sets the bleed flow.
+    """
+
+    def __init__(self, inlets, outlet, p=None):
+        self.inlets = list(inlets)
+        self.outlet = outlet
+        self.p = p
+
+    def specs(self):
+        return {self.outlet: StateSpec(self.p if self.p is not None else self.inlets[0], 'x', 0.0)}
+
+    def balances(self, S):
+        mass = {n: -1.0 for n in self.inlets}
+        mass[self.outlet] = 1.0
+        energy = {n: S[n].h for n in self.inlets}
+        energy[self.outlet] = -S[self.outlet].h
+        return [(mass, 0.0), (energy, 0.0)]
+
+
+class ClosedFeedwaterHeater(Component):
+    """
+    Heats the feedwater with bleed steam without mixing.  The feedwater leaves with the enthalpy of saturated
+    liquid at the bleed pressure and the condensed bleed leaves as a saturated liquid drain.
+    """
+
+    def __init__(self, bleed, feedIn, feedOut, drain):
+        self.bleed, self.feedIn, self.feedOut, self.drain = bleed, feedIn, feedOut, drain
+
+    def specs(self):
+        d = self.drain
+        return {self.drain: StateSpec(self.bleed, 'x', 0.0),
+                self.feedOut: StateSpec(self.feedIn, 'h', lambda S: S[d].h, (d,))}
+
+    def balances(self, S):
+        return [({self.drain: 1.0, self.bleed: -1.0}, 0.0),
+                ({self.feedOut: 1.0, self.feedIn: -1.0}, 0.0),
+                ({self.bleed: S[self.bleed].h - S[self.drain].h,
+                  self.feedIn: -(S[self.feedOut].h - S[self.feedIn].h)}, 0.0)]
+
+
+class CycleGraph():
+    """
+    A steam power cycle built from components wired together by named states.  evaluate() resolves every
+    state of the graph with batched property lookups: one saturation lookup for all of the distinct
+    pressures, then one superheated lookup per dependency level for the distinct (T, p) pairs.
+    """
+
+    def __init__(self, name='Cycle'):
+        self.name = name
+        self.components = []
+        self.states = {}
+        self.lookups = {}
+        self.turbine_work = self.pump_work = self.heat_added = self.heat_rejected = 0.0
+        self.efficiency = None
+
+    def add(self, component):
+        '''
+        Adds a component to the graph.
+        :param component: a Component object
+        :return: the component
+        '''
+        self.components.append(component)
+        return component
+
+    def _pressures(self, specs):
+        '''
+        Resolves the pressure of every state; a spec may borrow the pressure of another state.
+        :return: dict {state name: pressure in kPa}
+        '''
+        P = {}
+        while len(P) < len(specs):
+            n = len(P)
+            for name, sp in specs.items():
+                if name not in P:
+                    if not isinstance(sp.p, str):
+                        P[name] = float(sp.p)
+                    elif sp.p in P:
+                        P[name] = P[sp.p]
+                    elif sp.p not in specs:
+                        raise ValueError('state {} takes its pressure from unknown state {}'.format(name, sp.p))
+            if len(P) == n:
+                raise ValueError('circular pressure definitions in cycle ' + self.name)
+        return P
+
+    def evaluate(self, backend=None, reference=None):
+        '''
+        Resolves all states, mass flows, work and heat of the cycle.
+        :param backend: property backend (default: steam_tables.getBackend())
+        :param reference: state whose mass flow is 1 (default: the outlet of the first boiler)
+        :return: the cycle efficiency in %
+        '''
+        tables = backend if backend is not None else getBackend()
+        specs = {}
+        for c in self.components:
+            for name, sp in c.specs().items():
+                if name in specs:
+                    raise ValueError('state {} is defined by two components'.format(name))
+                specs[name] = sp
+        P = self._pressures(specs)
+        # one saturation lookup for every distinct pressure in the graph
+        pUnique = np.unique(list(P.values()))
+        sat = dict(zip(pUnique, zip(*(np.asarray(c, dtype=float) for c in tables.sat(pUnique / 100)))))
+        self.lookups = {'sat': len(pUnique), 'superheated': 0, 'calls': 1}
+        S = {}
+        pending = dict(specs)
+        R = 8.314 / (18 / 1000)  # ideal gas constant for water, as in steam()
+        while pending:
+            level = [n for n, sp in pending.items() if all(d in S for d in sp.depends)]
+            if not level:
+                raise ValueError('states {} depend on each other in cycle {}'.format(sorted(pending), self.name))
+            vals = {n: (pending[n].value(S) if callable(pending[n].value) else pending[n].value) for n in level}
+            # superheated (T, p) states of this level, looked up together without repeats
+            hot = [n for n in level if pending[n].kind == 'T' and vals[n] > sat[P[n]][0]]
+            if hot:
+                pairs = sorted({(vals[n], P[n]) for n in hot})
+                T, p = np.array(pairs).T
+                h, s = tables.superTP(T, p / 100)
+                hs = dict(zip(pairs, zip(np.asarray(h, dtype=float), np.asarray(s, dtype=float))))
+                self.lookups['superheated'] += len(pairs)
+                self.lookups['calls'] += 1
+            for n in level:
+                sp = pending.pop(n)
+                st = S[n] = CycleState(n, P[n])
+                Tsat, hf, hg, sf, sg, vf, vg = (float(v) for v in sat[P[n]])
+                st.hf = hf
+                v = float(vals[n])
+                # the same rules steam.calc() follows for each kind of second property
+                if sp.kind == 'T':
+                    if v <= Tsat:
+                        raise ValueError('state {}: T={} is not above saturation, which steam() does not handle'
+                                         .format(n, v))
+                    st.region, st.T, st.x = 'Superheated', v, 1.0
+                    st.h, st.s = (float(a) for a in hs[(v, P[n])])
+                    st.v = R * (v + 273.14) / (P[n] * 1000)
+                else:
+                    if sp.kind == 'x':
+                        st.x = v
+                    elif sp.kind == 'h':
+                        st.h, st.x = v, max(0.0, min((v - hf) / (hg - hf), 1.0))
+                    elif sp.kind == 's':
+                        st.s, st.x = v, max(0.0, min((v - sf) / (sg - sf), 1.0))
+                    else:
+                        raise ValueError('state {}: unknown property {}'.format(n, sp.kind))
+                    st.region, st.T = 'Saturated', Tsat
+                    st.h = st.h if st.h is not None else hf + st.x * (hg - hf)
+                    st.s = st.s if st.s is not None else sf + st.x * (sg - sf)
+                    st.v = vf + st.x * (vg - vf)
+                if sp.hValue is not None:
+                    st.h = sp.hValue(S)
+        self.states = {n: st for n, st in S.items() if not n.startswith('_')}
+        self._massFlows(S, reference)
+        for c in self.components:
+            c.energy(S)
+        self.turbine_work = sum(c.work for c in self.components if isinstance(c, Turbine))
+        self.pump_work = -sum(c.work for c in self.components if isinstance(c, Pump))
+        self.heat_added = sum(c.heat for c in self.components if isinstance(c, Boiler))
+        self.heat_rejected = -sum(c.heat for c in self.components if isinstance(c, Condenser))
+        self.efficiency = 100.0 * (self.turbine_work - self.pump_work) / self.heat_added
+        return self.efficiency
+
+    def _massFlows(self, S, reference):
+        '''
+        Solves the mass and energy balances of the components for the mass flow of every stream.
+        :param S: dict of resolved states
+        :param reference: state whose mass flow is 1
+        '''
+        if reference is None:
+            reference = next(c.outlet for c in self.components if isinstance(c, Boiler))
+        names = sorted(self.states)
+        col = {n: k for k, n in enumerate(names)}
+        rows, rhs = [], []
+        for c in self.components:
+            for eq, b in c.balances(S):
+                r = np.zeros(len(names))
+                for n, a in eq.items():
+                    r[col[n]] += a
+                rows.append(r)
+                rhs.append(b)
+        r = np.zeros(len(names))
+        r[col[reference]] = 1.0
+        rows.append(r)
+        rhs.append(1.0)
+        A, b = np.array(rows), np.array(rhs)
+        m, _, rank, _ = np.linalg.lstsq(A, b, rcond=None)
+        if rank < len(names) or np.max(np.abs(A @ m - b)) > 1e-8 * max(1.0, np.max(np.abs(A))):
+            raise ValueError('the mass and energy balances of cycle {} do not fix every stream'.format(self.name))
+        for n in names:
+            S[n].m = float(m[col[n]])
+
+    def steam(self, name):
+        '''
+        Returns one state of the evaluated graph as a steam object.
+        :param name: state name
+        :return: a steam object
+        '''
+        return self.states[name].steam()
+
+    def state_table(self):
+        '''
+        One record per state of the evaluated graph: name, region, p (kPa), T (C), h (kJ/kg), s (kJ/(kg K)),
+        v (m^3/kg), x and m (mass flow relative to the reference stream).
+        :return: structured numpy array
+        '''
+        from result_io import toTable
+        if self.efficiency is None:
+            self.evaluate()
+        states = list(self.states.values())
+        table = {'name': [st.name for st in states], 'region': [st.region for st in states]}
+        for k in ('p', 'T', 'h', 's', 'v', 'x', 'm'):
+            table[k] = np.array([getattr(st, k) for st in states], dtype=float)
+        return toTable(table)
+
+    def summary(self):
+        '''
+        The cycle results without printing anything, as structured arrays for the bulk writers of result_io.
+        :return: dict with 'cycle' (one record of efficiency and the work and heat totals) and 'states'
+        '''
+        from result_io import toTable
+        states = self.state_table()
+        cycle = toTable({'name': [self.name], 'efficiency': [self.efficiency], 'turbine_work': [self.turbine_work],
+                         'pump_work': [self.pump_work], 'heat_added': [self.heat_added],
+                         'heat_rejected': [self.heat_rejected]})
+        return {'cycle': cycle, 'states': states}
+
+    def residual_report(self):
+        '''
+        Verifies the evaluated cycle in one table: every mass and energy balance of the components at the
+        solved mass flows, and the first law for the whole cycle (net work equals net heat).
+        :return: structured array, see result_io.residualTable
+        '''
+        from result_io import residualTable
+        if self.efficiency is None:
+            self.evaluate()
+        names, r = [], []
+        for c in self.components:
+            for k, (eq, b) in enumerate(c.balances(self.states)):
+                names.append('{} {} #{}'.format(type(c).__name__, getattr(c, 'outlet', ''), k + 1).replace('  ', ' '))
+                r.append(sum(a * self.states[n].m for n, a in eq.items()) - b)
+        firstLaw = (self.turbine_work - self.pump_work) - (self.heat_added - self.heat_rejected)
+        return residualTable([('balance', names, r), ('first law', [self.name], [firstLaw])])
+
+    def print_summary(self):
+        '''
+        Prints the cycle performance and the state table.
+        :return: nothing, just prints to screen
+        '''
+        table = self.state_table()
+        lines = ['Cycle Summary for:  {}\n'.format(self.name),
+                 '\tEfficiency: {:0.3f}%\n'.format(self.efficiency),
+                 '\tTurbine Work: {:0.3f} kJ/kg\n'.format(self.turbine_work),
+                 '\tPump Work: {:0.3f} kJ/kg\n'.format(self.pump_work),
+                 '\tHeat Added: {:0.3f} kJ/kg\n'.format(self.heat_added),
+                 '\t{:<22s}{:>10s}{:>8s}{:>10s}{:>8s}{:>8s}{:>8s}\n'.format('state', 'p kPa', 'T C', 'h kJ/kg', 's',
+                                                                          'x', 'm')]
+        lines += ['\t{:<22s}{:>10.1f}{:>8.1f}{:>10.2f}{:>8.4f}{:>8.4f}{:>8.4f}\n'.format(*row)
+                  for row in table[['name', 'p', 'T', 'h', 's', 'x', 'm']].tolist()]
+        sys.stdout.write(''.join(lines) + '\n')
+
+
+# endregion
+
+# region function definitions
+def main():
+    '''
+    A reheat cycle with one open and one closed feedwater heater.
+    :return: nothing, just prints to screen
+    '''
+    g = CycleGraph('Reheat-Regenerative Cycle')
+    g.add(Boiler('Boiler Inlet', 'HP Turbine Inlet', T=480))
+    g.add(Turbine('HP Turbine Inlet', 'HP Turbine Exit', p=2000, bleeds={'HP Bleed': 4000}))
+    g.add(Reheater('HP Turbine Exit', 'LP Turbine Inlet', T=440))
+    g.add(Turbine('LP Turbine Inlet', 'LP Turbine Exit', p=8, bleeds={'LP Bleed': 300}))
+    g.add(Condenser(['LP Turbine Exit'], 'Condensate'))
+    g.add(Pump('Condensate', 'LP Pump Exit', p=300))
+    g.add(OpenFeedwaterHeater(['LP Bleed', 'LP Pump Exit', 'HP Drain Throttled'], 'OFWH Exit'))
+    g.add(Pump('OFWH Exit', 'HP Pump Exit', p=8000))
+    g.add(ClosedFeedwaterHeater('HP Bleed', 'HP Pump Exit', 'Boiler Inlet', 'HP Drain'))
+    g.add(Throttle('HP Drain', 'HP Drain Throttled', p=300))
+    g.evaluate()
+    g.print_summary()
+    print('property lookups:', g.lookups)
+
+
+# endregion
+
+# region function calls
+if __name__ == "__main__":
+    main()
+# endregion
@@ -1,4 +1,10 @@
-from steam import steam
+import os
+import sys
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from cycle_graph import CycleGraph, Boiler, Turbine, Condenser, Pump
+from steam import calcBatch
 
 class rankine():
     def __init__(self, p_low=8, p_high=8000, t_high=None, name='Rankine Cycle'):
@@ -22,22 +28,25 @@ class rankine():
         self.state2=None
         self.state3=None
         self.state4=None
+        self.graph=None
 
     def calc_efficiency(self):
-        #calculate the 4 states
-        #state 1: turbine inlet (p_high, t_high) superheated or saturated vapor
-        if(self.t_high==None):
-            self.state1 = steam(self.p_high, x=1, name='Turbine Inlet')#JES MISSING CODE$ # instantiate a steam object with conditions of state 1 as saturated steam, named 'Turbine Inlet'
-        else:
-            self.state1= steam(self.p_high, T=self.t_high, name='Turbine Inlet')#JES MISSING CODE$ # instantiate a steam object with conditions of state 1 at t_high, named 'Turbine Inlet'
+        #the cycle is a preset of the cycle graph engine: boiler -> turbine -> condenser -> pump
+        self.graph=CycleGraph(self.name)
+        #state 1: turbine inlet (p_high, t_high) superheated or, if t_high is not given, saturated vapor
+        self.graph.add(Boiler('Pump Exit', 'Turbine Inlet', T=self.t_high))
         #state 2: turbine exit (p_low, s=s_turbine inlet) two-phase
-        self.state2= steam(self.p_low, s=self.state1.s, name='Turbine Exit')#JES MISSING CODE$ # instantiate a steam object with conditions of state 2, named 'Turbine Exit'
+        self.graph.add(Turbine('Turbine Inlet', 'Turbine Exit', p=self.p_low))
         #state 3: pump inlet (p_low, x=0) saturated liquid
-        self.state3= steam(self.p_low, x=0, name='Pump Inlet')
-#JES MISSING CODE$ # instantiate a steam object with conditions of state 3 as saturated liquid, named 'Pump Inlet'
+        self.graph.add(Condenser('Turbine Exit', 'Pump Inlet'))
         #state 4: pump exit (p_high,s=s_pump_inlet) typically sub-cooled, but estimate as saturated liquid
-        self.state4=steam(self.p_high,s=self.state3.s, name='Pump Exit')
-        self.state4.h=self.state3.h+self.state3.v*(self.p_high-self.p_low)
+        #with h=h3+v3*(p_high-p_low)
+        self.graph.add(Pump('Pump Inlet', 'Pump Exit', p=self.p_high))
+        self.graph.evaluate()
+        self.state1=self.graph.steam('Turbine Inlet')
+        self.state2=self.graph.steam('Turbine Exit')
+        self.state3=self.graph.steam('Pump Inlet')
+        self.state4=self.graph.steam('Pump Exit')
 
         self.turbine_work= self.state1.h - self.state2.h#$JES MISSING CODE$ # calculate turbine work
         self.pump_work= self.state4.h - self.state3.h#$JES MISSING CODE$ # calculate pump work
@@ -45,19 +54,73 @@ class rankine():
         self.efficiency=100.0*(self.turbine_work - self.pump_work)/self.heat_added
         return self.efficiency
 
+    def summary(self):
+        '''
+        The cycle results without printing anything, as structured arrays for the bulk writers of result_io.
+        :return: dict with 'cycle' (one record: name, efficiency %, turbine_work, pump_work, heat_added in kJ/kg)
+                 and 'states' (state_table)
+        '''
+        from result_io import toTable
+        if self.efficiency==None:
+            self.calc_efficiency()
+        cycle=toTable({'name': [self.name], 'efficiency': [self.efficiency], 'turbine_work': [self.turbine_work],
+                       'pump_work': [self.pump_work], 'heat_added': [self.heat_added]})
+        return {'cycle': cycle, 'states': self.state_table()}
+
+    def state_table(self):
+        '''
+        One record per state: name, region, p (kPa), T (C), h (kJ/kg), s (kJ/(kg K)), v (m^3/kg) and x.
+        :return: structured numpy array
+        '''
+        from result_io import toTable
+        if self.efficiency==None:
+            self.calc_efficiency()
+        states=[self.state1, self.state2, self.state3, self.state4]
+        table={'name': [st.name for st in states], 'region': [st.region for st in states]}
+        for k in ('p', 'T', 'h', 's', 'v', 'x'):
+            table[k]=np.array([getattr(st, k) for st in states], dtype=float)
+        return toTable(table)
+
     def print_summary(self):
 
         if self.efficiency==None:
             self.calc_efficiency()
-        print('Cycle Summary for: ', self.name)
-        print('\tEfficiency: {:0.3f}%'.format(self.efficiency))
-        print('\tTurbine Work: {:0.3f} kJ/kg'.format(self.turbine_work))
-        print('\tPump Work: {:0.3f} kJ/kg'.format(self.pump_work))
-        print('\tHeat Added: {:0.3f} kJ/kg'.format(self.heat_added))
-        self.state1.print()
-        self.state2.print()
-        self.state3.print()
-        self.state4.print()
+        lines=['Cycle Summary for:  {}\n'.format(self.name),
+               '\tEfficiency: {:0.3f}%\n'.format(self.efficiency),
+               '\tTurbine Work: {:0.3f} kJ/kg\n'.format(self.turbine_work),
+               '\tPump Work: {:0.3f} kJ/kg\n'.format(self.pump_work),
+               '\tHeat Added: {:0.3f} kJ/kg\n'.format(self.heat_added)]
+        lines+=[st.report() for st in (self.state1, self.state2, self.state3, self.state4)]
+        sys.stdout.write(''.join(lines))
+
+def calc_efficiency_batch(p_low, p_high, t_high=None):
+    '''
+    Vectorized rankine.calc_efficiency() for many cycles at once, with the same states and formulas.
+    :param p_low: low pressure isobar(s) in kPa
+    :param p_high: high pressure isobar(s) in kPa
+    :param t_high: turbine inlet temperature(s) in degrees C, None or nan for saturated vapor
+    :return: dict of arrays efficiency (%), turbine_work, pump_work, heat_added (kJ/kg) and x2 (turbine exit
+             quality), which result_io.export writes as one table.  Cycles rankine() cannot evaluate (t_high at
+             or below saturation) are nan.
+    '''
+    pl, ph, th = np.broadcast_arrays(*(np.asarray(np.nan if a is None else a, dtype=float)
+                                       for a in (p_low, p_high, t_high)))
+    #state 1: superheated at t_high or saturated vapor, one lookup for each kind
+    sat = np.isnan(th)
+    h1 = np.empty(ph.shape)
+    s1 = np.empty(ph.shape)
+    for rows, kind, value in ((sat, 'x', 1.0), (~sat, 'T', th[~sat])):
+        if rows.any():
+            st = calcBatch(ph[rows], kind, value)
+            h1[rows], s1[rows] = st['h'], st['s']
+    state2 = calcBatch(pl, 's', s1)
+    state3 = calcBatch(pl, 'x', 0.0)
+    h4 = state3['h'] + state3['v'] * (ph - pl)
+    turbine_work = h1 - state2['h']
+    pump_work = h4 - state3['h']
+    heat_added = h1 - state3['h']
+    return {'efficiency': 100.0 * (turbine_work - pump_work) / heat_added, 'turbine_work': turbine_work,
+            'pump_work': pump_work, 'heat_added': heat_added, 'x2': state2['x']}
 
 def main():
     rankine1= rankine(p_low=8, p_high=8000, t_high=None, name='Rankine Cycle (Saturated Vapor)')#$JES MISSING CODE$ #instantiate a rankine object to test it.
@@ -0,0 +1,300 @@
+# region imports
+import os
+import sys
+import time
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from steam_spline import SplineTables
+
+
+# endregion
+
+# region globals
+_spline = None  # the property surfaces of this process (each pool worker builds its own)
+
+
+# endregion
+
+# region function definitions
+def getSpline():
+    '''
+    Returns the spline property backend of this process, built on first use from the shared steam tables.
+    :return: a SplineTables object
+    '''
+    global _spline
+    if _spline is None:
+        _spline = SplineTables()
+    return _spline
+
+
+def rankineBatch(p_low, p_high, t_high, backend=None, gradient=False):
+    '''
+    Evaluates many simple Rankine cycles at once, following the same steps as rankine.calc_efficiency():
+    turbine inlet at (p_high, t_high), isentropic expansion to p_low, saturated liquid at the pump inlet and
+    pump work v*(p_high-p_low).  Inlet temperatures at or below saturation give nan.
+    :param p_low: low pressure isobar(s) in kPa
+    :param p_high: high pressure isobar(s) in kPa
+    :param t_high: turbine inlet temperature(s) in degrees C
+    :param backend: a SplineTables object (default: getSpline())
+    :param gradient: also return the derivatives with respect to (p_low, p_high, t_high)
+    :return: dict of arrays: efficiency (%), net_work, turbine_work, pump_work, heat_added (kJ/kg), x2, Tsat_high,
+             Tmax_high (hottest tabulated inlet) and, if gradient is True, d_efficiency, d_net_work, d_x2,
+             d_Tsat_high and d_Tmax_high, each with a last axis of 3
+    '''
+    sp = backend if backend is not None else getSpline()
+    pl, ph, th = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (p_low, p_high, t_high)))
+    # saturated properties on both isobars in one call (steam() works with pressure/100)
+    both, dboth = sp.satDerivs(np.concatenate((pl.ravel(), ph.ravel())) / 100)
+    n = pl.size
+    Tsl, hfl, hgl, sfl, sgl, vfl, vgl = (v[:n].reshape(pl.shape) for v in both)
+    dTsl, dhfl, dhgl, dsfl, dsgl, dvfl, dvgl = (v[:n].reshape(pl.shape) / 100 for v in dboth)
+    Tsh = both[0][n:].reshape(ph.shape)
+    dTsh = dboth[0][n:].reshape(ph.shape) / 100
+    # state 1: turbine inlet
+    h1, s1, dh1dT, dh1dp, ds1dT, ds1dp = sp.superTPDerivs(th, ph / 100)
+    dh1dp, ds1dp = dh1dp / 100, ds1dp / 100
+    Tmax, dTmax = sp.superTRange(ph / 100)[1::2]
+    bad = ~(th > Tsh)
+    # state 2: turbine exit, the quality is clipped to [0,1] just like steam() does
+    xRaw = (s1 - sfl) / (sgl - sfl)
+    x2 = np.clip(xRaw, 0.0, 1.0)
+    h2 = hfl + x2 * (hgl - hfl)
+    # states 3 and 4: pump inlet (saturated liquid) and pump exit
+    wt = h1 - h2
+    wp = vfl * (ph - pl)
+    q = h1 - hfl
+    net = wt - wp
+    eff = 100.0 * net / q
+    out = {'efficiency': eff, 'net_work': net, 'turbine_work': wt, 'pump_work': wp, 'heat_added': q,
+           'x2': x2, 'Tsat_high': Tsh, 'Tmax_high': Tmax}
+    if gradient:
+        inside = (xRaw > 0) & (xRaw < 1)
+        dsg = sgl - sfl
+        # d(xRaw) with respect to (p_low, p_high, t_high)
+        dx = np.stack((-(dsfl * dsg + (s1 - sfl) * (dsgl - dsfl)) / dsg**2, ds1dp / dsg, ds1dT / dsg), axis=-1)
+        dx = np.where(inside[..., None], dx, 0.0)
+        dhfg = np.stack((dhgl - dhfl, np.zeros_like(ph), np.zeros_like(th)), axis=-1)
+        dhf = np.stack((dhfl, np.zeros_like(ph), np.zeros_like(th)), axis=-1)
+        dh1 = np.stack((np.zeros_like(pl), dh1dp, dh1dT), axis=-1)
+        dh2 = dhf + dx * (hgl - hfl)[..., None] + x2[..., None] * dhfg
+        dwp = np.stack((dvfl * (ph - pl) - vfl, vfl, np.zeros_like(th)), axis=-1)
+        dnet = dh1 - dh2 - dwp
+        dq = dh1 - dhf
+        out['d_net_work'] = dnet
+        out['d_efficiency'] = 100.0 * (dnet * q[..., None] - net[..., None] * dq) / q[..., None]**2
+        out['d_x2'] = dx
+        out['d_Tsat_high'] = np.stack((np.zeros_like(pl), dTsh, np.zeros_like(th)), axis=-1)
+        out['d_Tmax_high'] = np.stack((np.zeros_like(pl), dTmax / 100, np.zeros_like(th)), axis=-1)
+    for k in out:
+        out[k] = np.where(bad if out[k].ndim == bad.ndim else bad[..., None], np.nan, out[k])
+    return out
+
+
+class _Scaling():
+    """
+    Maps the design variables to the unit cube: log pressure for the two isobars and linear for t_high.
+    """
+
+    def __init__(self, bounds):
+        '''
+        :param bounds: ((p_low_min, p_low_max), (p_high_min, p_high_max), (t_high_min, t_high_max))
+        '''
+        lo = np.array([np.log(bounds[0][0]), np.log(bounds[1][0]), bounds[2][0]], dtype=float)
+        hi = np.array([np.log(bounds[0][1]), np.log(bounds[1][1]), bounds[2][1]], dtype=float)
+        self.lo, self.span = lo, hi - lo
+
+    def toDesign(self, u):
+        z = self.lo + np.asarray(u) * self.span
+        return np.array([np.exp(z[0]), np.exp(z[1]), z[2]])
+
+    def chain(self, x):
+        '''d(design)/du for each variable'''
+        return np.array([x[0], x[1], 1.0]) * self.span
+
+
+def _runStart(args):
+    '''
+    One local, gradient-based search (SLSQP) from one starting point.  Runs in a pool worker.
+    :param args: (u0, bounds, objective, minQuality, tMargin)
+    :return: dict with the design found, its objective and the number of cycle evaluations used
+    '''
+    from scipy.optimize import minimize  # deferred so importing this module stays cheap
+    u0, bounds, objective, minQuality, tMargin = args
+    sc = _Scaling(bounds)
+    key = 'efficiency' if objective == 'efficiency' else 'net_work'
+    cache = {}
+    count = [0]
+
+    def evaluate(u):
+        k = tuple(np.round(u, 15))
+        if k not in cache:
+            x = sc.toDesign(u)
+            r = rankineBatch(x[0], x[1], x[2], gradient=True)
+            count[0] += 1
+            cache.clear()
+            cache[k] = (x, {n: np.nan_to_num(np.asarray(v), nan=0.0) for n, v in r.items()}, np.isnan(r['efficiency']))
+        return cache[k]
+
+    def f(u):
+        x, r, bad = evaluate(u)
+        return -float(r[key]) if not bad else 1e6
+
+    def df(u):
+        x, r, bad = evaluate(u)
+        return -r['d_' + key] * sc.chain(x)
+
+    cons = [{'type': 'ineq', 'fun': lambda u: float(evaluate(u)[1]['x2']) - minQuality,
+             'jac': lambda u: evaluate(u)[1]['d_x2'] * sc.chain(evaluate(u)[0])},
+            {'type': 'ineq', 'fun': lambda u: sc.toDesign(u)[2] - float(evaluate(u)[1]['Tsat_high']) - tMargin,
+             'jac': lambda u: (np.array([0.0, 0.0, 1.0]) - evaluate(u)[1]['d_Tsat_high']) * sc.chain(evaluate(u)[0])},
+            {'type': 'ineq', 'fun': lambda u: float(evaluate(u)[1]['Tmax_high']) - sc.toDesign(u)[2],
+             'jac': lambda u: (evaluate(u)[1]['d_Tmax_high'] - np.array([0.0, 0.0, 1.0])) * sc.chain(evaluate(u)[0])}]
+    res = minimize(f, u0, jac=df, method='SLSQP', bounds=[(0.0, 1.0)] * 3, constraints=cons,
+                   options={'maxiter': 100, 'ftol': 1e-10})
+    x, r, bad = evaluate(res.x)
+    feasible = (not bad) and r['x2'] >= minQuality - 1e-6 and x[2] >= r['Tsat_high'] + tMargin - 1e-6 \
+        and x[2] <= r['Tmax_high'] + 1e-6
+    return {'design': x, 'objective': float(r[key]) if not bad else np.nan, 'efficiency': float(r['efficiency']),
+            'net_work': float(r['net_work']), 'x2': float(r['x2']), 'feasible': bool(feasible),
+            'evaluations': count[0]}
+
+
+def _feasibleStarts(u0, bounds, tMargin, backend=None):
+    '''
+    Moves the starting points into the part of the box where the cycle is defined: the t_high coordinate of each
+    start is mapped onto [Tsat(p_high)+tMargin, Tmax(p_high)], clipped to the t_high bounds, so no local search
+    begins where rankineBatch() gives nan (and SLSQP would stop after one evaluation).  Starts at pressures
+    without such an interval are left as they are.
+    :param u0: (nStarts, 3) starting points in the unit cube
+    :return: the starting points, with t_high moved into the defined range
+    '''
+    sp = backend if backend is not None else getSpline()
+    sc = _Scaling(bounds)
+    ph = np.array([sc.toDesign(u)[1] for u in u0])
+    lo = np.maximum(sp.satDerivs(ph / 100)[0][0] + tMargin, bounds[2][0])
+    hi = np.minimum(sp.superTRange(ph / 100)[1], bounds[2][1])
+    ok = hi > lo
+    u = np.array(u0, dtype=float)
+    t = lo + u[:, 2] * (hi - lo)
+    u[ok, 2] = (t[ok] - sc.lo[2]) / sc.span[2]
+    return u
+
+
+class RankineOptimum():
+    """
+    The result of optimizeRankine().
+    """
+
+    def __init__(self, best, starts, evaluations, wallTime, objective):
+        '''
+        :param best: the best feasible local result
+        :param starts: all local results
+        :param evaluations: total number of cycle evaluations over all starts
+        :param wallTime: wall clock time in s
+        :param objective: 'efficiency' or 'net_work'
+        '''
+        self.p_low, self.p_high, self.t_high = (float(v) for v in best['design'])
+        self.efficiency = best['efficiency']
+        self.net_work = best['net_work']
+        self.x2 = best['x2']
+        self.objective = objective
+        self.starts = starts
+        self.evaluations = evaluations
+        self.wallTime = wallTime
+
+    def rankine(self, name='Optimized Rankine Cycle'):
+        '''
+        Builds a rankine object at the optimum, e.g. to print_summary() it.
+        :return: a rankine object
+        '''
+        from rankine import rankine
+        return rankine(self.p_low, self.p_high, self.t_high, name=name)
+
+    def print(self):
+        '''
+        Prints a short report of the optimum and the cost of finding it.
+        :return: nothing, just prints to screen
+        '''
+        print('Optimum ({}):'.format(self.objective))
+        print('\tp_low = {:0.2f} kPa, p_high = {:0.1f} kPa, t_high = {:0.1f} degrees C'.format(
+            self.p_low, self.p_high, self.t_high))
+        print('\tEfficiency: {:0.3f}%, Net Work: {:0.2f} kJ/kg, turbine exit x = {:0.4f}'.format(
+            self.efficiency, self.net_work, self.x2))
+        print('\t{} starts, {} cycle evaluations, {:0.3f} s'.format(len(self.starts), self.evaluations,
+                                                                   self.wallTime))
+
+
+def optimizeRankine(bounds=((6, 100), (1000, 20000), (200, 700)), objective='efficiency', minQuality=0.85,
+                    tMargin=1.0, nStarts=8, workers=None, seed=0):
+    '''
+    Finds the best operating point of the simple Rankine cycle over (p_low, p_high, t_high).  Several
+    gradient-based local searches are started from spread out points and run in parallel processes; every
+    worker evaluates the cycle with the spline surfaces, whose analytic derivatives give exact gradients.
+    :param bounds: ((p_low min, max) kPa, (p_high min, max) kPa, (t_high min, max) degrees C)
+    :param objective: 'efficiency' or 'net_work' (kJ/kg)
+    :param minQuality: minimum quality at the turbine exit
+    :param tMargin: minimum superheat of the turbine inlet above saturation in degrees C
+    :param nStarts: number of starting points
+    :param workers: number of worker processes (None: one per cpu, 1: run in this process)
+    :param seed: seed for the starting points
+    :return: a RankineOptimum object
+    '''
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    # stratified (latin hypercube) starting points in the unit cube
+    u0 = (np.argsort(rng.random((3, nStarts)), axis=1).T + rng.random((nStarts, 3))) / nStarts
+    u0 = _feasibleStarts(u0, bounds, tMargin)
+    jobs = [(u, bounds, objective, minQuality, tMargin) for u in u0]
+    workers = workers if workers is not None else min(nStarts, os.cpu_count() or 1)
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            starts = list(pool.map(_runStart, jobs))
+    else:
+        starts = [_runStart(j) for j in jobs]
+    feasible = [s for s in starts if s['feasible']] or starts
+    best = max(feasible, key=lambda s: -np.inf if np.isnan(s['objective']) else s['objective'])
+    return RankineOptimum(best, starts, sum(s['evaluations'] for s in starts), time.perf_counter() - t0, objective)
+
+
+def bruteForce(bounds=((6, 100), (1000, 20000), (200, 700)), objective='efficiency', minQuality=0.85,
+               tMargin=1.0, n=40):
+    '''
+    Grid search over the same space as optimizeRankine(), for comparison.
+    :param n: grid points along each variable
+    :return: (best design, best objective, number of cycle evaluations)
+    '''
+    sc = _Scaling(bounds)
+    g = np.linspace(0, 1, n)
+    U = np.stack(np.meshgrid(g, g, g, indexing='ij'), axis=-1).reshape(-1, 3)
+    X = np.array([sc.toDesign(u) for u in U])
+    r = rankineBatch(X[:, 0], X[:, 1], X[:, 2])
+    key = 'efficiency' if objective == 'efficiency' else 'net_work'
+    ok = (r['x2'] >= minQuality) & (X[:, 2] >= r['Tsat_high'] + tMargin) & (X[:, 2] <= r['Tmax_high']) \
+        & ~np.isnan(r[key])
+    k = np.flatnonzero(ok)[np.argmax(r[key][ok])]
+    return X[k], float(r[key][k]), len(X)
+
+
+def main():
+    '''
+    Optimizes the cycle and compares the cost against a brute-force grid.
+    :return: nothing, just prints to screen
+    '''
+    opt = optimizeRankine()
+    opt.print()
+    t0 = time.perf_counter()
+    x, best, nGrid = bruteForce()
+    print('Brute-force grid: efficiency {:0.3f}% at p_low = {:0.2f}, p_high = {:0.1f}, t_high = {:0.1f} '
+          'with {} cycle evaluations, {:0.3f} s'.format(best, x[0], x[1], x[2], nGrid, time.perf_counter() - t0))
+    print('Evaluations: {:0.0f}x fewer than the grid'.format(nGrid / opt.evaluations))
+    opt.rankine().print_summary()
+
+
+# endregion
+
+# region function calls
+if __name__ == "__main__":
+    main()
+# endregion
@@ -1,6 +1,9 @@
 # region imports
-import numpy as np
-from scipy.interpolate import griddata
+import os
+import sys
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from steam_tables import getBackend
 
 
 # endregion
@@ -11,13 +14,13 @@ class steam():
     The steam class is used to find thermodynamic properties of steam along an isobar.
     The Gibbs phase rule tells us we need two independent properties in order to find
     all the other thermodynamic properties. Hence, the constructor requires pressure of
-    the isobar and one other property.
+    the isobar and one other property, or else (pressure=None) h and s or T and s.
     """
 
     def __init__(self, pressure, T=None, x=None, v=None, h=None, s=None, name=None):
         '''
         Constructor for steam
-        :param pressure: pressure in kPa
+        :param pressure: pressure in kPa, or None when the state is given by (h, s) or (T, s)
         :param T: Temperature in degrees C
         :param x: quality of steam x=1 is saturated vapor, x=0 is saturated liquid
         :param v: specific volume in m^3/kg
@@ -47,23 +50,23 @@ class steam():
         us in the saturated or superheated region.
         :return: nothing returned, just set the properties
         '''
-        # Read in the thermodynamic data from files, skipping the first row (titles)
-        ts, ps, hfs, hgs, sfs, sgs, vfs, vgs = np.loadtxt('sat_water_table.txt', unpack=True,
-                                                          skiprows=1)  # Saturated properties
-        tcol, hcol, scol, pcol = np.loadtxt('superheated_water_table.txt', unpack=True,
-                                            skiprows=1)  # Superheated properties
+        # The tables are parsed (or memory mapped from the compiled bundle) once per process, see steam_tables
+        tables = getBackend()
+
+        if self.p is None:  # (h, s) or (T, s): one lookup in the inverse tables, see calcPairBatch
+            if self.s is None or (self.h is None) == (self.T is None):
+                raise ValueError('without a pressure, give s and one of h or T')
+            if self.h is not None:
+                self._assign(calcPairBatch('hs', self.h, self.s, tables))
+            else:
+                self._assign(calcPairBatch('Ts', self.T, self.s, tables))
+            return
 
         R = 8.314 / (18 / 1000)  # Ideal gas constant for water [J/(mol K)]/[kg/mol]
         Pbar = self.p / 100  # Pressure in bar - 1 bar = 100 kPa roughly
 
-        # Get saturated properties
-        Tsat = float(griddata((ps), ts, (Pbar)))  # Saturation temperature at P
-        hf = float(griddata((ps), hfs, (Pbar)))  # Enthalpy of saturated liquid
-        hg = float(griddata((ps), hgs, (Pbar)))  # Enthalpy of saturated vapor
-        sf = float(griddata((ps), sfs, (Pbar)))  # Entropy of saturated liquid
-        sg = float(griddata((ps), sgs, (Pbar)))  # Entropy of saturated vapor
-        vf = float(griddata((ps), vfs, (Pbar)))  # Specific volume of saturated liquid
-        vg = float(griddata((ps), vgs, (Pbar)))  # Specific volume of saturated vapor
+        # Get saturated properties: Tsat, hf, hg, sf, sg, vf, vg at P
+        Tsat, hf, hg, sf, sg, vf, vg = (float(v) for v in tables.sat(Pbar))
 
         self.hf = hf  # Saturated liquid enthalpy as a class member variable
 
@@ -71,8 +74,9 @@ class steam():
         if self.T is not None:
             if self.T > Tsat:  # Superheated steam
                 self.region = 'Superheated'
-                self.h = float(griddata((tcol, pcol), hcol, (self.T, Pbar)))  # Superheated enthalpy
-                self.s = float(griddata((tcol, pcol), scol, (self.T, Pbar)))  # Superheated entropy
+                h, s = tables.superTP(self.T, Pbar)
+                self.h = float(h)  # Superheated enthalpy
+                self.s = float(s)  # Superheated entropy
                 self.x = 1.0  # For superheated steam, x = 1
                 TK = self.T + 273.14  # Temperature conversion to Kelvin
                 self.v = R * TK / (self.p * 1000)  # Ideal gas approximation for specific volume
@@ -100,8 +104,9 @@ class steam():
                 self.v = vf + self.x * (vg - vf)
             else:  # Superheated steam
                 self.region = 'Superheated'
-                self.T = float(griddata((pcol, hcol), tcol, (Pbar, self.h), method='linear'))
-                self.s = float(griddata((pcol, hcol), scol, (Pbar, self.h), method='linear'))
+                T, s = tables.superPH(Pbar, self.h)
+                self.T = float(T)
+                self.s = float(s)
         elif self.s is not None:  # If entropy (s) is known
             self.x = (self.s - sf) / (sg - sf)  # Calculate quality (x)
             self.x = max(0.0, min(self.x, 1.0))  # Ensure quality is between 0 and 1
@@ -112,35 +117,168 @@ class steam():
                 self.v = vf + self.x * (vg - vf)
             else:  # Superheated steam
                 self.region = 'Superheated'
-                self.T = float(griddata((pcol, scol), tcol, (Pbar, self.s), method='linear'))
-                self.h = float(griddata((pcol, scol), hcol, (Pbar, self.s), method='linear'))
+                T, h = tables.superPS(Pbar, self.s)
+                self.T = float(T)
+                self.h = float(h)
+        elif self.v is not None:  # If specific volume (v) is known
+            self._assign(calcBatch(self.p, 'v', self.v, tables))
 
-    def print(self):
+    def _assign(self, state):
+        '''
+        Sets the properties from a single state computed by calcBatch or calcPairBatch.
+        :param state: dict of 0-d arrays
+        :return: nothing
+        '''
+        if state['h'] != state['h']:  # nan
+            raise ValueError('{} is outside of the steam tables'.format(self.name or 'the state'))
+        self.region = 'Superheated' if state['superheated'] else 'Saturated'
+        for k in ('p', 'T', 'x', 'v', 'h', 's', 'hf'):
+            if k in state:
+                setattr(self, k, float(state[k]))
+
+    def report(self):
         """
-        This prints a nicely formatted report of the steam properties.
-        :return: nothing, just prints to screen
+        A nicely formatted report of the steam properties, without printing it.
+        :return: the report as one string
         """
-        print('Name: ', self.name)
+        lines = ['Name:  {}'.format(self.name)]
         if self.x < 0.0:
-            print('Region: compressed liquid')
+            lines.append('Region: compressed liquid')
         else:
-            print('Region: ', self.region)
-        print('p = {:0.2f} kPa'.format(self.p))
+            lines.append('Region:  {}'.format(self.region))
+        lines.append('p = {:0.2f} kPa'.format(self.p))
         if self.x >= 0.0:
-            print('T = {:0.1f} degrees C'.format(self.T))
-        print('h = {:0.2f} kJ/kg'.format(self.h))
+            lines.append('T = {:0.1f} degrees C'.format(self.T))
+        lines.append('h = {:0.2f} kJ/kg'.format(self.h))
         if self.x >= 0.0:
-            print('s = {:0.4f} kJ/(kg K)'.format(self.s))
+            lines.append('s = {:0.4f} kJ/(kg K)'.format(self.s))
             if self.region == 'Saturated':
-                print('v = {:0.6f} m^3/kg'.format(self.v))
+                lines.append('v = {:0.6f} m^3/kg'.format(self.v))
             if self.region == 'Saturated':
-                print('x = {:0.4f}'.format(self.x))
-        print()
+                lines.append('x = {:0.4f}'.format(self.x))
+        return '\n'.join(lines) + '\n\n'
+
+    def print(self):
+        """
+        This prints a nicely formatted report of the steam properties.
+        :return: nothing, just prints to screen
+        """
+        sys.stdout.write(self.report())
 
 
 # endregion
 
 # region function definitions
+def calcBatch(pressure, kind, value, backend=None):
+    '''
+    Vectorized version of steam.calc() for many states given by the same kind of second property.  It follows
+    the same rules (and the same table lookups) as calc(), with one table call for the whole batch.
+    :param pressure: pressures in kPa (scalar or array)
+    :param kind: 'T', 'x', 'h', 's' or 'v', the second property that is given
+    :param value: values of that property (scalar or array)
+    :param backend: property backend (default: steam_tables.getBackend())
+    :return: dict of arrays T, x, v, h, s, hf, Tsat and superheated (bool).  States that calc() cannot handle
+             (a temperature at or below saturation, a volume below vf or one that the ideal gas law puts at or
+             below saturation) and superheated states outside of the table are nan and not superheated.
+    '''
+    import numpy as np
+    tables = backend if backend is not None else getBackend()
+    p, val = np.broadcast_arrays(np.asarray(pressure, dtype=float), np.asarray(value, dtype=float))
+    R = 8.314 / (18 / 1000)  # same ideal gas constant as calc()
+    Pbar = p / 100
+    Tsat, hf, hg, sf, sg, vf, vg = (np.asarray(c, dtype=float) for c in tables.sat(Pbar))
+    out = {'hf': hf, 'Tsat': Tsat, 'superheated': np.zeros(p.shape, bool)}
+    if kind == 'T':
+        h, s = (np.asarray(c, dtype=float) for c in tables.superTP(val, Pbar))
+        hot = (val > Tsat) & ~np.isnan(h)  # h is nan above saturation but outside of the table
+        out['superheated'] = hot
+        out['T'] = np.where(hot, val, np.nan)
+        out['x'] = np.where(hot, 1.0, np.nan)
+        out['h'] = np.where(hot, h, np.nan)
+        out['s'] = np.where(hot, s, np.nan)
+        out['v'] = np.where(hot, R * (val + 273.14) / (p * 1000), np.nan)
+        return out
+    if kind == 'v':
+        # two-phase between vf and vg, x linear in v; above vg the ideal gas law of calc() inverted for T
+        wet = (val >= vf) & (val <= vg)
+        T = val * p * 1000 / R - 273.14
+        h, s = (np.asarray(c, dtype=float) for c in tables.superTP(T, Pbar))
+        hot = (val > vg) & (T > Tsat) & ~np.isnan(h)
+        x = np.where(wet, (val - vf) / np.where(wet, vg - vf, 1.0), np.where(hot, 1.0, np.nan))
+        out['superheated'] = hot
+        out['x'] = x
+        out['T'] = np.where(wet, Tsat, np.where(hot, T, np.nan))
+        out['h'] = np.where(wet, hf + x * (hg - hf), np.where(hot, h, np.nan))
+        out['s'] = np.where(wet, sf + x * (sg - sf), np.where(hot, s, np.nan))
+        out['v'] = np.where(wet | hot, val, np.nan)
+        return out
+    if kind == 'x':
+        x = val
+    elif kind == 'h':
+        x = np.clip((val - hf) / (hg - hf), 0.0, 1.0)
+    elif kind == 's':
+        x = np.clip((val - sf) / (sg - sf), 0.0, 1.0)
+    else:
+        raise ValueError('unknown property ' + str(kind))
+    out['x'] = x
+    out['T'] = Tsat
+    out['h'] = val if kind == 'h' else hf + x * (hg - hf)
+    out['s'] = val if kind == 's' else sf + x * (sg - sf)
+    out['v'] = vf + x * (vg - vf)
+    return out
+
+
+def calcPairBatch(pair, value, s, backend=None):
+    '''
+    Vectorized states from a pair of properties without the pressure: (h, s) or (T, s).  Each state takes one
+    indexed lookup in the inverse structures of steam_tables instead of a root find around forward lookups: in
+    the two-phase dome the ordered tie lines (isobars) give the interval of the saturated table, or the table
+    is inverted by T, and superheated states come from the (T, p) triangulation mapped onto (h, s) or (T, s).
+    Pressures are returned in the units that calc() uses for them, so steam(p, T=T) gives the state back.
+    :param pair: 'hs' or 'Ts'
+    :param value: h in kJ/kg or T in C (scalar or array)
+    :param s: entropy in kJ/(kg K) (scalar or array)
+    :param backend: property backend (default: steam_tables.getBackend()); backends that resample the tables
+                    are inverted through their reference tables
+    :return: dict of arrays p, T, x, v, h, s, hf and superheated (bool).  Compressed liquid and states outside
+             of the tables are nan.
+    '''
+    import numpy as np
+    tables = backend if backend is not None else getBackend()
+    tables = getattr(tables, 'reference', tables)
+    val, s = np.broadcast_arrays(np.asarray(value, dtype=float), np.asarray(s, dtype=float))
+    R = 8.314 / (18 / 1000)  # same ideal gas constant as calc()
+    if pair == 'hs':
+        h = val
+        Pbar = np.where(h > tables.vaporLine(s) + 1e-9 * np.abs(h), np.nan, tables.wetHS(h, s))  # x=1 on the line
+        Tsat, hf, hg, sf, sg, vf, vg = (np.asarray(c, dtype=float) for c in tables.sat(Pbar))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = (s - sf) / (sg - sf)
+        wet = (x >= -1e-9) & (x <= 1 + 1e-9)  # a tie line through a compressed liquid state ends before it
+        T, pHot = (np.asarray(c, dtype=float) for c in tables.superHS(h, s))
+        hot = ~wet & ~np.isnan(T)
+        x = np.where(wet, np.clip(x, 0.0, 1.0), np.where(hot, 1.0, np.nan))
+        T = np.where(wet, Tsat, T)
+    elif pair == 'Ts':
+        T = val
+        Pbar, hf, hg, sf, sg, vf, vg = (np.asarray(c, dtype=float) for c in tables.satT(T))
+        wet = (s >= sf) & (s <= sg)
+        hot = (s > sg) | (T > tables.ts.max())
+        x = np.where(wet, (s - sf) / np.where(wet, sg - sf, 1.0), np.where(hot, 1.0, np.nan))
+        pHot, h = (np.asarray(c, dtype=float) for c in tables.superTS(T, s))
+        h = np.where(wet, hf + x * (hg - hf), h)
+    else:
+        raise ValueError('unknown property pair ' + str(pair))
+    hot &= ~(np.isnan(T) | np.isnan(h))  # superheated, but outside of the table
+    ok = wet | hot
+    p = np.where(wet, 100 * Pbar, np.where(hot, 100 * pHot, np.nan))
+    out = {'p': p, 'superheated': hot}
+    out.update({k: np.where(ok, c, np.nan) for k, c in (('T', T), ('x', x), ('h', h), ('s', s))})
+    out['v'] = np.where(wet, vf + x * (vg - vf), R * (T + 273.14) / (p * 1000))
+    out['hf'] = np.where(wet, hf, np.asarray(tables.sat(p / 100)[1], dtype=float))
+    return out
+
+
 def main():
     inlet = steam(7350, name='Turbine Inlet')  # Not enough information to calculate
     inlet.x = 0.9  # 90 percent quality
@@ -0,0 +1,235 @@
+# region imports
+import os
+import sys
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from steam_tables import loadTables, setBackend
+
+
+# endregion
+
+# region class definitions
+class UniformGrid():
+    """
+    Values of one or more properties sampled on a uniform (log p) x (second property) grid.  Lookups compute
+    the cell index directly and interpolate bilinearly, so the cost does not depend on the size of the table.
+    """
+
+    def __init__(self, lpAxis, xAxis, values, valid, dtype=np.float64):
+        '''
+        Constructor for UniformGrid
+        :param lpAxis: uniformly spaced log pressures
+        :param xAxis: uniformly spaced values of the second property
+        :param values: list of (len(lpAxis), len(xAxis)) arrays of sampled properties (gaps already filled)
+        :param valid: boolean (len(lpAxis), len(xAxis)) array, False where the reference gave nan
+        :param dtype: storage type of the sampled values (np.float32 or np.float64)
+        '''
+        self.lp0, self.dlp, self.nlp = lpAxis[0], lpAxis[1] - lpAxis[0], len(lpAxis)
+        self.x0, self.dx, self.nx = xAxis[0], xAxis[1] - xAxis[0], len(xAxis)
+        self.values = [np.ascontiguousarray(v, dtype=dtype) for v in values]
+        # a cell is only usable if at least one of its corners was inside of the table's hull
+        v = valid
+        self.cellValid = v[:-1, :-1] | v[1:, :-1] | v[:-1, 1:] | v[1:, 1:]
+
+    def __call__(self, p, x):
+        '''
+        Bilinear interpolation of every stored property.
+        :param p: pressures (scalar or array, same units as the table)
+        :param x: values of the second property
+        :return: list of interpolated arrays, nan outside of the grid or the table's hull
+        '''
+        p, x = np.broadcast_arrays(np.asarray(p, dtype=float), np.asarray(x, dtype=float))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = (np.log(p) - self.lp0) / self.dlp
+        w = (x - self.x0) / self.dx
+        inside = (u >= 0) & (u <= self.nlp - 1) & (w >= 0) & (w <= self.nx - 1)
+        i = np.clip(np.floor(np.nan_to_num(u)).astype(int), 0, self.nlp - 2)
+        j = np.clip(np.floor(np.nan_to_num(w)).astype(int), 0, self.nx - 2)
+        tu = u - i
+        tw = w - j
+        ok = inside & self.cellValid[i, j]
+        out = []
+        for v in self.values:
+            r = ((1 - tu) * ((1 - tw) * v[i, j] + tw * v[i, j + 1]) +
+                 tu * ((1 - tw) * v[i + 1, j] + tw * v[i + 1, j + 1]))
+            out.append(np.where(ok, r, np.nan))
+        return out
+
+
+class GridTables():
+    """
+    A high-speed stand-in for steam_tables.SteamTables.  The saturation line and the three superheated
+    surfaces are resampled once onto uniform grids in log pressure, and every lookup is then O(1).  The
+    methods have the same signatures as SteamTables, so steam() can use either one (see enableGridMode).
+    """
+
+    def __init__(self, reference=None, nP=256, nX=256, nSat=2048, dtype=np.float64):
+        '''
+        Constructor for GridTables
+        :param reference: the SteamTables object to resample (default: loadTables())
+        :param nP: number of log-pressure grid lines for the superheated surfaces
+        :param nX: number of grid lines for T, h or s on the superheated surfaces
+        :param nSat: number of log-pressure points along the saturation line
+        :param dtype: storage type, np.float32 halves the memory at the cost of accuracy
+        '''
+        self.reference = reference if reference is not None else loadTables()
+        self.dtype = dtype
+        ref = self.reference
+        # saturation line, one-dimensional in log p
+        lps = np.linspace(np.log(ref.ps[0]), np.log(ref.ps[-1]), nSat)
+        sat = ref.sat(np.exp(lps))
+        self.satGrid = UniformGrid(lps, np.array([0.0, 1.0]), [np.column_stack((c, c)) for c in sat],
+                                   np.ones((nSat, 2), bool), dtype)
+        # superheated surfaces
+        lp = np.linspace(np.log(np.min(ref.pcol)), np.log(np.max(ref.pcol)), nP)
+        self.TP = self._resample(lp, ref.tcol, nX, lambda p, x: ref.superTP(x, p))
+        self.PH = self._resample(lp, ref.hcol, nX, ref.superPH)
+        self.PS = self._resample(lp, ref.scol, nX, ref.superPS)
+        self.maxError = self.errorReport()
+
+    def _resample(self, lp, col, nX, lookup):
+        '''
+        Samples a reference surface on a uniform grid.  Grid nodes outside of the table's hull are filled by
+        linear extrapolation along the second axis, so the cells cut by the hull still interpolate smoothly.
+        :param lp: log-pressure axis
+        :param col: the table column that becomes the second axis
+        :param nX: number of grid lines on the second axis
+        :param lookup: reference lookup f(p, x) returning a pair of arrays
+        :return: a UniformGrid object
+        '''
+        x = np.linspace(np.min(col), np.max(col), nX)
+        P, X = np.meshgrid(np.exp(lp), x, indexing='ij')
+        vals = [np.asarray(v).reshape(P.shape) for v in lookup(P.ravel(), X.ravel())]
+        valid = ~np.isnan(vals[0])
+        filled = []
+        for v in vals:
+            v = v.copy()
+            for row, ok in zip(v, valid):
+                k = np.flatnonzero(ok)
+                if len(k) == 0:
+                    continue
+                if len(k) == 1:
+                    row[~ok] = row[k[0]]
+                    continue
+                # extend the first and last valid segments of the row
+                lo, hi = k[0], k[-1]
+                k1, k2 = k[1], k[-2]
+                row[:lo] = row[lo] + (np.arange(lo) - lo) * (row[k1] - row[lo]) / (k1 - lo)
+                row[hi + 1:] = row[hi] + (np.arange(hi + 1, len(row)) - hi) * (row[hi] - row[k2]) / (hi - k2)
+                gaps = ~ok & (np.arange(len(row)) > lo) & (np.arange(len(row)) < hi)
+                row[gaps] = np.interp(np.flatnonzero(gaps), k, row[k])
+            filled.append(v)
+        return UniformGrid(lp, x, filled, valid, self.dtype)
+
+    def errorReport(self, nSamples=20000, seed=0):
+        '''
+        Compares the grid lookups against the reference interpolation at random points inside of the tables.
+        :param nSamples: number of random points for each surface
+        :param seed: seed for the random points
+        :return: dict of the maximum absolute error for each (surface, property)
+        '''
+        rng = np.random.default_rng(seed)
+        ref = self.reference
+        err = {}
+        p = np.exp(rng.uniform(np.log(ref.ps[0]), np.log(ref.ps[-1]), nSamples))
+        names = ('Tsat', 'hf', 'hg', 'sf', 'sg', 'vf', 'vg')
+        for n, a, b in zip(names, ref.sat(p), self.sat(p)):
+            err[('sat', n)] = float(np.nanmax(np.abs(a - b)))
+        p = np.exp(rng.uniform(np.log(np.min(ref.pcol)), np.log(np.max(ref.pcol)), nSamples))
+        for key, col, names, fr, fg in (('TP', ref.tcol, ('h', 's'), ref.superTP, self.superTP),
+                                        ('PH', ref.hcol, ('T', 's'), ref.superPH, self.superPH),
+                                        ('PS', ref.scol, ('T', 'h'), ref.superPS, self.superPS)):
+            x = rng.uniform(np.min(col), np.max(col), nSamples)
+            a = fr(x, p) if key == 'TP' else fr(p, x)
+            b = fg(x, p) if key == 'TP' else fg(p, x)
+            for n, ra, gb in zip(names, a, b):
+                both = ~np.isnan(ra) & ~np.isnan(gb)
+                err[(key, n)] = float(np.max(np.abs(ra[both] - gb[both]))) if both.any() else 0.0
+        return err
+
+    def sat(self, Pbar):
+        '''
+        Saturated properties along the saturation line.
+        :param Pbar: pressure in bar
+        :return: (Tsat, hf, hg, sf, sg, vf, vg)
+        '''
+        return tuple(self.satGrid(Pbar, 0.0))
+
+    def superTP(self, T, Pbar):
+        '''
+        Superheated properties from temperature and pressure.
+        :return: (h, s)
+        '''
+        return tuple(self.TP(Pbar, T))
+
+    def superPH(self, Pbar, h):
+        '''
+        Superheated properties from pressure and enthalpy.
+        :return: (T, s)
+        '''
+        return tuple(self.PH(Pbar, h))
+
+    def superPS(self, Pbar, s):
+        '''
+        Superheated properties from pressure and entropy.
+        :return: (T, h)
+        '''
+        return tuple(self.PS(Pbar, s))
+
+
+# endregion
+
+# region function definitions
+def enableGridMode(nP=256, nX=256, nSat=2048, dtype=np.float64):
+    '''
+    Switches every steam() calculation in this process to the resampled uniform grids.
+    :return: the GridTables object now in use (see its maxError for the accuracy)
+    '''
+    grid = GridTables(loadTables(), nP, nX, nSat, dtype)
+    setBackend(grid)
+    return grid
+
+
+def disableGridMode():
+    '''
+    Switches steam() back to the reference interpolation of the tables.
+    :return: nothing
+    '''
+    setBackend(None)
+
+
+def main():
+    '''
+    Builds the grids at a few resolutions and reports their accuracy and lookup speed.
+    :return: nothing, just prints to screen
+    '''
+    import time
+    ref = loadTables()
+    rng = np.random.default_rng(1)
+    n = 20000
+    T = rng.uniform(100, 600, n)
+    p = np.exp(rng.uniform(np.log(10), np.log(20000), n))
+    t0 = time.perf_counter()
+    ref.superTP(T, p)
+    tRef = time.perf_counter() - t0
+    print('reference superTP: {:0.2f} us/lookup'.format(1e6 * tRef / n))
+    for res, dtype in ((128, np.float64), (256, np.float64), (512, np.float64), (512, np.float32)):
+        t0 = time.perf_counter()
+        g = GridTables(ref, res, res, dtype=dtype)
+        tBuild = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        g.superTP(T, p)
+        tGrid = time.perf_counter() - t0
+        worst = max(g.maxError.items(), key=lambda kv: kv[1])
+        print('{}x{} {}: build {:0.2f} s, {:0.3f} us/lookup, max |h err| {:0.3g}, max |s err| {:0.3g}, '
+              'largest {} {:0.3g}'.format(res, res, np.dtype(dtype).name, tBuild, 1e6 * tGrid / n,
+                                         g.maxError[('TP', 'h')], g.maxError[('TP', 's')], worst[0], worst[1]))
+
+
+# endregion
+
+# region function calls
+if __name__ == "__main__":
+    main()
+# endregion
@@ -0,0 +1,311 @@
+# region imports
+import os
+import sys
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from steam_tables import loadTables, setBackend
+
+
+# endregion
+
+# region function definitions
+def pchipSlopes(x, y):
+    '''
+    Shape preserving (Fritsch-Carlson) slopes for a monotone piecewise cubic Hermite interpolant.
+    :param x: increasing node locations
+    :param y: node values
+    :return: slopes dy/dx at the nodes
+    '''
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    d = np.zeros_like(y)
+    if len(x) == 2:
+        d[:] = delta[0]
+        return d
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same = delta[:-1] * delta[1:] > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d[1:-1] = np.where(same, (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:]), 0.0)
+    for e, (h0, h1, d0, d1) in ((0, (h[0], h[1], delta[0], delta[1])), (-1, (h[-1], h[-2], delta[-1], delta[-2]))):
+        de = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        if np.sign(de) != np.sign(d0):
+            de = 0.0
+        elif np.sign(d0) != np.sign(d1) and abs(de) > abs(3 * d0):
+            de = 3 * d0
+        d[e] = de
+    return d
+
+
+def threePointSlopes(x):
+    '''
+    The linear operator that maps node values to three-point (parabolic) slope estimates.  Because it is linear
+    the derivative of the resulting Hermite interpolant with respect to the data is just the same interpolant,
+    which keeps the cross-isobar derivatives exact.
+    :param x: increasing node locations
+    :return: (n,n) matrix S so that slopes = S @ y
+    '''
+    n = len(x)
+    h = np.diff(x)
+    S = np.zeros((n, n))
+    for k in range(1, n - 1):
+        a, b = h[k - 1], h[k]
+        S[k, k - 1] = -b / (a * (a + b))
+        S[k, k] = (b - a) / (a * b)
+        S[k, k + 1] = a / (b * (a + b))
+    for e, i0, i1, i2, s in ((0, 0, 1, 2, 1.0), (n - 1, n - 1, n - 2, n - 3, -1.0)):
+        a, b = abs(x[i1] - x[i0]), abs(x[i2] - x[i1])
+        S[e, i0] = s * -(2 * a + b) / (a * (a + b))
+        S[e, i1] = s * (a + b) / (a * b)
+        S[e, i2] = s * -a / (b * (a + b))
+    return S
+
+
+def hermite(x, y, d, xq, i=None):
+    '''
+    Evaluates a cubic Hermite interpolant and its derivative.  Outside of the nodes it continues linearly with
+    the end slope.  y and d may carry extra trailing dimensions, one column per query point.
+    :param x: increasing node locations (n,)
+    :param y: node values, (n,) or (n, len(xq))
+    :param d: node slopes, same shape as y
+    :param xq: query locations
+    :param i: optional precomputed interval index of each query point
+    :return: (values, derivatives) at xq
+    '''
+    xq = np.asarray(xq, dtype=float)
+    if i is None:
+        i = np.clip(np.searchsorted(x, xq) - 1, 0, len(x) - 2)
+    h = x[i + 1] - x[i]
+    t = np.clip((xq - x[i]) / h, 0.0, 1.0)
+    if y.ndim == 1:
+        y0, y1, d0, d1 = y[i], y[i + 1], d[i], d[i + 1]
+    else:
+        cols = np.arange(y.shape[1])
+        y0, y1, d0, d1 = y[i, cols], y[i + 1, cols], d[i, cols], d[i + 1, cols]
+    t2, t3 = t * t, t * t * t
+    val = (2*t3 - 3*t2 + 1)*y0 + (t3 - 2*t2 + t)*h*d0 + (-2*t3 + 3*t2)*y1 + (t3 - t2)*h*d1
+    der = ((6*t2 - 6*t)*y0 + (3*t2 - 4*t + 1)*h*d0 + (-6*t2 + 6*t)*y1 + (3*t2 - 2*t)*h*d1) / h
+    # linear continuation beyond the end nodes
+    lo, hi = xq < x[0], xq > x[-1]
+    val = np.where(lo, y0 + d0 * (xq - x[0]), np.where(hi, y1 + d1 * (xq - x[-1]), val))
+    der = np.where(lo, d0, np.where(hi, d1, der))
+    return val, der
+
+
+def hullEnvelope(x, y, upper=True):
+    '''
+    The upper (or lower) boundary of the convex hull of the points (x, y), as a piecewise linear function of x.
+    :param x: point locations
+    :param y: point values
+    :param upper: True for the upper envelope, False for the lower one
+    :return: (xs, ys) vertices of the envelope, increasing in x
+    '''
+    sgn = 1.0 if upper else -1.0
+    hull = []
+    for px, py in sorted(zip(x, sgn * np.asarray(y))):
+        while len(hull) >= 2 and ((hull[-1][0] - hull[-2][0]) * (py - hull[-2][1]) -
+                                  (hull[-1][1] - hull[-2][1]) * (px - hull[-2][0])) >= 0:
+            hull.pop()
+        hull.append((px, py))
+    xs, ys = np.array(hull).T
+    return xs, sgn * ys
+
+
+# endregion
+
+# region class definitions
+class SplineTables():
+    """
+    Smooth property surfaces fitted once to the steam tables, with analytic first derivatives.
+    Each superheated isobar is a monotone (PCHIP) cubic in T, and the isobars are blended with a C1 cubic
+    Hermite in log p.  The saturation line is a PCHIP in log p.  Everything is evaluated in vectorized calls,
+    and the sat/superTP/superPH/superPS methods match steam_tables.SteamTables so steam() can use it too.
+    """
+
+    def __init__(self, reference=None):
+        '''
+        Constructor for SplineTables
+        :param reference: the SteamTables object to fit (default: loadTables())
+        '''
+        self.reference = reference if reference is not None else loadTables()
+        ref = self.reference
+        # saturation line in log p
+        self.lps = np.log(np.asarray(ref.ps, dtype=float))
+        self.satY = [np.asarray(c, dtype=float) for c in (ref.ts, ref.hfs, ref.hgs, ref.sfs, ref.sgs, ref.vfs, ref.vgs)]
+        self.satD = [pchipSlopes(self.lps, c) for c in self.satY]
+        # superheated isobars, each one sorted by temperature
+        pcol, tcol = np.asarray(ref.pcol, dtype=float), np.asarray(ref.tcol, dtype=float)
+        self.pIso = np.unique(pcol)
+        self.lpIso = np.log(self.pIso)
+        self.iso = []
+        for p in self.pIso:
+            k = np.flatnonzero(pcol == p)
+            k = k[np.argsort(tcol[k])]
+            T = tcol[k]
+            h, s = np.asarray(ref.hcol, dtype=float)[k], np.asarray(ref.scol, dtype=float)[k]
+            self.iso.append((T, h, pchipSlopes(T, h), s, pchipSlopes(T, s)))
+        # the (T, p) region covered by the table is the convex hull of its points, the same as for griddata.
+        # Shorter isobars continue linearly up to the hull.
+        self.loEnv = hullEnvelope(self.pIso, [i[0][0] for i in self.iso], upper=False)
+        self.hiEnv = hullEnvelope(self.pIso, [i[0][-1] for i in self.iso], upper=True)
+        self.S = threePointSlopes(self.lpIso)
+
+    def satDerivs(self, Pbar):
+        '''
+        Saturated properties and their derivatives with respect to pressure.
+        :param Pbar: pressure in bar
+        :return: (values, d/dp) where each is a tuple (Tsat, hf, hg, sf, sg, vf, vg); nan outside of the table
+        '''
+        p = np.asarray(Pbar, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lp = np.log(p)
+        out = (lp < self.lps[0]) | (lp > self.lps[-1]) | np.isnan(lp)
+        i = np.clip(np.searchsorted(self.lps, lp) - 1, 0, len(self.lps) - 2)
+        vals, ders = [], []
+        for y, d in zip(self.satY, self.satD):
+            v, dv = hermite(self.lps, y, d, lp, i)
+            vals.append(np.where(out, np.nan, v))
+            ders.append(np.where(out, np.nan, dv / p))
+        return tuple(vals), tuple(ders)
+
+    def sat(self, Pbar):
+        '''
+        Saturated properties along the saturation line.
+        :param Pbar: pressure in bar
+        :return: (Tsat, hf, hg, sf, sg, vf, vg)
+        '''
+        return self.satDerivs(Pbar)[0]
+
+    def superTPDerivs(self, T, Pbar):
+        '''
+        Superheated enthalpy and entropy with their first derivatives, e.g. cp = dh/dT at constant p.
+        :param T: temperature in degrees C
+        :param Pbar: pressure, in the units of the superheated table column
+        :return: (h, s, dh/dT, dh/dp, ds/dT, ds/dp); nan outside of the table
+        '''
+        T, p = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(Pbar, dtype=float))
+        shape = T.shape
+        T, p = T.ravel(), p.ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lp = np.log(p)
+        # every isobar at every query temperature, and the slopes across the isobars
+        n = len(self.iso)
+        Y = np.empty((4, n, len(T)))
+        for k, (Ti, h, dh, s, ds) in enumerate(self.iso):
+            Y[0, k], Y[1, k] = hermite(Ti, h, dh, T)
+            Y[2, k], Y[3, k] = hermite(Ti, s, ds, T)
+        i = np.clip(np.searchsorted(self.lpIso, lp) - 1, 0, n - 2)
+        res = [hermite(self.lpIso, Yk, self.S @ Yk, lp, i) for Yk in Y]
+        h, dhdlp = res[0]
+        dhdT = res[1][0]
+        s, dsdlp = res[2]
+        dsdT = res[3][0]
+        # the part of the (T, p) plane that the table covers
+        Tlo, Thi = self.superTRange(p)[:2]
+        out = ~(T >= Tlo) | ~(T <= Thi)
+        res = (h, s, dhdT, dhdlp / p, dsdT, dsdlp / p)
+        return tuple(np.where(out, np.nan, r).reshape(shape) for r in res)
+
+    def superTP(self, T, Pbar):
+        '''
+        Superheated properties from temperature and pressure.
+        :return: (h, s)
+        '''
+        return self.superTPDerivs(T, Pbar)[:2]
+
+    def superTRange(self, Pbar):
+        '''
+        The range of temperatures the superheated table covers at a pressure (nan outside of the pressures).
+        :param Pbar: pressure, in the units of the superheated table column
+        :return: (Tmin, Tmax, dTmin/dp, dTmax/dp)
+        '''
+        p = np.asarray(Pbar, dtype=float)
+        res = []
+        for xs, ys in (self.loEnv, self.hiEnv):
+            i = np.clip(np.searchsorted(xs, p) - 1, 0, len(xs) - 2)
+            slope = (ys[i + 1] - ys[i]) / (xs[i + 1] - xs[i])
+            res.append(np.where((p < xs[0]) | (p > xs[-1]), np.nan, ys[i] + slope * (p - xs[i])))
+            res.append(slope)
+        return res[0], res[2], res[1], res[3]
+
+    def _invertT(self, Pbar, target, col, iterations=4):
+        '''
+        Solves h(T, p) = target or s(T, p) = target for T with Newton's method on the analytic dT derivative.
+        The reference triangulation supplies the starting guess, so a few iterations are plenty.
+        :param Pbar: pressure
+        :param target: the known enthalpy or entropy
+        :param col: 0 to match h, 1 to match s
+        :return: (T, all of superTPDerivs at T)
+        '''
+        lookup = self.reference.superPH if col == 0 else self.reference.superPS
+        T = np.asarray(lookup(Pbar, target)[0], dtype=float)
+        for _ in range(iterations):
+            d = self.superTPDerivs(T, Pbar)
+            T = T - (d[col] - target) / d[2 + 2 * col]
+        return T, self.superTPDerivs(T, Pbar)
+
+    def superPH(self, Pbar, h):
+        '''
+        Superheated properties from pressure and enthalpy.
+        :return: (T, s)
+        '''
+        T, d = self._invertT(Pbar, h, 0)
+        return T, d[1]
+
+    def superPS(self, Pbar, s):
+        '''
+        Superheated properties from pressure and entropy.
+        :return: (T, h)
+        '''
+        T, d = self._invertT(Pbar, s, 1)
+        return T, d[0]
+
+
+# endregion
+
+# region function definitions
+def enableSplineMode():
+    '''
+    Switches every steam() calculation in this process to the spline surfaces.
+    :return: the SplineTables object now in use
+    '''
+    spline = SplineTables(loadTables())
+    setBackend(spline)
+    return spline
+
+
+def main():
+    '''
+    Compares the analytic derivatives against central differences of the spline surfaces and reports how the
+    spline values compare with the reference interpolation.
+    :return: nothing, just prints to screen
+    '''
+    sp = SplineTables()
+    T = np.array([150.0, 300.0, 450.0, 600.0])
+    p = np.array([100.0, 1000.0, 4000.0, 10000.0])
+    h, s, dhdT, dhdp, dsdT, dsdp = sp.superTPDerivs(T, p)
+    e = 1e-3
+    fdT = (sp.superTP(T + e, p)[0] - sp.superTP(T - e, p)[0]) / (2 * e)
+    fdp = (sp.superTP(T, p * (1 + e))[1] - sp.superTP(T, p * (1 - e))[1]) / (2 * e * p)
+    for k in range(len(T)):
+        print('T={:5.0f} p={:7.0f}: h={:8.2f} cp={:6.4f} (fd {:6.4f})  ds/dp={:10.3e} (fd {:10.3e})'.format(
+            T[k], p[k], h[k], dhdT[k], fdT[k], dsdp[k], fdp[k]))
+    ref = sp.reference
+    rng = np.random.default_rng(0)
+    Tq = rng.uniform(50, 800, 20000)
+    pq = np.exp(rng.uniform(np.log(6), np.log(32000), 20000))
+    a, b = ref.superTP(Tq, pq)[0], sp.superTP(Tq, pq)[0]
+    # compare above the saturated end of the isobars, where the table actually has data
+    Tsat = np.interp(np.log(pq), sp.lpIso, [i[0][0] for i in sp.iso])
+    both = ~np.isnan(a) & ~np.isnan(b) & (Tq >= Tsat)
+    print('spline vs reference h: median |diff| {:0.3f} kJ/kg, max {:0.3f} kJ/kg over {} points'.format(
+        np.median(np.abs(a - b)[both]), np.max(np.abs(a - b)[both]), both.sum()))
+
+
+# endregion
+
+# region function calls
+if __name__ == "__main__":
+    main()
+# endregion
@@ -0,0 +1,459 @@
+# region imports
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from kernels import interpColumns, triInterp, triLocate
+
+
+# endregion
+
+# region globals
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAT_FILE = os.path.join(HERE, 'sat_water_table.txt')  # saturated table, pressure in bar
+SUPER_FILE = os.path.join(HERE, 'superheated_water_table.txt')  # superheated table
+CACHE_DIR = os.path.join(HERE, 'steam_tables_cache')  # where the compiled bundle lives
+FORMAT_VERSION = 2  # bump when the layout of the bundle changes
+SAT_COLUMNS = ('ts', 'ps', 'hfs', 'hgs', 'sfs', 'sgs', 'vfs', 'vgs')
+SUPER_COLUMNS = ('tcol', 'hcol', 'scol', 'pcol')
+# the scattered superheated table is interpolated over three pairs of columns
+TRIANGULATIONS = {'TP': ('tcol', 'pcol'), 'PH': ('pcol', 'hcol'), 'PS': ('pcol', 'scol')}
+# the (T, p) triangulation mapped onto other pairs of columns: on each triangle the (T, p) interpolation is
+# linear, so its image is the exact inverse of superTP for that pair
+INVERSE_MESHES = {'HS': ('hcol', 'scol'), 'TS': ('tcol', 'scol')}
+MESHES = tuple(TRIANGULATIONS) + tuple(INVERSE_MESHES)  # everything that goes into the bundle
+
+_tables = None  # the tables for this process, see loadTables()
+_backend = None  # optional replacement for the tables used by steam(), see setBackend()
+
+
+# endregion
+
+# region class definitions
+class TriInterp():
+    """
+    Piecewise-linear interpolation over a Delaunay triangulation of scattered points.  This gives the same
+    answer as griddata(..., method='linear') but the triangulation is built once and only numpy is needed
+    to evaluate it, so it can be stored in the compiled bundle.
+    """
+
+    def __init__(self, points, simplices, transform):
+        '''
+        Constructor for TriInterp
+        :param points: (n,2) array of data locations
+        :param simplices: (m,3) array of point indices for each triangle
+        :param transform: (m,3,2) barycentric transforms of the triangles (see scipy's Delaunay.transform)
+        '''
+        self.points = points
+        self.simplices = simplices
+        self.transform = transform
+
+    @classmethod
+    def build(cls, x, y):
+        '''
+        Triangulates the points (x, y) with qhull, just like griddata does internally.
+        :param x: first coordinate of the data
+        :param y: second coordinate of the data
+        :return: a TriInterp object
+        '''
+        from scipy.spatial import Delaunay  # only needed when there is no compiled bundle
+        tri = Delaunay(np.column_stack((x, y)))
+        return cls(tri.points, tri.simplices, tri.transform)
+
+    @classmethod
+    def fromMesh(cls, x, y, simplices):
+        '''
+        Uses a given triangulation of the points (x, y) instead of the Delaunay one, e.g. the triangles of
+        another TriInterp carried over to other coordinates of the same points.  Degenerate triangles are
+        dropped.
+        :param x: first coordinate of the data
+        :param y: second coordinate of the data
+        :param simplices: (m,3) array of point indices for each triangle
+        :return: a TriInterp object
+        '''
+        points = np.column_stack((x, y)).astype(float)
+        r = points[simplices]
+        A = np.stack((r[:, 0] - r[:, 2], r[:, 1] - r[:, 2]), axis=-1)  # columns are the edges to the last vertex
+        det = A[:, 0, 0] * A[:, 1, 1] - A[:, 0, 1] * A[:, 1, 0]
+        scale = np.abs(A).max(axis=(1, 2))**2
+        keep = np.abs(det) > 1e-12 * scale
+        A, simplices = A[keep], simplices[keep]
+        transform = np.empty((len(simplices), 3, 2))
+        transform[:, :2] = np.linalg.inv(A)
+        transform[:, 2] = r[keep, 2]
+        return cls(points, np.ascontiguousarray(simplices), transform)
+
+    def _buildIndex(self, nBins=32):
+        '''
+        Buckets the triangles on a grid whose lines sit at quantiles of the data, so that each query point
+        only has to be tested against the few triangles that overlap its bucket.
+        :param nBins: number of buckets along each axis
+        :return: nothing
+        '''
+        px, py = self.points[:, 0], self.points[:, 1]
+        self._ex = np.unique(np.quantile(px, np.linspace(0, 1, nBins + 1)))
+        self._ey = np.unique(np.quantile(py, np.linspace(0, 1, nBins + 1)))
+        nx, ny = len(self._ex) - 1, len(self._ey) - 1
+        tx, ty = px[self.simplices], py[self.simplices]
+        # bucket ranges covered by each triangle's bounding box (one extra bucket each way to be safe)
+        i0 = np.clip(np.searchsorted(self._ex, tx.min(axis=1), 'right') - 2, 0, nx - 1)
+        i1 = np.clip(np.searchsorted(self._ex, tx.max(axis=1), 'left'), 0, nx - 1)
+        j0 = np.clip(np.searchsorted(self._ey, ty.min(axis=1), 'right') - 2, 0, ny - 1)
+        j1 = np.clip(np.searchsorted(self._ey, ty.max(axis=1), 'left'), 0, ny - 1)
+        buckets = [[] for _ in range(nx * ny)]
+        for t in range(len(self.simplices)):
+            for i in range(i0[t], i1[t] + 1):
+                for j in range(j0[t], j1[t] + 1):
+                    buckets[i * ny + j].append(t)
+        self._cand = np.full((nx * ny, max(len(b) for b in buckets)), -1)
+        for k, b in enumerate(buckets):
+            self._cand[k, :len(b)] = b
+
+    def locate(self, x, y):
+        '''
+        Finds the triangle that contains each query point and its barycentric coordinates.
+        :param x: first coordinate of the query points (array)
+        :param y: second coordinate of the query points (array)
+        :return: (triangle index or -1 if outside of the hull, (n,3) barycentric coordinates)
+        '''
+        if not hasattr(self, '_cand'):
+            self._buildIndex()
+        qx = np.ravel(np.asarray(x, dtype=float))
+        qy = np.ravel(np.asarray(y, dtype=float))
+        return triLocate(qx, qy, self._ex, self._ey, self._cand, self.transform)
+
+    def __call__(self, values, x, y):
+        '''
+        Interpolates values at the query points; points outside of the convex hull give nan.
+        :param values: data values at self.points, or a tuple of them to share one point location
+        :param x: first coordinate of the query points
+        :param y: second coordinate of the query points
+        :return: array of interpolated values with the shape of x (a tuple of them for a tuple of values)
+        '''
+        idx, bary = self.locate(x, y)
+        out = triInterp(np.array(values if isinstance(values, tuple) else (values,)), self.simplices, idx, bary)
+        out = [o.reshape(np.shape(x)) for o in out]
+        return tuple(out) if isinstance(values, tuple) else out[0]
+
+
+class SteamTables():
+    """
+    The saturated and superheated water tables together with the interpolation structures built on them.
+    All of the lookups take scalars or arrays.  Pressures are passed the same way steam.calc() uses them.
+    """
+
+    def __init__(self, arrays, tris=None):
+        '''
+        Constructor for SteamTables
+        :param arrays: dict with the SAT_COLUMNS and SUPER_COLUMNS arrays
+        :param tris: optional dict of prebuilt TriInterp objects keyed like TRIANGULATIONS
+        '''
+        for k in SAT_COLUMNS + SUPER_COLUMNS:
+            setattr(self, k, arrays[k])
+        self.tris = dict(tris) if tris is not None else {}
+
+    def tri(self, key):
+        '''
+        Returns one of the triangulations, building it on first use if it was not compiled.
+        :param key: one of MESHES
+        :return: a TriInterp object
+        '''
+        if key not in self.tris:
+            if key in INVERSE_MESHES:
+                a, b = INVERSE_MESHES[key]
+                self.tris[key] = TriInterp.fromMesh(getattr(self, a), getattr(self, b), self.tri('TP').simplices)
+            else:
+                a, b = TRIANGULATIONS[key]
+                self.tris[key] = TriInterp.build(getattr(self, a), getattr(self, b))
+        return self.tris[key]
+
+    def sat(self, Pbar):
+        '''
+        Saturated properties along the saturation line.  Pressures outside of the table give nan.
+        :param Pbar: pressure in bar
+        :return: (Tsat, hf, hg, sf, sg, vf, vg)
+        '''
+        if not hasattr(self, '_satColumns'):
+            self._satColumns = np.stack((self.ts, self.hfs, self.hgs, self.sfs, self.sgs, self.vfs, self.vgs))
+        return tuple(c[()] for c in interpColumns(Pbar, self.ps, self._satColumns))
+
+    def superTP(self, T, Pbar):
+        '''
+        Superheated properties from temperature and pressure.
+        :return: (h, s)
+        '''
+        return self.tri('TP')((self.hcol, self.scol), T, Pbar)
+
+    def superPH(self, Pbar, h):
+        '''
+        Superheated properties from pressure and enthalpy.
+        :return: (T, s)
+        '''
+        return self.tri('PH')((self.tcol, self.scol), Pbar, h)
+
+    def superPS(self, Pbar, s):
+        '''
+        Superheated properties from pressure and entropy.
+        :return: (T, h)
+        '''
+        return self.tri('PS')((self.tcol, self.hcol), Pbar, s)
+
+    def satT(self, T):
+        '''
+        The saturated table inverted by temperature (it is monotone in T).  Temperatures above the critical
+        point or below the table give nan.
+        :param T: temperature in C
+        :return: (Pbar, hf, hg, sf, sg, vf, vg)
+        '''
+        if not hasattr(self, '_satTColumns'):
+            self._satTColumns = np.stack((self.ps, self.hfs, self.hgs, self.sfs, self.sgs, self.vfs, self.vgs))
+        return tuple(c[()] for c in interpColumns(T, self.ts, self._satTColumns))
+
+    def vaporLine(self, s):
+        '''
+        Enthalpy of the saturated vapor line at a given entropy, the boundary between the two-phase dome and the
+        superheated region in the (h, s) plane.  Entropies that the line does not reach give nan.
+        :param s: entropy in kJ/(kg K)
+        :return: hg
+        '''
+        if not hasattr(self, '_vaporLine'):
+            order = np.argsort(self.sgs)
+            self._vaporLine = (self.sgs[order], self.hgs[order])
+        return interpColumns(s, self._vaporLine[0], self._vaporLine[1])[0][()]
+
+    def wetHS(self, h, s):
+        '''
+        Pressure of a two-phase state from enthalpy and entropy.  The tie lines of the saturated table (the
+        isobars of the dome) do not cross and, at constant s, h rises with p; so the number of tie lines that
+        pass below (h, s) gives the interval of the table in one vectorized test.  Along an interval hf, hg, sf
+        and sg are linear in p, so the tie line through (h, s) is the root of a quadratic, which is solved in
+        closed form.  Points that no tie line passes through give nan.  Superheated states can give a
+        pressure as well, so use vaporLine() first to tell the regions apart.
+        Below x = 0.01 or so next to a table row the interpolated tie lines of the two intervals overlap: two
+        pressures (up to a few C apart in Tsat) give the same h and s, and the one of lower quality is returned.
+        On the liquid and vapor lines the result is unique.
+        :return: Pbar
+        '''
+        h, s = np.broadcast_arrays(np.asarray(h, dtype=float), np.asarray(s, dtype=float))
+        hs, ss = h[..., None], s[..., None]
+        above = (hs - self.hfs) * (self.sgs - self.sfs) > (ss - self.sfs) * (self.hgs - self.hfs)
+        k0 = np.sum(above & (ss >= self.sfs) & (ss <= self.sgs), axis=-1) - 1  # the last tie line below
+        # just above the liquid line the interpolated tie lines fold over: within an interval they fan out of the
+        # liquid chord and cross again a little way in, so a point there sits on two or three of them (and the
+        # count above can be off by one or two).  Each is a solution of the tables; the liquid line and the states
+        # next to it lie before the fold of their tie line, so those roots win, then the lowest quality.
+        best, bestKey = np.full(h.shape, np.nan), np.full(h.shape, np.inf)
+        for dk in (0, -1, 1, -2, 2):
+            k = k0 + dk
+            ok = (k0 >= 0) & (k >= 0) & (k < len(self.ps) - 1)
+            k = np.where(ok, k, 0)
+            t, x, beforeFold = self._tieLineRoots(k, h, s)
+            key = np.where(ok & ~np.isnan(t), x + np.where(beforeFold, 0.0, 2.0), np.inf)
+            j = np.argmin(key, axis=0)
+            t, key = np.take_along_axis(t, j[None], 0)[0], np.take_along_axis(key, j[None], 0)[0]
+            better = key < bestKey
+            best = np.where(better, self.ps[k] + t * (self.ps[k + 1] - self.ps[k]), best)
+            bestKey = np.where(better, key, bestKey)
+        return best[()]
+
+    def _tieLineRoots(self, k, h, s):
+        '''
+        Positions t in [0, 1] along the interval k of the saturated table whose tie line passes through (h, s):
+        (h - hf)(sg - sf) - (s - sf)(hg - hf) = 0 with every property linear in t.  Only roots where (h, s) lies
+        on the tie line itself (0 <= x <= 1) count; this also drops the root at the critical point, which every
+        tie line of the last interval meets.
+        :return: (2, ...) arrays of both roots and the quality of (h, s) on their tie lines, nan where a root does
+                 not count, and whether (h, s) lies before the fold of the tie line (where d(h, s)/dp along it still
+                 turns the same way as on the liquid line)
+        '''
+        def line(col):
+            return col[k], col[k + 1] - col[k]
+        (hf, dhf), (hg, dhg), (sf, dsf), (sg, dsg) = (line(c) for c in (self.hfs, self.hgs, self.sfs, self.sgs))
+        a0, a1 = h - hf, -dhf
+        b0, b1 = sg - sf, dsg - dsf
+        c0, c1 = s - sf, -dsf
+        d0, d1 = hg - hf, dhg - dhf
+        A = a1 * b1 - c1 * d1
+        B = a0 * b1 + a1 * b0 - c0 * d1 - c1 * d0
+        C = a0 * b0 - c0 * d0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # the numerically stable pair of roots; the first is the root of the linear case A=0
+            q = -0.5 * (B + np.copysign(np.sqrt(B * B - 4 * A * C), B))
+            roots = np.clip(np.stack((np.where(A != 0, q / A, -C / B), C / q)), -1.0, 2.0)
+            x = (s - sf - roots * dsf) / (sg - sf + roots * (dsg - dsf))
+        ok = (roots >= -1e-9) & (roots <= 1 + 1e-9) & (x >= -1e-9) & (x <= 1 + 1e-9)
+        # the cross products of d(h, s)/dt at the liquid and vapor ends with the tie line
+        Ds, Dh = b0 + roots * b1, d0 + roots * d1
+        cf, cg = dsf * Dh - dhf * Ds, dsg * Dh - dhg * Ds
+        with np.errstate(invalid='ignore'):
+            beforeFold = cf * ((1 - x) * cf + x * cg) >= 0
+        return np.where(ok, np.clip(roots, 0, 1), np.nan), np.where(ok, np.clip(x, 0, 1), np.nan), ok & beforeFold
+
+    def superHS(self, h, s):
+        '''
+        Superheated properties from enthalpy and entropy, the inverse of superTP.
+        :return: (T, pressure as in the table's p column)
+        '''
+        return self.tri('HS')((self.tcol, self.pcol), h, s)
+
+    def superTS(self, T, s):
+        '''
+        Superheated properties from temperature and entropy, the inverse of superTP.
+        :return: (pressure as in the table's p column, h)
+        '''
+        return self.tri('TS')((self.pcol, self.hcol), T, s)
+
+
+# endregion
+
+# region function definitions
+def readTextTables():
+    '''
+    Parses the text steam tables, skipping the title row of each.
+    :return: dict of table columns
+    '''
+    arrays = dict(zip(SAT_COLUMNS, np.loadtxt(SAT_FILE, unpack=True, skiprows=1)))
+    arrays.update(zip(SUPER_COLUMNS, np.loadtxt(SUPER_FILE, unpack=True, skiprows=1)))
+    return arrays
+
+
+def sourceStamp(filename, withHash=True):
+    '''
+    Identifies the contents of a source table.
+    :param filename: the table file
+    :param withHash: also compute the sha256 of the file
+    :return: dict with size, mtime and (optionally) sha256
+    '''
+    st = os.stat(filename)
+    stamp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if withHash:
+        with open(filename, 'rb') as f:
+            stamp['sha256'] = hashlib.sha256(f.read()).hexdigest()
+    return stamp
+
+
+def compileTables(cacheDir=CACHE_DIR):
+    '''
+    Compiles the text tables and their triangulations into a directory of .npy files that can be memory
+    mapped.  The manifest, which records the source files it was built from, is written last so a partly
+    written bundle is never picked up.
+    :param cacheDir: directory for the bundle
+    :return: the SteamTables object that was compiled
+    '''
+    arrays = readTextTables()
+    tables = SteamTables(arrays)
+    for key in MESHES:
+        t = tables.tri(key)
+        arrays[key + '_points'] = t.points
+        arrays[key + '_simplices'] = t.simplices
+        arrays[key + '_transform'] = t.transform
+    os.makedirs(cacheDir, exist_ok=True)
+    tag = '.{}.tmp'.format(os.getpid())
+    for k, a in arrays.items():
+        fn = os.path.join(cacheDir, k + '.npy')
+        np.save(fn + tag, np.ascontiguousarray(a))
+        os.replace(fn + tag + '.npy', fn)
+    manifest = {'version': FORMAT_VERSION, 'arrays': sorted(arrays),
+                'sources': {os.path.basename(f): sourceStamp(f) for f in (SAT_FILE, SUPER_FILE)}}
+    fn = os.path.join(cacheDir, 'manifest.json')
+    with open(fn + tag, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(fn + tag, fn)
+    return tables
+
+
+def bundleIsCurrent(manifest):
+    '''
+    Checks a bundle manifest against the source tables.  Size and mtime are checked first; if they differ
+    (e.g. after a fresh checkout) the file hash decides.
+    :param manifest: the parsed manifest.json
+    :return: True if the bundle was built from the current source files
+    '''
+    if manifest.get('version') != FORMAT_VERSION:
+        return False
+    for f in (SAT_FILE, SUPER_FILE):
+        old = manifest['sources'].get(os.path.basename(f))
+        if old is None:
+            return False
+        new = sourceStamp(f, withHash=False)
+        if new['size'] != old['size']:
+            return False
+        if new['mtime_ns'] != old['mtime_ns'] and sourceStamp(f)['sha256'] != old['sha256']:
+            return False
+    return True
+
+
+def openBundle(cacheDir=CACHE_DIR):
+    '''
+    Opens a compiled bundle with memory mapped arrays, so the pages are shared between processes.
+    :param cacheDir: directory of the bundle
+    :return: a SteamTables object, or None if there is no current bundle
+    '''
+    try:
+        with open(os.path.join(cacheDir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if not bundleIsCurrent(manifest):
+            return None
+        arrays = {k: np.load(os.path.join(cacheDir, k + '.npy'), mmap_mode='r') for k in manifest['arrays']}
+    except (OSError, ValueError, KeyError):
+        return None
+    tris = {key: TriInterp(arrays[key + '_points'], arrays[key + '_simplices'], arrays[key + '_transform'])
+            for key in MESHES}
+    return SteamTables(arrays, tris)
+
+
+def loadTables(cacheDir=CACHE_DIR):
+    '''
+    Returns the steam tables for this process.  The compiled bundle is used when it is current; otherwise
+    the text files are parsed and the bundle is (re)compiled for the next process, if possible.
+    :param cacheDir: directory of the bundle
+    :return: a SteamTables object
+    '''
+    global _tables
+    if _tables is None:
+        _tables = openBundle(cacheDir)
+        if _tables is None:
+            try:
+                _tables = compileTables(cacheDir)
+            except (OSError, ImportError):  # read-only tree or no scipy: fall back to the text files
+                _tables = SteamTables(readTextTables())
+    return _tables
+
+
+def setBackend(backend):
+    '''
+    Selects the property backend used by steam().  Any object with the sat, superTP, superPH and superPS
+    methods of SteamTables will do, e.g. steam_grid.GridTables.
+    :param backend: the backend, or None to go back to the reference tables
+    :return: nothing
+    '''
+    global _backend
+    _backend = backend
+
+
+def getBackend():
+    '''
+    Returns the property backend used by steam().
+    :return: the backend set with setBackend(), otherwise loadTables()
+    '''
+    return _backend if _backend is not None else loadTables()
+
+
+def main():
+    '''
+    Compiles the steam table bundle.
+    :return: nothing
+    '''
+    compileTables()
+    print('compiled steam tables into', CACHE_DIR)
+
+
+# endregion
+
+# region function calls
+if __name__ == "__main__":
+    main()
+# endregion
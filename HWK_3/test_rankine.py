@@ -1,4 +1,8 @@
 #rankine_test.py
+import os
+import sys
+if __name__ == "__main__":  # run as a script: put the modules in shared/ on the path, once
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
 from rankine import rankine
 
 def main():
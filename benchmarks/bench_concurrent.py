@@ -0,0 +1,84 @@
+#region imports
+import asyncio
+import copy
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_2'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledNetwork import CompiledNetwork, NetworkState
+from bench_eps import gridNetwork
+#endregion
+
+#region function definitions
+def scenarios(PN, n, seed=0):
+    '''
+    n demand scenarios of a network: every base demand scaled by its own random factor.
+    :return: list of (external flows, fixed heads)
+    '''
+    rng = np.random.default_rng(seed)
+    base = np.array([node.extFlow for node in PN.nodes])
+    Hfixed = np.array([t.head() for t in PN.tanks])
+    return [(base*rng.uniform(0.5, 1.5, len(base)), Hfixed) for _ in range(n)]
+
+
+def solveShared(C, scenario):
+    '''
+    One scenario against the shared compiled network: only the NetworkState is private.
+    '''
+    state = NetworkState(C)
+    state.solve(*scenario)
+    return state
+
+
+def solveCopied(PN, scenario):
+    '''
+    The old way: a private deep copy of the network objects for every scenario.
+    '''
+    C = CompiledNetwork(copy.deepcopy(PN))
+    return C.solve(*scenario)[0]
+
+
+async def solveAsync(C, tasks):
+    return await asyncio.gather(*(asyncio.to_thread(solveShared, C, s) for s in tasks))
+
+
+def main():
+    '''
+    Solves 64 demand scenarios of a 20 x 20 grid serially, on a thread pool and as asyncio tasks against one
+    shared CompiledNetwork, checks that every result is identical to the serial one, and compares with deep
+    copying the network for every scenario.
+    :return: nothing, just prints to screen
+    '''
+    PN = gridNetwork(20)
+    C = CompiledNetwork(PN)
+    tasks = scenarios(PN, 64)
+    t0 = time.perf_counter()
+    serial = [solveShared(C, s) for s in tasks]
+    rows = [('serial, shared topology', time.perf_counter() - t0, True)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(8) as pool:
+        threaded = list(pool.map(lambda s: solveShared(C, s), tasks))
+    rows.append(('8 threads, shared topology', time.perf_counter() - t0,
+                 all(np.array_equal(a.Q, b.Q) for a, b in zip(serial, threaded))))
+    t0 = time.perf_counter()
+    tasked = asyncio.run(solveAsync(C, tasks))
+    rows.append(('asyncio tasks, shared topology', time.perf_counter() - t0,
+                 all(np.array_equal(a.Q, b.Q) for a, b in zip(serial, tasked))))
+    t0 = time.perf_counter()
+    copied = [solveCopied(PN, s) for s in tasks]
+    rows.append(('serial, deep copy per scenario', time.perf_counter() - t0,
+                 all(np.allclose(a.Q, q, rtol=1e-9, atol=1e-12) for a, q in zip(serial, copied))))
+    print('{} scenarios of a network with {} nodes and {} pipes, {} cores'.format(len(tasks), len(PN.nodes),
+                                                                                 len(PN.pipes), os.cpu_count()))
+    print('{:<34s}{:>10s}{:>14s}{:>12s}'.format('', 'seconds', 'solves/s', 'identical'))
+    for name, dt, same in rows:
+        print('{:<34s}{:>10.3f}{:>14.1f}{:>12s}'.format(name, dt, len(tasks)/dt, str(same)))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,58 @@
+#region imports
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_2'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledNetwork import CompiledNetwork
+from DomainDecomposition import DomainDecomposition
+from bench_eps import gridNetwork
+#endregion
+
+#region function definitions
+def main(n=224, workers=(1, 2, 4, 8), methods=('cg', 'schur')):
+    '''
+    Scaling of the domain-decomposed solve on an n x n grid (the default is about 50000 nodes and 100000 pipes)
+    against the number of worker processes for both interface methods, next to the single process sparse direct
+    solve.  The speedup needs
+    as many free cores as workers; on a machine with fewer cores the 'ideal' column estimates it from the
+    busy time of the slowest worker in every phase.
+    :param n: nodes per side of the grid
+    :param workers: worker counts to time
+    :param methods: interface methods to time
+    :return: nothing, just prints to screen
+    '''
+    t0 = time.perf_counter()
+    PN = gridNetwork(n)
+    C = CompiledNetwork(PN)
+    ext = np.array([node.extFlow for node in PN.nodes])
+    Hfixed = [t.head() for t in PN.tanks]
+    print('{} nodes, {} pipes, built in {:0.1f} s, {} cores'.format(len(PN.nodes), len(PN.pipes),
+                                                                  time.perf_counter() - t0, os.cpu_count()))
+    t0 = time.perf_counter()
+    Q, H, it, ok = C.solve(ext, Hfixed)
+    tDirect = time.perf_counter() - t0
+    print('{:>8s}{:>9s}{:>11s}{:>8s}{:>8s}{:>8s}{:>9s}{:>8s}{:>7s}{:>9s}{:>10s}'.format(
+        'method', 'workers', 'interface', 'setup', 'solve', 'ideal', 'speedup', 'ideal', 'iters', 'cg iters',
+        'max |dQ|'))
+    print('{:>8s}{:>9s}{:>11d}{:>8s}{:>8.2f}{:>8.2f}{:>9.2f}{:>8.2f}{:>7d}{:>9d}{:>10s}'.format(
+        'direct', '-', 0, '-', tDirect, tDirect, 1.0, 1.0, it, 0, '-'))
+    for method in methods:
+        for w in workers:
+            t0 = time.perf_counter()
+            with DomainDecomposition(C, w, method=method) as dd:
+                tSetup = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                q, h, itDD, okDD = dd.solve(ext, Hfixed)
+                dt = time.perf_counter() - t0
+                ideal = dt - dd.waiting + dd.slowest
+                print('{:>8s}{:>9d}{:>11d}{:>8.2f}{:>8.2f}{:>8.2f}{:>9.2f}{:>8.2f}{:>7d}{:>9d}{:>10.1e}'.format(
+                    method, w, len(dd.interface), tSetup, dt, ideal, tDirect / dt, tDirect / ideal, itDD,
+                    dd.cgIterations, np.max(np.abs(q - Q))))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
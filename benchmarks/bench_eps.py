@@ -0,0 +1,67 @@
+#region imports
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_2'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from Fluid import Fluid
+from Pipe import Pipe
+from PipeNetwork import PipeNetwork
+from Tank import Tank
+from ExtendedPeriod import DemandPattern, ExtendedPeriodSimulation
+#endregion
+
+#region function definitions
+def gridNetwork(n, seed=0):
+    '''
+    An n x n grid of pipes fed by a reservoir at one corner, with a storage tank at the opposite corner and a
+    small demand at every other node.
+    :param n: nodes per side
+    :return: a PipeNetwork object
+    '''
+    rng = np.random.default_rng(seed)
+    water = Fluid()
+    name = lambda i, j: 'n{:04d}'.format(i*n + j)
+    PN = PipeNetwork()
+    for i in range(n):
+        for j in range(n):
+            if j + 1 < n:
+                PN.pipes.append(Pipe(name(i, j), name(i, j + 1), 100, rng.choice([150, 200, 250]), 0.00025, water))
+            if i + 1 < n:
+                PN.pipes.append(Pipe(name(i, j), name(i + 1, j), 100, rng.choice([150, 200, 250]), 0.00025, water))
+    PN.buildNodes()
+    for node in PN.nodes:
+        node.extFlow = -rng.uniform(0.0005, 0.002)
+    PN.tanks.append(Tank(name(0, 0), Area=None, Level=10, Elevation=50))
+    PN.tanks.append(Tank(name(n - 1, n - 1), Area=500, Level=3, Elevation=40, MaxLevel=8))
+    return PN
+
+
+def main():
+    '''
+    Times 7 day runs at a 5 minute time step (2017 steps) on growing grid networks, streaming to disk.
+    :return: nothing, just prints to screen
+    '''
+    daily = DemandPattern([0.5, 0.4, 0.4, 0.4, 0.5, 0.7, 1.1, 1.5, 1.4, 1.2, 1.1, 1.0,
+                           1.0, 1.0, 1.0, 1.1, 1.2, 1.4, 1.6, 1.5, 1.2, 0.9, 0.7, 0.6])
+    print('{:>8s}{:>8s}{:>8s}{:>12s}{:>12s}{:>14s}{:>13s}'.format('nodes', 'pipes', 'steps', 'build (s)', 'run (s)',
+                                                                'iters/step', 'unconverged'))
+    for n in (10, 20, 30):
+        t0 = time.perf_counter()
+        PN = gridNetwork(n)
+        sim = ExtendedPeriodSimulation(PN, duration=7*24*3600, timeStep=300,
+                                       patterns={node.name: daily for node in PN.nodes})
+        tBuild = time.perf_counter() - t0
+        with tempfile.TemporaryDirectory() as d:
+            r = sim.run(d)
+        print('{:>8d}{:>8d}{:>8d}{:>12.2f}{:>12.2f}{:>14.2f}{:>13d}'.format(len(PN.nodes), len(PN.pipes), r['steps'],
+                                                                          tBuild, r['seconds'],
+                                                                          r['iterations']/r['steps'], r['unconverged']))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,60 @@
+#region imports
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_2'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from CompiledNetwork import CompiledNetwork, NetworkState
+import result_io
+from bench_eps import gridNetwork
+#endregion
+
+#region function definitions
+def main(n=150):
+    '''
+    Solves an n x n grid (the default is 22500 nodes and 44700 pipes) and compares reporting the result the old
+    way, one print per pipe, node and check, with building the structured result tables and the residual report
+    and writing them in bulk to every export format.  Printed output goes to os.devnull, so only the formatting
+    and write calls are timed.
+    :param n: nodes per side of the grid
+    :return: nothing, just prints to screen
+    '''
+    PN = gridNetwork(n)
+    C = CompiledNetwork(PN)
+    ext = np.array([node.extFlow for node in PN.nodes])
+    Hfixed = [t.head() for t in PN.tanks]
+    state = NetworkState(C)
+    t0 = time.perf_counter()
+    state.solve(ext, Hfixed)
+    rows = [('solve', time.perf_counter() - t0)]
+    state.writeBack(PN)
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        for p in PN.pipes:
+            p.printPipeFlowRate()
+        for node in PN.nodes:
+            print('net flow into node {} is {:0.2f}'.format(node.name, node.getNetFlowRate()))
+    rows.append(('print per element', time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    results = state.results(ext)
+    report = state.residualReport(ext, Hfixed)
+    rows.append(('result tables + residual report', time.perf_counter() - t0))
+    with tempfile.TemporaryDirectory() as folder:
+        for name in ('pipes.csv', 'pipes.npy', 'pipes.npz', 'pipes'):
+            t0 = time.perf_counter()
+            result_io.export(os.path.join(folder, name), results['pipes'])
+            rows.append(('export ' + name, time.perf_counter() - t0))
+    print('{} nodes, {} pipes'.format(len(PN.nodes), len(PN.pipes)))
+    for name, dt in rows:
+        print('{:<34s}{:>10.3f} s'.format(name, dt))
+    print()
+    print(report)
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
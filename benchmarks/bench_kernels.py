@@ -0,0 +1,94 @@
+#region imports
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HWK_3'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_2'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+import kernels
+from steam_tables import loadTables
+from Pipe import colebrook
+#endregion
+
+#region function definitions
+def timed(f, repeat=3):
+    '''
+    :return: (result of f(), best of repeat wall times in s)
+    '''
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = f()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def cases(n, seed=0):
+    '''
+    The hot kernels on n-element batches: Colebrook friction factors, loop head losses (loops of four pipes),
+    saturated properties and superheated (T, p) lookups of the steam tables.
+    :return: list of (name, function)
+    '''
+    rng = np.random.default_rng(seed)
+    Re = 10**rng.uniform(np.log10(4000), 8, n)
+    rr = 10**rng.uniform(-6, -2, n)
+    h = rng.normal(0, 5, n)
+    pipes = rng.integers(0, n, n)
+    signs = rng.choice([-1.0, 1.0], n)
+    ptr = np.arange(0, n + 1, 4)
+    tables = loadTables()
+    Pbar = rng.uniform(tables.ps.min(), tables.ps.max(), n)
+    # superheated points inside the table: random convex combinations of the corners of random triangles
+    tri = tables.tri('TP')
+    w = rng.dirichlet((1, 1, 1), n)
+    corners = tri.points[tri.simplices[rng.integers(0, len(tri.simplices), n)]]
+    T, P = (np.einsum('ni,ni->n', corners[..., k], w) for k in (0, 1))
+    return [('Colebrook', lambda: kernels.colebrookU(Re, rr)),
+            ('loop head loss', lambda: kernels.loopHeadLoss(h, ptr, pipes, signs)),
+            ('saturated properties', lambda: np.array(tables.sat(Pbar))),
+            ('superheated h, s(T, p)', lambda: np.array(tables.superTP(T, P)))]
+
+
+def main(n=10**6):
+    '''
+    Times every kernel on n-element batches with the NumPy versions and, when Numba is installed, with the
+    compiled versions (the first call, which compiles or loads the cache, is timed on its own), and checks that
+    both give the same results.  Colebrook is also timed one pipe at a time, the way Pipe.FrictionFactor solves
+    it for small networks.
+    :param n: batch size
+    :return: nothing, just prints to screen
+    '''
+    print('{} elements, numba {}, {} cores'.format(n, kernels.numba.__version__ if kernels.numba else 'not installed',
+                                                   os.cpu_count()))
+    print('{:<26s}{:>10s}{:>12s}{:>10s}{:>10s}{:>14s}'.format('kernel', 'numpy s', 'first call', 'jit s',
+                                                              'speedup', 'max rel diff'))
+    for name, f in cases(n):
+        kernels.JIT = False
+        ref, tNumpy = timed(f)
+        if kernels.numba is None:
+            print('{:<26s}{:>10.3f}{:>12s}{:>10s}{:>10s}{:>14s}'.format(name, tNumpy, '-', '-', '-', '-'))
+            continue
+        kernels.JIT = True
+        _, tFirst = timed(f, 1)
+        out, tJit = timed(f)
+        ok = np.isfinite(ref)
+        if not np.array_equal(ok, np.isfinite(out)):
+            raise ValueError(name + ': the NumPy and compiled kernels give nan at different elements')
+        diff = np.max(np.abs(out[ok] - ref[ok]) / np.maximum(np.abs(ref[ok]), 1e-300))
+        print('{:<26s}{:>10.3f}{:>12.3f}{:>10.3f}{:>10.1f}{:>14.1e}'.format(name, tNumpy, tFirst, tJit, tNumpy / tJit,
+                                                                           diff))
+    rng = np.random.default_rng(0)
+    m = min(n, 10**5)
+    Re, rr = 10**rng.uniform(np.log10(4000), 8, m), 10**rng.uniform(-6, -2, m)
+    kernels.JIT = False
+    _, tScalar = timed(lambda: [colebrook(a, b) for a, b in zip(Re.tolist(), rr.tolist())], 1)
+    _, tArray = timed(lambda: kernels.colebrookU(Re, rr))
+    print('Colebrook one pipe at a time: {:0.3f} s for {} pipes, {:0.1f}x the time of the NumPy kernel'.format(
+        tScalar, m, tScalar / tArray))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
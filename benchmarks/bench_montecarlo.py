@@ -0,0 +1,38 @@
+#region imports
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_2'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from Uncertainty import MonteCarloStudy, Normal, Uniform, LogNormal
+from bench_eps import gridNetwork
+#endregion
+
+#region function definitions
+def main():
+    '''
+    Samples per second of a Monte Carlo study on a 20 x 20 grid (400 nodes, 760 pipes) with uncertain demands,
+    diameters and roughness, serial and with every core, and the time that 10^5 samples would take.
+    :return: nothing, just prints to screen
+    '''
+    PN = gridNetwork(20)
+    nSamples = 4000
+    print('{:>8s}{:>10s}{:>12s}{:>12s}{:>14s}{:>13s}'.format('workers', 'samples', 'seconds', 'samples/s',
+                                                             '1e5 samples', 'unconverged'))
+    for workers in sorted({1, os.cpu_count() or 1}):
+        study = MonteCarloStudy(PN, seed=0)
+        study.vary('extFlow', Normal(0.15))
+        study.vary('d', Uniform(-0.03, 0.03))
+        study.vary('r', LogNormal(0.5))
+        study.threshold('H n0210', '<', 37.5)
+        t0 = time.perf_counter()
+        stats = study.run(nSamples, chunkSize=500, workers=workers)
+        dt = time.perf_counter() - t0
+        print('{:>8d}{:>10d}{:>12.2f}{:>12.0f}{:>12.1f} m{:>13d}'.format(workers, stats.count, dt, stats.count/dt,
+                                                                       1e5/(stats.count/dt)/60, study.failed))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,59 @@
+#region imports
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_1'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from NonlinearCircuit import NonlinearCircuit, DiodeGrid
+#endregion
+
+#region function definitions
+def fsolveResidual(nc):
+    '''
+    The nonlinear nodal equations of a circuit as a function for fsolve, the way ResistorNetwork solves its
+    networks (with a finite difference Jacobian).
+    :return: function of the unknown vector giving the residuals
+    '''
+    cc = nc.Circuit
+    M = cc.Matrix(cc.R[0], cc.R[1], 1.0 / cc.R[2], extraSources=(cc.L[0], cc.L[1]))
+    rhs = nc.RightHandSide()
+
+    def residual(x):
+        r = rhs.copy()
+        nc._AddElementCurrents(r, nc.Stamps(cc.BranchVoltage(x, nc.Ea, nc.Eb))[0])
+        return M @ x - r
+    return residual
+
+
+def main(sizes=(5, 10, 15, 60, 150)):
+    '''
+    Solves diode and thermistor grids (see NonlinearCircuit.DiodeGrid) with the sparse Newton engine, cold and
+    warm started, and the small ones with fsolve as well.
+    :param sizes: nodes per side of the grids
+    :return: nothing, just prints to screen
+    '''
+    from scipy.optimize import fsolve
+    print('{:>8s}{:>12s}{:>8s}{:>10s}{:>8s}{:>10s}{:>12s}{:>12s}'.format('nodes', 'nonlinear', 'cold', 'cold s',
+                                                                         'warm', 'warm s', 'fsolve s', 'max KCL'))
+    for n in sizes:
+        nc = NonlinearCircuit(DiodeGrid(n))
+        t0 = time.perf_counter()
+        cold = nc.Solve()
+        t1 = time.perf_counter()
+        warm = nc.Solve(sourceVoltages=[5.1], x0=cold.Start())
+        t2 = time.perf_counter()
+        tf = '-'
+        if n <= 15:
+            x, info, ok, msg = fsolve(fsolveResidual(nc), np.zeros(len(cold.Start())), full_output=True)
+            tf = '{:.3f}'.format(time.perf_counter() - t2) + ('' if ok == 1 else '*')
+        print('{:>8d}{:>12d}{:>8d}{:>10.3f}{:>8d}{:>10.3f}{:>12s}{:>12.1e}'.format(
+            len(nc.Circuit.NodeNames), nc.nE, cold.Factorizations, t1 - t0, warm.Factorizations, t2 - t1, tf,
+            cold.ResidualReport()['maxAbs'][0]))
+    print('cold and warm are sparse factorizations, * marks fsolve runs that did not converge')
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
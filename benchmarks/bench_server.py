@@ -0,0 +1,81 @@
+#region imports
+import asyncio
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'service'))
+from solver_server import SolverServer, ServiceClient
+#endregion
+
+#region function definitions
+def makeRequest(rng):
+    '''
+    A random request of the kind our tools send: mostly single steam states, some cycles and networks.
+    :param rng: a random.Random object
+    :return: (endpoint, payload)
+    '''
+    u = rng.random()
+    if u < 0.7:
+        kind = rng.choice(['x', 'h', 's', 'T'])
+        value = {'x': rng.uniform(0, 1), 'h': rng.uniform(500, 2700), 's': rng.uniform(1, 7),
+                 'T': rng.uniform(300, 500)}[kind]
+        return 'steam', {'p': rng.uniform(1000, 8000), kind: value}
+    if u < 0.9:
+        return 'rankine', {'p_low': rng.uniform(8, 50), 'p_high': rng.uniform(2000, 8000),
+                           't_high': rng.choice([None, rng.uniform(400, 500)])}
+    if u < 0.95:
+        return 'resistor', {'network': rng.choice([1, 2])}
+    return 'pipe', {}
+
+
+async def client(port, n, seed, statuses):
+    '''
+    One caller sending n requests back to back over a keep-alive connection.
+    '''
+    rng = random.Random(seed)
+    c = ServiceClient(port=port)
+    for _ in range(n):
+        status, _ = await c.request(*makeRequest(rng))
+        statuses[status] = statuses.get(status, 0) + 1
+    await c.close()
+
+
+async def run(window, maxBatch, clients, perClient):
+    '''
+    Starts a server, drives it with concurrent clients and prints its statistics.
+    '''
+    server = SolverServer(window=window, maxBatch=maxBatch)
+    await server.warmUp()
+    port = await server.start(port=0)
+    statuses = {}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(port, perClient, k, statuses) for k in range(clients)))
+    wall = time.perf_counter() - t0
+    stats = server.stats()
+    await server.close()
+    total = sum(statuses.values())
+    print('window {:0.1f} ms, max batch {}: {} requests in {:0.2f} s = {:0.0f} req/s, statuses {}'.format(
+        1000*window, maxBatch, total, wall, total/wall, statuses))
+    print('  {:<10s}{:>9s}{:>11s}{:>10s}{:>10s}{:>10s}{:>10s}'.format('endpoint', 'requests', 'mean batch',
+                                                                       'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+    for ep, s in stats.items():
+        if s['requests']:
+            print('  {:<10s}{:>9d}{:>11.1f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}'.format(
+                ep, s['requests'], s['meanBatch'], s['p50_ms'], s['p90_ms'], s['p99_ms'], s['max_ms']))
+
+
+def main():
+    '''
+    Compares one-request-at-a-time dispatch (max batch 1) with micro-batching under the same concurrent load.
+    :return: nothing, just prints to screen
+    '''
+    clients, perClient = 64, 40
+    asyncio.run(run(0.0, 1, clients, perClient))
+    asyncio.run(run(0.002, 256, clients, perClient))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
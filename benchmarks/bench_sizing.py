@@ -0,0 +1,63 @@
+#region imports
+import os
+import sys
+import time
+import warnings
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW6_2'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+from HW6_2 import buildExampleNetwork
+from PipeSizing import PipeCatalogue, PipeSizing
+from bench_eps import gridNetwork
+#endregion
+
+#region function definitions
+def main(nDesigns=200):
+    '''
+    Solves per second of candidate designs of the HW6_2 network the old way (new Pipe objects and fsolve for every
+    design) and in PipeSizing batches, the candidates of one search round on a 12 x 12 grid cold and warm started,
+    and sizes that grid with one process and with every core.
+    :param nDesigns: random candidate designs of the HW6_2 network
+    :return: nothing, just prints to screen
+    '''
+    catalogue = PipeCatalogue([100, 150, 200, 250, 300, 350, 400], [95, 120, 150, 185, 225, 270, 320])
+    rng = np.random.default_rng(0)
+    designs = rng.integers(0, len(catalogue.D), (nDesigns, 10))
+    t0 = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # fsolve complains about some of the random designs
+        for design in designs[:nDesigns // 10]:
+            buildExampleNetwork('m3/s', D=catalogue.D[design]).findFlowRates()
+    old = nDesigns // 10 / (time.perf_counter() - t0)
+    PN = buildExampleNetwork('m3/s', D=catalogue.D[designs[0]])
+    sizing = PipeSizing(PN, catalogue, minPressure=20.0, Hfixed=[40.0])
+    sizing.evaluate(designs)
+    batched = sizing.solves / sizing.seconds
+    print('HW6_2 network, solves/s: fsolve with new Pipe objects {:0.0f}, batched {:0.0f}'.format(old, batched))
+    # the candidates of one search round: every one-size reduction of a design, cold and warm started
+    PN = gridNetwork(12)
+    sizing = PipeSizing(PN, catalogue, minPressure=44.0)
+    design = np.full(len(sizing.sized), 4)
+    start = sizing.evaluate(design)
+    neighbours, _ = sizing._moves(design, 'reduce')
+    for name, x0 in (('cold', None), ('warm', (start['Q'][0], start['H'][0]))):
+        sizing.solves, sizing.seconds, sizing.iterations = 0, 0.0, 0
+        sizing.evaluate(neighbours, x0)
+        print('12 x 12 grid, {} one-size reductions {}: {:0.0f} solves/s, {} Newton iterations'.format(
+            len(neighbours), name, sizing.solves / sizing.seconds, sizing.iterations))
+    print('{:>8s}{:>10s}{:>12s}{:>10s}{:>12s}{:>10s}'.format('workers', 'solves', 'seconds', 'solves/s', 'cost',
+                                                             'moves'))
+    for workers in sorted({1, os.cpu_count() or 1}):
+        sizing = PipeSizing(PN, catalogue, minPressure=44.0)
+        t0 = time.perf_counter()
+        best = sizing.optimize(workers=workers, exchange=False)
+        dt = time.perf_counter() - t0
+        print('{:>8d}{:>10d}{:>12.2f}{:>10.0f}{:>12.0f}{:>10d}'.format(workers, best['solves'], dt,
+                                                                      best['solves'] / dt, best['cost'],
+                                                                      max(len(sizing.history) - 1, 0)))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
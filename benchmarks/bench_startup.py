@@ -0,0 +1,57 @@
+#region imports
+import os
+import subprocess
+import sys
+import time
+#endregion
+
+#region globals
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (folder, module) for every command line entry point in the repository
+ENTRY_POINTS = [('HW6_1', 'HW6_1'), ('HW6_2', 'HW6_2'), ('HWK_3', 'rankine'), ('HWK_3', 'test_rankine')]
+# importing these up front is what every entry point used to pay for before the scipy imports were deferred
+EAGER = 'import scipy.optimize, scipy.interpolate'
+#endregion
+
+#region function definitions
+def timeImport(folder, module, prefix='', repeats=7):
+    '''
+    Times a fresh interpreter that imports one module, the same work a short-lived batch job pays on startup.
+    :param folder: the folder holding the module (used as the working directory)
+    :param module: the module to import
+    :param prefix: optional statements executed before the import
+    :param repeats: number of fresh interpreters to time, the median is reported
+    :return: (median wall time in s, True if scipy ended up in sys.modules)
+    '''
+    code = '{}\nimport sys\nimport {}\nprint("scipy" in sys.modules)'.format(prefix, module)
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'shared'))  # what the scripts add when they run
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.join(ROOT, folder), env=env,
+                             capture_output=True, text=True, check=True)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[len(times)//2], out.stdout.strip().endswith('True')
+
+
+def main():
+    '''
+    Reports the startup time of every entry point with lazy scipy imports against the same import with
+    scipy loaded eagerly, the way the modules used to do it.
+    :return: nothing, just prints to screen
+    '''
+    base, _ = timeImport('HWK_3', 'os')
+    print('bare interpreter: {:0.1f} ms'.format(1000*base))
+    print('{:<22s}{:>12s}{:>12s}{:>10s}{:>8s}'.format('entry point', 'lazy (ms)', 'eager (ms)', 'saved', 'scipy'))
+    for folder, module in ENTRY_POINTS:
+        lazy, loaded = timeImport(folder, module)
+        eager, _ = timeImport(folder, module, prefix=EAGER)
+        print('{:<22s}{:>12.1f}{:>12.1f}{:>9.0f}%{:>8s}'.format(folder+'/'+module+'.py', 1000*lazy, 1000*eager,
+                                                              100*(eager-lazy)/eager, str(loaded)))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,532 @@
+#region imports
+import argparse
+import asyncio
+import collections
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+#endregion
+
+#region globals
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# endpoint -> folder of the code that answers it.  HW6_1 and HW6_2 both have a Loop.py, so every folder gets
+# its own worker processes and the server process itself never imports any of them.
+ENDPOINTS = {'steam': 'HWK_3', 'rankine': 'HWK_3', 'resistor': 'HW6_1', 'pipe': 'HW6_2'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 503: 'Service Unavailable'}
+_cache = None  # NetworkCache of a network worker process, see _networkCache
+#endregion
+
+#region worker functions (these run in the per-folder worker processes)
+def _initWorker(folder):
+    '''
+    Makes one of the homework folders and the modules they share importable in a worker process.  The folder
+    is also the working directory, since the scripts open their data files by relative name.
+    :param folder: the folder name, e.g. 'HWK_3'
+    :return: nothing
+    '''
+    path = os.path.join(ROOT, folder)
+    sys.path.insert(0, os.path.join(ROOT, 'shared'))
+    sys.path.insert(0, path)
+    os.chdir(path)
+
+
+def _networkCache():
+    '''
+    The on-disk cache of solved networks of the worker's folder (its network_cache subfolder).
+    :return: a NetworkCache object
+    '''
+    global _cache
+    if _cache is None:
+        from network_cache import NetworkCache
+        _cache = NetworkCache()
+    return _cache
+
+
+def _num(v):
+    '''
+    Converts a numpy scalar to a float for JSON, with nan as None.
+    '''
+    v = float(v)
+    return None if math.isnan(v) else v
+
+
+def _steamError(kind, value, p, hf, Tsat):
+    '''
+    Why steam.calcBatch gave no state for a request.
+    :param kind: the given second property, 'T', 'x', 'h' or 's'
+    :param value: its value
+    :param p: pressure in kPa
+    :param hf: the hf that calcBatch returned (nan when p is outside of the saturated table)
+    :param Tsat: the saturation temperature that calcBatch returned
+    :return: the error message
+    '''
+    if math.isnan(hf):
+        return 'p={} is outside of the saturated table (given {}={})'.format(p, kind, value)
+    if kind == 'T':
+        why = 'outside of the superheated table' if value > Tsat else 'not above saturation'
+    else:
+        why = 'not a state in the tables'
+    return '{}={} is {} at p={}'.format(kind, value, why, p)
+
+
+def _steamBatch(payloads):
+    '''
+    Evaluates a batch of steam states, with one vectorized steam.calcBatch call for each kind of second property.
+    :param payloads: list of {'p': kPa, and one of 'T', 'x', 'h' or 's'}
+    :return: list of result dicts
+    '''
+    import numpy as np
+    from steam import calcBatch
+    results = [None] * len(payloads)
+    groups = collections.defaultdict(list)
+    for k, pl in enumerate(payloads):
+        kinds = [key for key in ('T', 'x', 'h', 's') if pl.get(key) is not None]
+        if 'p' not in pl or len(kinds) != 1:
+            results[k] = {'error': 'give p and exactly one of T, x, h or s'}
+        else:
+            groups[kinds[0]].append(k)
+    for kind, rows in groups.items():
+        p = np.array([payloads[k]['p'] for k in rows], dtype=float)
+        st = calcBatch(p, kind, np.array([payloads[k][kind] for k in rows], dtype=float))
+        for j, k in enumerate(rows):
+            if math.isnan(st['T'][j]) or math.isnan(st['h'][j]):
+                results[k] = {'error': _steamError(kind, payloads[k][kind], p[j], st['hf'][j], st['Tsat'][j])}
+                continue
+            results[k] = {'p': float(p[j]), 'region': 'Superheated' if st['superheated'][j] else 'Saturated'}
+            results[k].update({key: _num(st[key][j]) for key in ('T', 'x', 'v', 'h', 's')})
+    return results
+
+
+def _rankineBatch(payloads):
+    '''
+    Evaluates a batch of simple Rankine cycles with one call to rankine.calc_efficiency_batch.
+    :param payloads: list of {'p_low': kPa, 'p_high': kPa, 't_high': C or None}, with the defaults of rankine()
+    :return: list of result dicts
+    '''
+    import numpy as np
+    from rankine import calc_efficiency_batch
+    pl = np.array([pl.get('p_low', 8) for pl in payloads], dtype=float)
+    ph = np.array([pl.get('p_high', 8000) for pl in payloads], dtype=float)
+    th = np.array([np.nan if pl.get('t_high') is None else pl['t_high'] for pl in payloads], dtype=float)
+    r = calc_efficiency_batch(pl, ph, th)
+    results = []
+    for k in range(len(payloads)):
+        if math.isnan(r['efficiency'][k]):
+            results.append({'error': 't_high={} at p_high={} is not a superheated state in the tables'.format(
+                th[k], ph[k])})
+        else:
+            results.append({key: _num(r[key][k]) for key in r})
+    return results
+
+
+def _resistorBatch(payloads):
+    '''
+    Solves a batch of resistor networks.  Identical requests in the batch are solved once, and networks solved
+    by earlier batches come from the folder's NetworkCache.
+    :param payloads: list of {'netlist': text in the ResistorNetwork.txt format (default: that file),
+                     'network': 1 or 2 for ResistorNetwork or ResistorNetwork_2}
+    :return: list of result dicts
+    '''
+    from ResistorNetwork import ResistorNetwork, ResistorNetwork_2
+    solved = {}
+    results = []
+    for pl in payloads:
+        key = (pl.get('netlist'), pl.get('network', 1))
+        if key not in solved:
+            Net = ResistorNetwork_2() if key[1] == 2 else ResistorNetwork()
+            Net.BuildNetworkFromText(key[0] if key[0] is not None else open('ResistorNetwork.txt').read())
+            i = Net.Solve(_networkCache())['Current']
+            solved[key] = {'currents': i.tolist(),
+                           'resistors': {r.Name: float(r.Current) for r in Net.Resistors}}
+        results.append(solved[key])
+    return results
+
+
+def _pipeBatch(payloads):
+    '''
+    Solves a batch of pipe networks.  Identical requests in the batch are solved once, and networks solved
+    by earlier batches come from the folder's NetworkCache (or start from a similar one).
+    :param payloads: list of {'pipes': [[start, end, L m, D mm, roughness m], ...], 'extFlows': {node: flow},
+                     'loops': [[name, [pipe names]], ...], 'fluid': {'mu':, 'rho':} or {'model': name in Fluid.MODELS,
+                     'T': C}}, default: the network of HW6_2.py (what a request leaves out is taken from it)
+    :return: list of result dicts
+    '''
+    from Fluid import MODELS, Fluid
+    from HW6_2 import EXAMPLE_FLOWS, EXAMPLE_LOOPS, EXAMPLE_PIPES, EXAMPLE_ROUGHNESS
+    from Loop import Loop
+    from Pipe import Pipe
+    from PipeNetwork import PipeNetwork
+    solved = {}
+    results = []
+    for pl in payloads:
+        key = json.dumps(pl, sort_keys=True)
+        if key not in solved:
+            net = {'pipes': [[s, e, L, D, EXAMPLE_ROUGHNESS] for s, e, L, D in EXAMPLE_PIPES],
+                   'extFlows': EXAMPLE_FLOWS, 'loops': EXAMPLE_LOOPS}
+            net.update(pl)
+            spec = dict(net.get('fluid', {}))
+            if 'model' in spec:
+                spec['model'] = MODELS[spec['model']]
+            fluid = Fluid(**spec)
+            PN = PipeNetwork(fluid=fluid)
+            for start, end, L, D, r in net['pipes']:
+                PN.pipes.append(Pipe(start, end, L, D, r, fluid))
+            PN.buildNodes()
+            for name, q in net['extFlows'].items():
+                PN.getNode(name).extFlow = q
+            for name, pipes in net['loops']:
+                PN.loops.append(Loop(name, [PN.getPipe(p) for p in pipes]))
+            res = PN.solve(_networkCache())
+            report = PN.residualReport()
+            solved[key] = {'flows': dict(zip(res['pipes']['name'].tolist(), res['pipes']['Q'].tolist())),
+                           'nodeResidual': float(report['maxAbs'][0]),
+                           'loopResidual': float(report['maxAbs'][1])}
+        results.append(solved[key])
+    return results
+
+
+def _runBatch(endpoint, payloads):
+    '''
+    Entry point of the worker processes: answers one coalesced batch of requests.
+    :param endpoint: one of ENDPOINTS
+    :param payloads: list of request dicts
+    :return: list of result dicts, {'error': message} for requests that could not be answered
+    '''
+    handler = {'steam': _steamBatch, 'rankine': _rankineBatch, 'resistor': _resistorBatch, 'pipe': _pipeBatch}
+    try:
+        return handler[endpoint](payloads)
+    except Exception as e:
+        # something in the batch broke the vectorized call, so answer the requests one at a time
+        if len(payloads) == 1:
+            return [{'error': '{}: {}'.format(type(e).__name__, e)}]
+        return [r for pl in payloads for r in _runBatch(endpoint, [pl])]
+#endregion
+
+#region class definitions
+class Overloaded(Exception):
+    pass
+
+
+class EndpointStats():
+    '''
+    Counters and a window of recent request latencies for one endpoint.
+    '''
+    def __init__(self, window=100000):
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.workerTime = 0.0
+        self.latencies = collections.deque(maxlen=window)
+
+    def report(self, elapsed):
+        '''
+        :param elapsed: seconds since the server started (or the stats were reset)
+        :return: dict with throughput, batch sizes and latency percentiles in ms
+        '''
+        lat = sorted(self.latencies)
+
+        def pct(q):
+            return 1000*lat[min(len(lat) - 1, int(q*len(lat)))] if lat else None
+        return {'requests': self.requests, 'rejected': self.rejected, 'errors': self.errors,
+                'batches': self.batches, 'meanBatch': self.batched/self.batches if self.batches else None,
+                'throughput': self.requests/elapsed if elapsed > 0 else None,
+                'workerTimePerRequest_ms': 1000*self.workerTime/self.batched if self.batched else None,
+                'p50_ms': pct(0.50), 'p90_ms': pct(0.90), 'p99_ms': pct(0.99), 'max_ms': pct(1.0)}
+
+
+class Batcher():
+    '''
+    Coalesces the requests for one endpoint.  The first request of a batch opens a window of `window` seconds;
+    everything that arrives before it closes (up to maxBatch requests) goes to the worker as one call.  While a
+    batch is running, new requests queue up and are sent as the next batch when it finishes, so batches grow
+    with the load.  More than maxPending waiting or running requests are refused (backpressure).
+    '''
+    def __init__(self, endpoint, pool, window=0.002, maxBatch=256, maxPending=1024, maxInflight=1):
+        self.endpoint = endpoint
+        self.pool = pool
+        self.window = window
+        self.maxBatch = maxBatch
+        self.maxPending = maxPending
+        self.maxInflight = maxInflight
+        self.queue = collections.deque()
+        self.pending = 0
+        self.inflight = 0
+        self.timer = None
+        self.stats = EndpointStats()
+
+    async def submit(self, payload):
+        '''
+        Queues one request and waits for its answer.
+        :param payload: the request dict
+        :return: the result dict
+        '''
+        if self.pending >= self.maxPending:
+            self.stats.rejected += 1
+            raise Overloaded('{} has {} requests pending'.format(self.endpoint, self.pending))
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        t0 = time.perf_counter()
+        self.queue.append((payload, fut))
+        self.pending += 1
+        if len(self.queue) >= self.maxBatch:
+            self._flush()
+        elif self.timer is None and self.inflight < self.maxInflight:
+            self.timer = loop.call_later(self.window, self._flush)
+        try:
+            result = await fut
+        finally:
+            self.pending -= 1
+        self.stats.requests += 1
+        self.stats.latencies.append(time.perf_counter() - t0)
+        if 'error' in result:
+            self.stats.errors += 1
+        return result
+
+    def _flush(self):
+        '''
+        Sends the queued requests to the worker if a worker slot is free.
+        '''
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.queue and self.inflight < self.maxInflight:
+            n = min(self.maxBatch, len(self.queue))
+            items = [self.queue.popleft() for _ in range(n)]
+            self.inflight += 1
+            asyncio.ensure_future(self._run(items))
+
+    async def _run(self, items):
+        '''
+        Runs one batch in the worker pool and hands each caller its result.
+        :param items: list of (payload, future)
+        '''
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self.pool, _runBatch, self.endpoint, [p for p, _ in items])
+        except Exception as e:
+            results = [{'error': '{}: {}'.format(type(e).__name__, e)}] * len(items)
+        self.stats.workerTime += time.perf_counter() - t0
+        self.stats.batches += 1
+        self.stats.batched += len(items)
+        for (_, fut), r in zip(items, results):
+            if not fut.done():
+                fut.set_result(r)
+        self.inflight -= 1
+        if self.queue:
+            # requests that arrived while this batch ran are already past their window
+            self._flush()
+
+
+class SolverServer():
+    '''
+    A local HTTP/JSON server for steam states, Rankine cycles, resistor networks and pipe networks.
+    POST /steam, /rankine, /resistor or /pipe with one request as a JSON object; GET /stats reports the
+    throughput and latency percentiles of each endpoint.  Concurrent requests are answered in batches
+    (see Batcher) by worker processes, one pool for each homework folder.
+    '''
+    def __init__(self, window=0.002, maxBatch=256, maxPending=1024, workers=1):
+        '''
+        :param window: seconds a batch stays open for more requests
+        :param maxBatch: largest batch sent to a worker
+        :param maxPending: waiting + running requests per endpoint before new ones are refused with 503
+        :param workers: worker processes per folder
+        '''
+        ctx = multiprocessing.get_context('spawn')  # fresh interpreters, nothing imported from the parent
+        self.pools = {folder: ProcessPoolExecutor(workers, mp_context=ctx, initializer=_initWorker,
+                                                  initargs=(folder,))
+                      for folder in sorted(set(ENDPOINTS.values()))}
+        self.batchers = {ep: Batcher(ep, self.pools[folder], window, maxBatch, maxPending, workers)
+                         for ep, folder in ENDPOINTS.items()}
+        self.started = time.perf_counter()
+        self.servers = []
+
+    async def warmUp(self):
+        '''
+        Imports the models and loads the tables in every worker before the first real request.
+        :return: nothing
+        '''
+        warm = {'steam': {'p': 100, 'x': 0.5}, 'rankine': {}, 'resistor': {}, 'pipe': {}}
+        await asyncio.gather(*(b.submit(warm[ep]) for ep, b in self.batchers.items()))
+        self.resetStats()
+
+    def resetStats(self):
+        self.started = time.perf_counter()
+        for b in self.batchers.values():
+            b.stats = EndpointStats()
+
+    def stats(self):
+        '''
+        :return: dict {endpoint: EndpointStats.report()}
+        '''
+        elapsed = time.perf_counter() - self.started
+        return {ep: b.stats.report(elapsed) for ep, b in self.batchers.items()}
+
+    async def start(self, host='127.0.0.1', port=8765, unixPath=None):
+        '''
+        Starts listening on a TCP port and/or a Unix socket.
+        :param port: TCP port, 0 picks a free one, None for no TCP socket
+        :param unixPath: optional path of a Unix socket
+        :return: the TCP port in use (or None)
+        '''
+        bound = None
+        if port is not None:
+            srv = await asyncio.start_server(self._handle, host, port)
+            bound = srv.sockets[0].getsockname()[1]
+            self.servers.append(srv)
+        if unixPath is not None:
+            if os.path.exists(unixPath):
+                os.remove(unixPath)
+            self.servers.append(await asyncio.start_unix_server(self._handle, unixPath))
+        return bound
+
+    async def close(self):
+        for srv in self.servers:
+            srv.close()
+            await srv.wait_closed()
+        for pool in self.pools.values():
+            pool.shutdown()
+
+    async def _route(self, method, path, body):
+        '''
+        :return: (HTTP status, JSON-able object)
+        '''
+        ep = path.strip('/').split('?')[0]
+        if method == 'GET' and ep == 'stats':
+            return 200, self.stats()
+        if method == 'GET' and ep == 'health':
+            return 200, {'ok': True}
+        if method != 'POST' or ep not in self.batchers:
+            return 404, {'error': 'unknown endpoint {} {}'.format(method, path)}
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError as e:
+            return 400, {'error': 'bad JSON: {}'.format(e)}
+        if not isinstance(payload, dict):
+            return 400, {'error': 'the request must be a JSON object'}
+        try:
+            result = await self.batchers[ep].submit(payload)
+        except Overloaded as e:
+            return 503, {'error': str(e)}
+        return (400 if 'error' in result else 200), result
+
+    async def _handle(self, reader, writer):
+        '''
+        Serves one (keep-alive) HTTP/1.1 connection.
+        '''
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, path = line.decode('latin-1').split()[:2]
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    k, _, v = h.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, obj = await self._route(method, path, body)
+                data = json.dumps(obj).encode()
+                head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'.format(
+                    status, REASONS[status], len(data))
+                if status == 503:
+                    head += 'Retry-After: 1\r\n'
+                writer.write(head.encode() + b'\r\n' + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError, ValueError):
+            pass  # the client hung up, sent garbage, or the server is shutting down
+        finally:
+            writer.close()
+
+
+class ServiceClient():
+    '''
+    A minimal keep-alive client for SolverServer (one request at a time per client).
+    '''
+    def __init__(self, host='127.0.0.1', port=8765, unixPath=None):
+        self.host, self.port, self.unixPath = host, port, unixPath
+        self.reader = self.writer = None
+
+    async def connect(self):
+        if self.unixPath is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unixPath)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, endpoint, payload=None):
+        '''
+        :param endpoint: 'steam', 'rankine', 'resistor', 'pipe' (POST) or 'stats' (GET)
+        :param payload: the request dict for the POST endpoints
+        :return: (HTTP status, decoded JSON answer)
+        '''
+        if self.writer is None:
+            await self.connect()
+        body = b'' if payload is None else json.dumps(payload).encode()
+        method = 'GET' if payload is None else 'POST'
+        self.writer.write('{} /{} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n'.format(
+            method, endpoint, len(body)).encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        n = 0
+        while True:
+            h = await self.reader.readline()
+            if h in (b'\r\n', b''):
+                break
+            if h.lower().startswith(b'content-length:'):
+                n = int(h.split(b':')[1])
+        return status, json.loads(await self.reader.readexactly(n))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+#endregion
+
+#region function definitions
+async def serve(args):
+    '''
+    Runs the server until it is interrupted, then prints the endpoint statistics.
+    '''
+    server = SolverServer(args.window_ms/1000, args.max_batch, args.max_pending, args.workers)
+    await server.warmUp()
+    port = await server.start(args.host, None if args.no_tcp else args.port, args.unix)
+    print('serving on {}'.format(', '.join(s for s in ('http://{}:{}'.format(args.host, port) if port else '',
+                                                         args.unix or '') if s)))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(json.dumps(server.stats(), indent=1))
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching steam, Rankine, resistor and pipe network server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--no-tcp', action='store_true', help='only listen on the Unix socket')
+    parser.add_argument('--unix', default=None, help='path of a Unix socket to listen on')
+    parser.add_argument('--window-ms', type=float, default=2.0, help='how long a batch waits for more requests')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-pending', type=int, default=1024, help='requests per endpoint before 503')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes per homework folder')
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,252 @@
+#region imports
+import math
+import numpy as np
+try:
+    import numba  # optional: the kernels are compiled when it is installed
+except ImportError:
+    numba = None
+#endregion
+
+#region globals
+# use the compiled kernels (set to False to force the NumPy versions, e.g. to compare them)
+JIT = numba is not None
+prange = numba.prange if numba is not None else range  # parallel loops of the compiled kernels
+#endregion
+
+#region function definitions
+def _jit(f):
+    '''
+    Compiles a kernel loop with Numba (nopython, parallel prange loops, cached on disk); None without Numba.
+    '''
+    return numba.njit(cache=True, parallel=True)(f) if numba is not None else None
+
+
+def colebrookU(Re, rr, u0=None, tol=1e-12, maxIter=50):
+    '''
+    Solves the Colebrook equation for many pipes with Newton's method on u=1/sqrt(f), with the starting
+    point, update and stopping rule of Pipe.colebrook applied to every element on its own.
+    :param Re: array of Reynolds numbers (>0)
+    :param rr: array of relative roughness
+    :param u0: optional starting values of u (default 1/sqrt(0.01), as Pipe.colebrook)
+    :return: array of u (the friction factor is 1/u**2)
+    '''
+    Re, rr=np.broadcast_arrays(np.asarray(Re, dtype=float), np.asarray(rr, dtype=float))
+    u=np.full(Re.shape, 1/(0.01**0.5)) if u0 is None else np.array(u0, dtype=float)
+    if JIT:
+        return _colebrookJit(np.ravel(Re), np.ravel(rr), np.ravel(u), tol, maxIter).reshape(Re.shape)
+    return _colebrookNumpy(np.ravel(Re), np.ravel(rr), np.ravel(u), tol, maxIter).reshape(Re.shape)
+
+
+def _colebrookNumpy(Re, rr, u, tol, maxIter):
+    a=rr/3.7
+    b=2.51/Re
+    active=np.arange(len(u))  # elements still iterating
+    for _ in range(maxIter):
+        if not len(active):
+            break
+        bb=b[active]
+        arg=a[active]+bb*u[active]
+        F=u[active]+2.0*np.log10(arg)
+        dF=1.0+2.0*bb/(arg*math.log(10))
+        du=F/dF
+        v=u[active]-du
+        u[active]=v
+        active=active[~(np.abs(du)<tol*np.abs(v))]
+    return u
+
+
+def _colebrookLoop(Re, rr, u, tol, maxIter):
+    ln10=math.log(10)
+    for i in prange(len(u)):
+        a=rr[i]/3.7
+        b=2.51/Re[i]
+        v=u[i]
+        for _ in range(maxIter):
+            arg=a+b*v
+            F=v+2.0*math.log10(arg)
+            dF=1.0+2.0*b/(arg*ln10)
+            dv=F/dF
+            v-=dv
+            if abs(dv)<tol*abs(v):
+                break
+        u[i]=v
+    return u
+
+
+_colebrookJit=_jit(_colebrookLoop)
+
+
+def loopHeadLoss(h, ptr, pipes, signs):
+    '''
+    Net head loss around many loops at once.  Loop k traverses pipes[ptr[k]:ptr[k+1]], signs[j] being +1
+    where the traversal follows the positive direction of the pipe; the terms are added in traversal order
+    like Loop.getLoopHeadLoss.
+    :param h: signed head loss of every pipe (+ in the positive pipe direction)
+    :param ptr: loop pointers into pipes and signs (length number of loops + 1)
+    :param pipes: pipe indices of every loop in traversal order
+    :param signs: traversal directions
+    :return: array with one head loss per loop
+    '''
+    h, ptr, pipes, signs=(np.asarray(h, dtype=float), np.asarray(ptr, dtype=np.int64),
+                          np.asarray(pipes, dtype=np.int64), np.asarray(signs, dtype=float))
+    if JIT:
+        return _loopJit(h, ptr, pipes, signs)
+    loopOf=np.repeat(np.arange(len(ptr)-1), np.diff(ptr))
+    return np.bincount(loopOf, signs*h[pipes], len(ptr)-1)
+
+
+def _loopLoop(h, ptr, pipes, signs):
+    out=np.zeros(len(ptr)-1)
+    for k in prange(len(ptr)-1):
+        s=0.0
+        for j in range(ptr[k], ptr[k+1]):
+            s+=signs[j]*h[pipes[j]]
+        out[k]=s
+    return out
+
+
+_loopJit=_jit(_loopLoop)
+
+
+def interpColumns(x, xp, fp):
+    '''
+    Linear interpolation of several table columns that share the abscissa xp, as np.interp with nan outside
+    of the table.  The compiled version finds the interval of each point once for all of the columns.
+    :param x: query points
+    :param xp: increasing abscissa of the table
+    :param fp: (number of columns, len(xp)) table values
+    :return: (number of columns,) + x.shape array
+    '''
+    x=np.asarray(x, dtype=float)
+    xp, fp=np.asarray(xp, dtype=float), np.atleast_2d(np.asarray(fp, dtype=float))
+    if JIT:
+        return _interpJit(np.ravel(x), xp, fp).reshape((len(fp),)+x.shape)
+    return np.stack([np.interp(x, xp, col, left=np.nan, right=np.nan) for col in fp])
+
+
+def _interpLoop(x, xp, fp):
+    n=len(xp)
+    out=np.empty((fp.shape[0], len(x)))
+    for i in prange(len(x)):
+        xi=x[i]
+        if not (xp[0]<=xi<=xp[n-1]):
+            for c in range(fp.shape[0]):
+                out[c, i]=np.nan
+            continue
+        lo, hi=0, n-1  # the interval xp[lo]<=xi<xp[lo+1] by bisection
+        while hi-lo>1:
+            mid=(lo+hi)//2
+            if xp[mid]<=xi:
+                lo=mid
+            else:
+                hi=mid
+        for c in range(fp.shape[0]):
+            # the same arithmetic as np.interp
+            if xi==xp[n-1]:
+                out[c, i]=fp[c, n-1]
+            elif xi==xp[lo]:
+                out[c, i]=fp[c, lo]
+            else:
+                slope=(fp[c, lo+1]-fp[c, lo])/(xp[lo+1]-xp[lo])
+                out[c, i]=slope*(xi-xp[lo])+fp[c, lo]
+    return out
+
+
+_interpJit=_jit(_interpLoop)
+
+
+def triLocate(qx, qy, ex, ey, cand, transform):
+    '''
+    Finds the triangle of a triangulation that contains each query point and its barycentric coordinates
+    (see TriInterp in steam_tables).  Points are bucketed on the grid with edges ex, ey, and cand lists the
+    triangles overlapping each bucket (-1 is padding); the first candidate that contains the point wins.
+    :param qx, qy: query points (1-D arrays)
+    :param ex, ey: bucket edges along each axis
+    :param cand: (number of buckets, max candidates) triangle indices
+    :param transform: (number of triangles, 3, 2) barycentric transforms (scipy's Delaunay.transform)
+    :return: (triangle index or -1 outside of the hull, (n, 3) barycentric coordinates)
+    '''
+    qx, qy=np.asarray(qx, dtype=float), np.asarray(qy, dtype=float)
+    ny=len(ey)-1
+    bx=np.clip(np.searchsorted(ex, qx, 'right')-1, 0, len(ex)-2)
+    by=np.clip(np.searchsorted(ey, qy, 'right')-1, 0, ny-1)
+    bucket=bx*ny+by
+    if JIT:
+        return _locateJit(qx, qy, bucket, cand, transform)
+    C=cand[bucket]
+    Cs=np.where(C>=0, C, 0)
+    T=transform[Cs]
+    dx=qx[:, None]-T[..., 2, 0]
+    dy=qy[:, None]-T[..., 2, 1]
+    c0=T[..., 0, 0]*dx+T[..., 0, 1]*dy
+    c1=T[..., 1, 0]*dx+T[..., 1, 1]*dy
+    c2=1.0-c0-c1
+    eps=-1e-10  # same tolerance idea as qhull's find_simplex
+    inside=(C>=0)&(c0>=eps)&(c1>=eps)&(c2>=eps)
+    first=np.argmax(inside, axis=1)
+    rows=np.arange(len(qx))
+    idx=np.where(inside.any(axis=1), Cs[rows, first], -1)
+    bary=np.column_stack((c0[rows, first], c1[rows, first], c2[rows, first]))
+    return idx, bary
+
+
+def _locateLoop(qx, qy, bucket, cand, transform):
+    eps=-1e-10
+    idx=np.full(len(qx), -1)
+    bary=np.empty((len(qx), 3))
+    for i in prange(len(qx)):
+        row=cand[bucket[i]]
+        for k in range(len(row)):
+            t=max(row[k], 0)
+            T=transform[t]
+            dx=qx[i]-T[2, 0]
+            dy=qy[i]-T[2, 1]
+            c0=T[0, 0]*dx+T[0, 1]*dy
+            c1=T[1, 0]*dx+T[1, 1]*dy
+            c2=1.0-c0-c1
+            if k==0 or (row[k]>=0 and c0>=eps and c1>=eps and c2>=eps):
+                # coordinates of the first candidate are kept for points outside of the hull, as argmax does
+                bary[i, 0], bary[i, 1], bary[i, 2]=c0, c1, c2
+            if row[k]>=0 and c0>=eps and c1>=eps and c2>=eps:
+                idx[i]=t
+                break
+    return idx, bary
+
+
+_locateJit=_jit(_locateLoop)
+
+
+def triInterp(values, simplices, idx, bary):
+    '''
+    Barycentric interpolation of several data columns at located points (see triLocate).
+    :param values: (number of columns, number of data points) values
+    :param simplices: (number of triangles, 3) point indices
+    :param idx: triangle of every query point, -1 outside of the hull (gives nan)
+    :param bary: (n, 3) barycentric coordinates
+    :return: (number of columns, n) array
+    '''
+    values=np.atleast_2d(np.asarray(values, dtype=float))
+    if JIT:
+        return _triInterpJit(values, simplices, np.asarray(idx, dtype=np.int64), bary)
+    out=np.empty((len(values), len(idx)))
+    for c, v in enumerate(values):
+        out[c]=np.einsum('ni,ni->n', v[simplices[idx]], bary)
+        out[c, idx<0]=np.nan
+    return out
+
+
+def _triInterpLoop(values, simplices, idx, bary):
+    out=np.empty((values.shape[0], len(idx)))
+    for i in prange(len(idx)):
+        if idx[i]<0:
+            for c in range(values.shape[0]):
+                out[c, i]=np.nan
+            continue
+        s=simplices[idx[i]]
+        for c in range(values.shape[0]):
+            out[c, i]=values[c, s[0]]*bary[i, 0]+values[c, s[1]]*bary[i, 1]+values[c, s[2]]*bary[i, 2]
+    return out
+
+
+_triInterpJit=_jit(_triInterpLoop)
+#endregion
@@ -0,0 +1,268 @@
+#region imports
+import os
+import numpy as np
+#endregion
+
+#region class definitions
+class Normal():
+    #region constructor
+    def __init__(self, sd, relative=True):
+        '''
+        A normal distribution about the nominal value.
+        :param sd: standard deviation, a fraction of the nominal value if relative
+        :param relative: sd is relative to the nominal value
+        '''
+        #region attributes
+        self.sd = sd
+        self.relative = relative
+        #endregion
+    #endregion
+
+    #region methods
+    def sample(self, rng, nominal, n):
+        '''
+        :param rng: a numpy Generator
+        :param nominal: array of nominal values
+        :param n: number of samples
+        :return: (n, len(nominal)) array
+        '''
+        z = rng.standard_normal((n, len(nominal)))
+        return nominal * (1 + self.sd * z) if self.relative else nominal + self.sd * z
+    #endregion
+
+
+class Uniform():
+    #region constructor
+    def __init__(self, low, high, relative=True):
+        '''
+        A uniform distribution, e.g. Uniform(-0.05, 0.05) for a 5% tolerance.
+        :param low: lower bound, a fraction added to the nominal value if relative, else an absolute value
+        :param high: upper bound, as low
+        :param relative: the bounds are relative to the nominal value
+        '''
+        #region attributes
+        self.low = low
+        self.high = high
+        self.relative = relative
+        #endregion
+    #endregion
+
+    #region methods
+    def sample(self, rng, nominal, n):
+        U = rng.uniform(self.low, self.high, (n, len(nominal)))
+        return nominal * (1 + U) if self.relative else U
+    #endregion
+
+
+class LogNormal():
+    #region constructor
+    def __init__(self, sigma):
+        '''
+        A log-normal distribution whose median is the nominal value, for positive quantities like resistance or
+        roughness.
+        :param sigma: standard deviation of the logarithm
+        '''
+        #region attributes
+        self.sigma = sigma
+        #endregion
+    #endregion
+
+    #region methods
+    def sample(self, rng, nominal, n):
+        return nominal * np.exp(self.sigma * rng.standard_normal((n, len(nominal))))
+    #endregion
+
+
+class StreamingStats():
+    #region constructor
+    def __init__(self, names, lo, hi, thresholds=(), bins=4096):
+        '''
+        Summary statistics of a stream of sample vectors that never stores the samples: count, mean and variance
+        (Welford/Chan updates), min, max, a fixed-range histogram per column for percentiles and exceedance
+        counts.  Two StreamingStats with the same ranges merge exactly, so parallel chunks are summarized
+        independently and combined.
+        :param names: column names
+        :param lo: lower end of the histogram range of every column
+        :param hi: upper end of the histogram range of every column
+        :param thresholds: list of (column name, '>' or '<', limit) whose probabilities are counted
+        :param bins: histogram bins per column; values outside (lo, hi) go to two extra end bins
+        '''
+        #region attributes
+        self.names = list(names)
+        self.lo = np.asarray(lo, dtype=float)
+        self.hi = np.asarray(hi, dtype=float)
+        self.thresholds = list(thresholds)
+        self.bins = bins
+        n = len(self.names)
+        self.count = 0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.hist = np.zeros((n, bins + 2), dtype=np.int64)
+        self.exceed = np.zeros(len(self.thresholds), dtype=np.int64)
+        self._thresholdCols = np.array([self.names.index(c) for c, _, _ in self.thresholds], dtype=int)
+        #endregion
+    #endregion
+
+    #region methods
+    def empty(self):
+        '''
+        :return: a StreamingStats with the same columns, ranges and thresholds and no samples
+        '''
+        return StreamingStats(self.names, self.lo, self.hi, self.thresholds, self.bins)
+
+    def update(self, X):
+        '''
+        Adds a batch of samples.
+        :param X: (n, number of columns) array
+        '''
+        X = np.atleast_2d(X)
+        if len(X) == 0:
+            return
+        other = self.empty()
+        other.count = len(X)
+        other.mean = X.mean(axis=0)
+        other.m2 = ((X - other.mean)**2).sum(axis=0)
+        other.min = X.min(axis=0)
+        other.max = X.max(axis=0)
+        width = (self.hi - self.lo) / self.bins
+        k = np.clip(np.floor((X - self.lo) / width).astype(np.int64) + 1, 0, self.bins + 1)
+        cols = np.arange(len(self.names))
+        other.hist = np.bincount((k + cols * (self.bins + 2)).ravel(),
+                                 minlength=len(cols) * (self.bins + 2)).reshape(len(cols), self.bins + 2)
+        for j, (c, op, limit) in enumerate(self.thresholds):
+            x = X[:, self._thresholdCols[j]]
+            other.exceed[j] = np.sum(x > limit) if op == '>' else np.sum(x < limit)
+        self.merge(other)
+
+    def merge(self, other):
+        '''
+        Adds the samples summarized by another StreamingStats with the same columns and ranges.
+        '''
+        n = self.count + other.count
+        if n == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / n
+        self.m2 = self.m2 + other.m2 + delta**2 * self.count * other.count / n
+        self.count = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.hist += other.hist
+        self.exceed += other.exceed
+
+    def std(self):
+        return np.sqrt(self.m2 / max(self.count - 1, 1))
+
+    def percentile(self, q):
+        '''
+        Percentiles from the histogram, interpolated linearly inside a bin; the error is at most one bin width
+        (hi-lo)/bins, or up to the sample min/max for the share of samples outside the range.
+        :param q: percentile in 0...100
+        :return: one value per column
+        '''
+        target = q / 100.0 * self.count
+        cum = np.cumsum(self.hist, axis=1)
+        k = np.minimum((cum < target).sum(axis=1), self.bins + 1)
+        rows = np.arange(len(k))
+        prev = np.where(k > 0, cum[rows, k - 1], 0)
+        inBin = self.hist[rows, k]
+        frac = np.where(inBin > 0, (target - prev) / np.maximum(inBin, 1), 0.0)
+        width = (self.hi - self.lo) / self.bins
+        x = self.lo + (k - 1 + frac) * width
+        # the end bins are unbounded, so interpolate between the range and the sample extremes there
+        x = np.where(k == 0, self.min + frac * (self.lo - self.min), x)
+        x = np.where(k == self.bins + 1, self.hi + frac * (self.max - self.hi), x)
+        return np.clip(x, self.min, self.max)
+
+    def outsideRange(self):
+        '''
+        :return: fraction of the samples of every column that fell outside the histogram range
+        '''
+        return (self.hist[:, 0] + self.hist[:, -1]) / max(self.count, 1)
+
+    def summary(self, percentiles=(5, 50, 95)):
+        '''
+        :return: dict with 'count', 'names', and per column arrays 'mean', 'std', 'min', 'max' and 'p<q>' for
+                 every percentile, plus 'exceedance': {(column, op, limit): probability}
+        '''
+        s = {'count': self.count, 'names': self.names, 'mean': self.mean, 'std': self.std(),
+             'min': self.min, 'max': self.max}
+        for q in percentiles:
+            s['p{:g}'.format(q)] = self.percentile(q)
+        s['exceedance'] = {tuple(t): e / max(self.count, 1) for t, e in zip(self.thresholds, self.exceed)}
+        return s
+    #endregion
+#endregion
+
+#region function definitions
+_worker = {}
+
+
+def runChunks(solveChunk, names, thresholds, nSamples, chunkSize, workers=None, pilot=1000, progress=None):
+    '''
+    Runs a Monte Carlo study in chunks.  A pilot chunk solved here fixes the histogram ranges (its spread widened
+    by half on each side), then the remaining chunks are summarized in worker processes and merged as they
+    finish.  Chunk k must draw from its own generator, e.g. seeded with SeedSequence(seed, spawn_key=(k,)), so
+    the result does not depend on the number of workers or the order chunks finish in.
+    :param solveChunk: function (k, n) -> (outputs of the solved samples as an (n solved, columns) array, and any
+                       number of counts, e.g. failed samples, that are added up over the chunks); a bound method
+                       of the study, which is sent to every worker once
+    :param names: output column names
+    :param thresholds: list of (column name, '>' or '<', limit) whose probabilities are counted
+    :param nSamples: number of samples
+    :param chunkSize: samples per chunk
+    :param workers: number of processes (default: os.cpu_count(); 1 runs everything in this process)
+    :param pilot: samples of the pilot chunk
+    :param progress: optional function called with (samples done, StreamingStats) after every chunk
+    :return: (the StreamingStats of all samples, list of the summed counts)
+    '''
+    sizes = [min(pilot, nSamples)]
+    while sum(sizes) < nSamples:
+        sizes.append(min(chunkSize, nSamples - sum(sizes)))
+    X, *counts = solveChunk(0, sizes[0])
+    lo, hi = X.min(axis=0), X.max(axis=0)
+    pad = np.maximum(0.5 * (hi - lo), 1e-9 * np.maximum(np.abs(hi), 1.0))
+    stats = StreamingStats(names, lo - pad, hi + pad, thresholds)
+    stats.update(X)
+    done = sizes[0]
+    if progress:
+        progress(done, stats)
+    workers = workers or os.cpu_count() or 1
+    tasks = list(enumerate(sizes))[1:]
+    if workers == 1 or not tasks:
+        for k, n in tasks:
+            done, counts = _collect(stats, done, counts, _summarizeChunk(solveChunk, k, n, stats), progress)
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(workers, initializer=_initWorker, initargs=(solveChunk, stats)) as pool:
+            futures = [pool.submit(_workerChunk, k, n) for k, n in tasks]
+            for f in as_completed(futures):
+                done, counts = _collect(stats, done, counts, f.result(), progress)
+    return stats, counts
+
+
+def _collect(stats, done, counts, result, progress):
+    n, part, partCounts = result
+    stats.merge(part)
+    done += n
+    if progress:
+        progress(done, stats)
+    return done, [a + b for a, b in zip(counts, partCounts)]
+
+
+def _summarizeChunk(solveChunk, k, n, template):
+    X, *counts = solveChunk(k, n)
+    part = template.empty()
+    part.update(X)
+    return n, part, counts
+
+
+def _initWorker(solveChunk, template):
+    _worker['solveChunk'], _worker['template'] = solveChunk, template
+
+
+def _workerChunk(k, n):
+    return _summarizeChunk(_worker['solveChunk'], k, n, _worker['template'])
+#endregion
@@ -0,0 +1,197 @@
+#region imports
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+#endregion
+
+#region class definitions
+class NetworkCache():
+    #region constructor
+    def __init__(self, directory=None, maxBytes=64*2**20):
+        '''
+        A content-addressed store of solved networks, one compressed .npz file per problem.  A problem is
+        described by a dict with a 'topology' part (what is connected to what), a 'values' part (element
+        values) and a 'settings' part (solver and initial guess).  The file name is the hash of the topology
+        followed by the hash of the whole problem, so a problem that only differs in its values can find the
+        closest solved neighbor with the same topology for a warm start.  When the directory grows past
+        maxBytes, the least recently used files are deleted.  HW6_1 and HW6_2 share this module; each keeps its
+        files in its own folder.
+        :param directory: the folder holding the .npz files (default: network_cache in the working directory,
+                          which is the homework folder the scripts and the server workers run in)
+        :param maxBytes: size bound of the folder in bytes
+        '''
+        #region attributes
+        self.directory = directory if directory is not None else os.path.join(os.getcwd(), 'network_cache')
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.warmStarts = 0
+        self.misses = 0
+        self._values = {}  # file name -> value vector of the problem in it (a file never changes its problem)
+        #endregion
+    #endregion
+
+    #region methods
+    @staticmethod
+    def hash(obj):
+        '''
+        Canonical hash of a JSON-able object (dict keys sorted, floats written exactly).
+        :param obj: the object to hash
+        :return: hex string
+        '''
+        txt = json.dumps(obj, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(txt.encode()).hexdigest()[:32]
+
+    def path(self, problem):
+        '''
+        :param problem: dict with 'topology', 'values' and 'settings'
+        :return: the .npz file name of the problem
+        '''
+        return os.path.join(self.directory, '{}_{}.npz'.format(self.hash(problem['topology']), self.hash(problem)))
+
+    def lookup(self, problem):
+        '''
+        Finds the solution of a problem, or the solution of its nearest neighbor with the same topology.
+        :param problem: dict with 'topology', 'values' and 'settings'
+        :return: (dict of arrays of the exact solution or None, dict of arrays to warm start from or None)
+        '''
+        path = self.path(problem)
+        data = self.load(path)
+        if data is not None:
+            self.hits += 1
+            return data, None
+        # nearest neighbor among the solved problems with the same topology.  The values mix units (lengths in
+        # hundreds of m next to diameters and demands of 1e-4...1e-1), so every one is compared relative to its
+        # size; a value that is zero in both problems does not count.
+        x = np.array(valueVector(problem['values']))
+        best, bestDist = None, np.inf
+        for f, values in self.values(self.hash(problem['topology'])).items():
+            if values.shape != x.shape:
+                continue
+            dist = relativeDistance(values, x)
+            if dist < bestDist:
+                best, bestDist = f, dist
+        data = self.load(best) if best is not None else None
+        if data is not None:
+            self.warmStarts += 1
+            return None, data
+        self.misses += 1
+        return None, None
+
+    def values(self, topology):
+        '''
+        The value vectors of the solved problems with one topology.  Only the small 'values' member of a file is
+        read, and only the first time this object sees the file, so a miss costs one directory listing and the
+        files stored since the last one.
+        :param topology: hash of the topology part of the problems
+        :return: dict {file name: value vector}
+        '''
+        files = glob.glob(os.path.join(self.directory, topology + '_*.npz'))
+        for f in files:
+            if f not in self._values:
+                try:
+                    with np.load(f, allow_pickle=False) as npz:
+                        self._values[f] = npz['values']
+                except (OSError, ValueError, EOFError, KeyError):
+                    continue
+        return {f: self._values[f] for f in files if f in self._values}
+
+    def load(self, path, touch=True):
+        '''
+        Reads one cache file.
+        :param path: the .npz file
+        :param touch: mark the file as recently used
+        :return: dict of arrays or None if it is missing or unreadable
+        '''
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                data = {k: npz[k] for k in npz.files}
+        except (OSError, ValueError, EOFError):
+            return None
+        if touch:
+            try:
+                os.utime(path)  # the modification time is the LRU order
+            except OSError:
+                pass
+        return data
+
+    def store(self, problem, **arrays):
+        '''
+        Saves the solution of a problem and evicts the least recently used files beyond the size bound.
+        :param problem: dict with 'topology', 'values' and 'settings'
+        :param arrays: the solution arrays (currents, flows, converged state ...)
+        :return: the file name
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(problem)
+        tmp = path + '.{}.tmp'.format(os.getpid())
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, values=np.array(valueVector(problem['values'])),
+                                problem=np.array(json.dumps(problem, sort_keys=True)), **arrays)
+        os.replace(tmp, path)  # readers never see half a file
+        self._values[path] = np.array(valueVector(problem['values']))
+        self.evict()
+        return path
+
+    def evict(self):
+        '''
+        Deletes the least recently used files until the folder is within maxBytes.
+        :return: number of files deleted
+        '''
+        files = []
+        for f in glob.glob(os.path.join(self.directory, '*.npz')):
+            try:
+                st = os.stat(f)
+                files.append((st.st_mtime, st.st_size, f))
+            except OSError:
+                pass
+        files.sort()
+        total = sum(s for _, s, _ in files)
+        n = 0
+        while total > self.maxBytes and len(files) > 1:
+            _, size, f = files.pop(0)
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+            self._values.pop(f, None)
+            total -= size
+            n += 1
+        return n
+
+    def clear(self):
+        '''
+        Deletes every file of the cache.
+        '''
+        for f in glob.glob(os.path.join(self.directory, '*.npz')):
+            os.remove(f)
+        self._values.clear()
+    #endregion
+#endregion
+
+#region function definitions
+def relativeDistance(a, b):
+    '''
+    Distance between two value vectors that does not depend on the units of the values: the norm of the
+    differences, each divided by the larger magnitude of the two values.
+    :param a: array of values
+    :param b: array of values of the same shape
+    :return: a number, 0 for equal vectors
+    '''
+    scale = np.maximum(np.abs(a), np.abs(b))
+    return np.linalg.norm(np.divide(a - b, scale, out=np.zeros_like(scale), where=scale > 0))
+
+
+def valueVector(values):
+    '''
+    Flattens the numbers of the 'values' part of a problem in a fixed (sorted key) order.
+    :param values: nested dicts/lists of numbers
+    :return: list of floats
+    '''
+    if isinstance(values, dict):
+        return [v for k in sorted(values) for v in valueVector(values[k])]
+    if isinstance(values, (list, tuple)):
+        return [v for item in values for v in valueVector(item)]
+    return [float(values)]
+#endregion
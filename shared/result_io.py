@@ -0,0 +1,228 @@
+#region imports
+import csv
+import itertools
+import json
+import os
+import struct
+import numpy as np
+#endregion
+
+#region function definitions
+def toTable(data):
+    '''
+    A structured array (one record per element) from a structured array or a dict of equal length columns.
+    :param data: structured array or dict {name: column}
+    :return: structured numpy array
+    '''
+    if isinstance(data, np.ndarray) and data.dtype.names:
+        return data
+    columns = {k: np.asarray(v) for k, v in data.items()}
+    n = len(next(iter(columns.values()))) if columns else 0
+    table = np.empty(n, dtype=[(k, v.dtype) for k, v in columns.items()])
+    for k, v in columns.items():
+        table[k] = v
+    return table
+
+
+def residualTable(checks):
+    '''
+    One record per verification check, so that a whole solution is verified by looking at one small table.
+    :param checks: iterable of (check name, element names, residuals)
+    :return: structured array with check, count, maxAbs, rms and worst (the element with the largest residual)
+    '''
+    rows = []
+    for check, names, r in checks:
+        r = np.abs(np.asarray(r, dtype=float))
+        k = int(np.argmax(r)) if len(r) else -1
+        rows.append((check, len(r), r[k] if len(r) else 0.0, np.sqrt(np.mean(r**2)) if len(r) else 0.0,
+                     names[k] if len(r) else ''))
+    width = max([len(str(row[0])) for row in rows] + [len(str(row[4])) for row in rows] + [1])
+    return np.array(rows, dtype=[('check', 'U{}'.format(width)), ('count', int), ('maxAbs', float),
+                                 ('rms', float), ('worst', 'U{}'.format(width))])
+
+
+def _chunks(data, chunkRows, dtype=None, fixed=True):
+    '''
+    Yields structured arrays of at most chunkRows records from a table, a dict of columns or an iterable of
+    either (e.g. a generator of batch results, so that nothing has to be held in memory at once).  Every chunk
+    has the columns of the first one, or of the given dtype.  For files with fixed width records every chunk is
+    also cast to that dtype, and one that does not fit it (a longer string, a float in an integer column)
+    raises ValueError instead of being cut to fit.  An empty table yields one empty chunk, so the writers still
+    write its columns.
+    :param dtype: optional record dtype of the file, e.g. to give string columns room for every chunk
+    :param fixed: the file has fixed width records (.npy), so chunks are cast to the dtype
+    :return: generator of structured arrays
+    '''
+    if isinstance(data, (np.ndarray, dict)):
+        data = [data]
+    dtype = np.dtype(dtype) if dtype is not None else None
+    empty = True
+    for part in data:
+        table = toTable(part)
+        if dtype is None:
+            dtype = table.dtype
+        elif table.dtype != dtype:
+            if table.dtype.names != dtype.names or (fixed and not np.can_cast(table.dtype, dtype, 'safe')):
+                raise ValueError('records {} do not fit the columns {} of the file; pass a dtype wide enough for '
+                                 'every chunk'.format(table.dtype.descr, dtype.descr))
+            if fixed:
+                table = table.astype(dtype)
+        for k in range(0, max(len(table), 1), chunkRows):
+            empty = False
+            yield table[k:k+chunkRows]
+    if empty:
+        if dtype is None:
+            raise ValueError('no records and no dtype, so there are no columns to write')
+        yield np.empty(0, dtype=dtype)
+
+
+class _NpyStream():
+    #region constructor
+    def __init__(self, path, dtype):
+        '''
+        Writes a 1-D .npy file record by record without knowing its length up front: the header is written
+        with room for any length and rewritten with the real shape on close.
+        :param path: the file name
+        :param dtype: the record dtype
+        '''
+        #region attributes
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.file = open(path, 'wb', buffering=2**20)
+        self.headerSize = len(self._header(10**19))
+        self.file.write(self._header(0, self.headerSize))
+        #endregion
+    #endregion
+
+    #region methods
+    def _header(self, rows, size=None):
+        '''
+        The .npy (version 1.0) header for a given number of records, padded to size bytes.
+        '''
+        txt = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(
+            np.lib.format.dtype_to_descr(self.dtype), rows)
+        size = size or (10+len(txt)+1+63)//64*64
+        txt = txt.ljust(size-10-1)+'\n'
+        return b'\x93NUMPY\x01\x00'+struct.pack('<H', len(txt))+txt.encode('latin1')
+
+    def write(self, chunk):
+        self.file.write(np.ascontiguousarray(chunk, dtype=self.dtype).tobytes())
+        self.rows += len(chunk)
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(self._header(self.rows, self.headerSize))
+        self.file.close()
+    #endregion
+
+
+def writeCsv(path, data, chunkRows=65536, floatFormat='%.10g', dtype=None):
+    '''
+    Writes a table to a CSV file with a header line.  Each chunk of records is formatted with one string
+    operation and written in one call through a 1 MB buffer, instead of one print per element.
+    :param path: the file name
+    :param data: table, dict of columns or iterable of them (see _chunks)
+    :param chunkRows: records per write
+    :param floatFormat: % format of float columns
+    :param dtype: optional record dtype (see _chunks)
+    :return: number of records written
+    '''
+    rows = 0
+    with open(path, 'w', newline='', buffering=2**20) as f:
+        header, quote = False, False
+        for chunk in _chunks(data, chunkRows, dtype, fixed=False):
+            if not header:
+                f.write(','.join(chunk.dtype.names)+'\n')
+                header = True
+            # the format follows each chunk, so a float column that started out as integers is not cut
+            kinds = [chunk.dtype[k].kind for k in chunk.dtype.names]
+            rowFormat = ','.join(floatFormat if c == 'f' else '%d' if c in 'iub' else '%s' for c in kinds)+'\n'
+            text = [k for k, c in zip(chunk.dtype.names, kinds) if c in 'US']
+            if any(np.char.find(chunk[k], ch).max(initial=-1) >= 0 for k in text for ch in (',', '"', '\n')):
+                quote = True
+            if quote:  # names that need quoting go through the csv module
+                csv.writer(f, lineterminator='\n').writerows(chunk.tolist())
+            else:
+                f.write((rowFormat*len(chunk)) % tuple(itertools.chain.from_iterable(chunk.tolist())))
+            rows += len(chunk)
+    return rows
+
+
+def writeNpy(path, data, chunkRows=65536, dtype=None):
+    '''
+    Writes a table to one .npy file of records, chunk by chunk (np.load reads it back as a structured array).
+    :param dtype: optional record dtype (see _chunks)
+    :return: number of records written
+    '''
+    stream = None
+    try:
+        for chunk in _chunks(data, chunkRows, dtype):
+            stream = stream or _NpyStream(path, chunk.dtype)
+            stream.write(chunk)
+    finally:
+        if stream is not None:
+            stream.close()
+    return stream.rows
+
+
+def writeNpz(path, data, compressed=True, dtype=None):
+    '''
+    Writes every column of a table as its own array of one .npz file.
+    :param dtype: optional record dtype (see _chunks)
+    :return: number of records written
+    '''
+    table = np.concatenate(list(_chunks(data, 2**62, dtype, fixed=False)))
+    (np.savez_compressed if compressed else np.savez)(path, **{k: table[k] for k in table.dtype.names})
+    return len(table)
+
+
+def writeColumns(path, data, chunkRows=65536, dtype=None):
+    '''
+    Writes a table in columnar form: a folder with one .npy file per column and a columns.json schema.  Columns
+    are streamed chunk by chunk, and readColumns memory-maps them, so single columns of results larger than
+    memory can be read without touching the others.
+    :param path: the folder (created if needed)
+    :param dtype: optional record dtype (see _chunks)
+    :return: number of records written
+    '''
+    os.makedirs(path, exist_ok=True)
+    streams, rows = None, 0
+    try:
+        for chunk in _chunks(data, chunkRows, dtype):
+            if streams is None:
+                streams = {k: _NpyStream(os.path.join(path, k+'.npy'), chunk.dtype[k]) for k in chunk.dtype.names}
+            for k, s in streams.items():
+                s.write(chunk[k])
+            rows += len(chunk)
+    finally:
+        for s in (streams or {}).values():
+            s.close()
+    with open(os.path.join(path, 'columns.json'), 'w') as f:
+        json.dump({'rows': rows, 'columns': [[k, s.dtype.str] for k, s in streams.items()]}, f)
+    return rows
+
+
+def readColumns(path, columns=None):
+    '''
+    Reads a folder written by writeColumns.
+    :param path: the folder
+    :param columns: optional names of the columns to read (default: all)
+    :return: dict {name: read-only memory-mapped array}
+    '''
+    with open(os.path.join(path, 'columns.json')) as f:
+        schema = json.load(f)
+    names = [k for k, _ in schema['columns']] if columns is None else columns
+    return {k: np.load(os.path.join(path, k+'.npy'), mmap_mode='r') for k in names}
+
+
+def export(path, data, **kwargs):
+    '''
+    Writes a table in the format given by the file name: .csv, .npy, .npz, or else a columnar folder.
+    :param path: the file or folder name
+    :param data: table, dict of columns or iterable of them
+    :return: number of records written
+    '''
+    ext = os.path.splitext(path)[1].lower()
+    writer = {'.csv': writeCsv, '.npy': writeNpy, '.npz': writeNpz}.get(ext, writeColumns)
+    return writer(path, data, **kwargs)
+#endregion
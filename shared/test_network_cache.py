@@ -0,0 +1,31 @@
+#test_network_cache.py
+import tempfile
+from network_cache import NetworkCache
+
+def pipeProblem(L, D, demand):
+    '''
+    A two pipe problem in the form of PipeNetwork.problem: lengths in m, diameters in m, demand in m^3/s.
+    '''
+    return {'topology': {'pipes': ['a-b', 'b-c'], 'nodes': ['a', 'b', 'c'], 'loops': []},
+            'values': {'pipes': [[L, D, 0.00025, 0.00089, 1000.0], [250.0, 0.3, 0.00025, 0.00089, 1000.0]],
+                       'extFlows': [demand, 0.0, -demand]},
+            'settings': {'solver': 'fsolve', 'Q0': [0.01, 0.01]}}
+
+def main():
+    '''
+    The warm start of NetworkCache.lookup comes from the problem that differs by 1 m of pipe length, not from
+    the one with a 100 mm larger diameter and 30 L/s more demand, although the lengths are the larger numbers.
+    '''
+    with tempfile.TemporaryDirectory() as folder:
+        cache = NetworkCache(folder)
+        cache.store(pipeProblem(250.0, 0.2, 0.06), Q=[1.0])
+        cache.store(pipeProblem(251.0, 0.3, 0.09), Q=[2.0])
+        exact, warm = cache.lookup(pipeProblem(251.0, 0.2, 0.06))
+        assert exact is None and warm is not None
+        assert warm['Q'][0] == 1.0, 'warm start from the wrong problem'
+        exact, warm = cache.lookup(pipeProblem(251.0, 0.3, 0.09))
+        assert exact is not None and warm is None
+    print('NetworkCache lookups ok')
+
+if __name__ == "__main__":
+    main()